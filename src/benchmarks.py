@@ -0,0 +1,324 @@
+"""
+Benchmark start up time, parsing, Runner statistics and table rendering on
+synthetic and fixture pages of various sizes. Everything runs offline: the pages are written
+to a temporary cache directory which is forced to be valid so nothing is
+fetched from the parkrun website. The results are printed (or written to a
+file) as JSON so they can be compared between versions to catch regressions.
+"""
+
+import argparse
+import contextlib
+import datetime
+from functools import cached_property
+import io
+import json
+import logging
+import os
+from pathlib import Path
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import timeit
+from collections.abc import Callable
+from html import escape
+import parkrun
+import parkrun.api.cache
+from parkrun.api import scraper, scraper_runner
+from parkrun.api.transport import FixtureAdapter, use_adapter
+from parkrun.api.parser import extract_event_result_fragment, extract_runner_results_fragment, parse_event_result_page, parse_runner_results_page
+from parkrun.models.age_category import AgeCategory
+from parkrun.models.event_collection import EventCollection
+from parkrun.models.runner import Runner
+from parkrun.models.runner_results import RunnerResults
+from parkrun.tables.achievements import _calc_achievements, achievements
+from parkrun.tables.common_run_comparison import common_run_comparison
+from parkrun.tables.latest_update import latest_update
+from parkrun.tables.most_common import most_common_country, most_common_location, most_common_location_initial, most_common_month, most_common_time_seconds, most_common_year
+from parkrun.tables.overlap import overlap_matrix, top_co_runners
+from parkrun.tables.pb_progress import pb_progress
+from parkrun.tables.runner_stats import runner_stats
+from parkrun.tables.runner_stats_by_period import runner_stats_by_period
+
+FIXTURES_DIR: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+RUNNER_SIZES: tuple[int] = (10, 100, 500, 1500)
+EVENT_SIZES: tuple[int] = (50, 250, 1000, 2000)
+NUM_EVENTS: int = 60
+FETCH_LATENCY: float = 0.05
+
+# So every achievement has something on its ticklist
+EVENT_NAME_PREFIXES: tuple[str] = ("St", "Bay", "Castle", "Palace", "North", "Oak Hill")
+
+TABLE_FUNCS: dict[str, Callable[[list[int], datetime.date, datetime.date], None]] = {
+    "achievements": achievements,
+    "common_run_comparison": common_run_comparison,
+    "latest_update": latest_update,
+    "most_common_country": most_common_country,
+    "most_common_location": most_common_location,
+    "most_common_location_initial": most_common_location_initial,
+    "most_common_month": most_common_month,
+    "most_common_time_seconds": most_common_time_seconds,
+    "most_common_year": most_common_year,
+    "overlap_matrix": overlap_matrix,
+    "pb_progress": pb_progress,
+    "runner_stats": runner_stats,
+    "runner_stats_by_period": runner_stats_by_period,
+    "top_co_runners": top_co_runners,
+}
+
+def event_name(id_: int) -> str:
+    return f"{EVENT_NAME_PREFIXES[id_ % len(EVENT_NAME_PREFIXES)]} {id_}"
+
+def synthetic_events_json() -> str:
+    """
+    Return an events.json with NUM_EVENTS adult events in the UK.
+    """
+
+    return json.dumps({
+        "countries": {
+            "0": {"url": None, "bounds": [0, 0, 0, 0]},
+            "97": {"url": "www.parkrun.org.uk", "bounds": [-8.6, 49.9, 1.8, 60.9]},
+        },
+        "events": {"features": [
+            {
+                "id": id_,
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [-0.1 + id_ / 100, 51.5]},
+                "properties": {
+                    "eventname": f"event{id_}",
+                    "EventLongName": f"{event_name(id_)} parkrun",
+                    "EventShortName": event_name(id_),
+                    "countrycode": 97,
+                    "seriesid": 1,
+                },
+            }
+            for id_ in range(1, NUM_EVENTS + 1)
+        ]},
+    })
+
+def synthetic_runner_page(number: int, num_results: int) -> str:
+    """
+    Return a runner results page laid out like the parkrun website with the
+    given number of weekly results, most recent first.
+    """
+
+    rng = random.Random(number)
+    date: datetime.date = parkrun.api.cache.most_recent_parkrun().date()
+    rows: list[str] = []
+    for run_number in range(num_results, 0, -1):
+        event_id: int = rng.randint(1, NUM_EVENTS)
+        seconds: int = rng.randint(16 * 60, 40 * 60)
+        rows.append(
+            f'<tr><td><a href="https://www.parkrun.org.uk/event{event_id}/results/">{event_name(event_id)}</a></td>'
+            f'<td><a href="https://www.parkrun.org.uk/event{event_id}/results/{run_number}/"><span class="format-date">{date:%d/%m/%Y}</span></a></td>'
+            f'<td>{run_number}</td><td>{rng.randint(1, 500)}</td><td>{seconds // 60}:{seconds % 60:02}</td>'
+            f'<td>{rng.uniform(40, 80):.2f}%</td><td>{"PB" if rng.random() < 0.05 else ""}</td></tr>'
+        )
+        date -= datetime.timedelta(weeks=1)
+
+    return (
+        "<html><body>"
+        f"<h2>Runner {number} <span>(A{number})</span></h2>"
+        f"<p>{num_results} parkruns total<br/>Most recent age category was SM30-34</p>"
+        '<table id="results"><tr><th>Summary</th></tr></table>'
+        '<table id="results"><tr><th>Events</th></tr></table>'
+        '<table id="results"><tr><th>Event</th><th>Run Date</th><th>Run Number</th><th>Pos</th><th>Time</th><th>Age Grade</th><th>PB?</th></tr>'
+        + "".join(rows)
+        + "</table></body></html>"
+    )
+
+def synthetic_event_page(num_finishers: int) -> str:
+    """
+    Return an event result page laid out like the parkrun website with the
+    given number of finishers.
+    """
+
+    rng = random.Random(num_finishers)
+    rows: list[str] = []
+    for position in range(1, num_finishers + 1):
+        seconds: int = 15 * 60 + position * 2
+        name: str = escape(f"Runner O'{position}")
+        rows.append(
+            f'<tr class="Results-table-row" data-name="{name}" data-agegroup="SM30-34" data-club="" data-gender="Male" '
+            f'data-position="{position}" data-runs="{rng.randint(1, 500)}" data-vols="0" data-agegrade="{rng.uniform(40, 80):.2f}" '
+            'data-achievement="" data-groups="">'
+            f'<td>{position}</td><td><div class="compact"><a href="https://www.parkrun.org.uk/event1/parkrunner/{position}">{name}</a></div></td>'
+            '<td><div class="compact">Male</div></td><td><div class="compact">SM30-34</div></td><td></td>'
+            f'<td><div class="compact">{seconds // 60}:{seconds % 60:02}</div></td></tr>'
+        )
+
+    return (
+        f'<html><body><div class="Results-header"><h1>{event_name(1)} parkrun</h1>'
+        '<h3><span class="format-date">12/04/2025</span><span>#1</span></h3></div>'
+        "<table><tr><th>Position</th></tr>"
+        + "".join(rows)
+        + "</table><table><tr><td>Volunteer</td></tr></table></body></html>"
+    )
+
+def read_fixture(file_name: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, file_name), encoding="utf-8") as f:
+        return f.read()
+
+def clear_memoised() -> None:
+    """
+    Clear everything memoised in memory so each call reads from the cache.
+    """
+
+    scraper.fetch.cache_clear()
+    scraper.fetch_event_result.cache_clear()
+    scraper_runner.clear_runner_memory()
+
+class Benchmarks:
+    """
+    Time functions and collect the results.
+    """
+
+    def __init__(self, repeat: int, min_secs: float):
+        self.repeat: int = repeat
+        self.min_secs: float = min_secs
+        self.results: list[dict] = []
+
+    def time(self, name: str, size: int | str | None, func: Callable[[], object]) -> None:
+        """
+        Time calling func. Each repeat calls func enough times to take at least
+        min_secs.
+        """
+
+        timer = timeit.Timer(func)
+        number: int = 1
+        while self.min_secs > 0 and timer.timeit(number) < self.min_secs:
+            number *= 2
+
+        times: list[float] = [time_secs / number for time_secs in timer.repeat(self.repeat, number)]
+        self.results.append({
+            "name": name,
+            "size": size,
+            "number": number,
+            "repeat": self.repeat,
+            "min_secs": min(times),
+            "mean_secs": sum(times) / len(times),
+        })
+        print(f"{name}[{size}]: {min(times) * 1000:.3f} ms", file=sys.stderr)
+
+def time_imports(benchmarks: Benchmarks) -> None:
+    """
+    Time starting Python and importing the package, each table and graph and
+    the command-line interface in a new process so nothing is already imported.
+    """
+
+    modules: list[str] = ["parkrun", "parkrun.graphs.activity", "parkrun.graphs.times"] + sorted({table_func.__module__ for table_func in TABLE_FUNCS.values()})
+    for module in modules:
+        benchmarks.time("import", module, lambda: subprocess.run([sys.executable, "-c", f"import {module}"], check=True))
+    cli_path: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cli.py")
+    benchmarks.time("import", "cli.py --help", lambda: subprocess.run([sys.executable, cli_path, "--help"], check=True, stdout=subprocess.DEVNULL))
+
+def run(benchmarks: Benchmarks, runner_sizes: tuple[int], event_sizes: tuple[int]) -> None:
+
+    # Write all the pages to the cache
+    parkrun.api.cache.write_cache_str("events", "events.json", synthetic_events_json())
+    runner_pages: dict[int, str] = {size: synthetic_runner_page(size, size) for size in runner_sizes}
+    for number, page in runner_pages.items():
+        parkrun.api.cache.write_cache_str("runner_results", f"{number}.html", page)
+    event_pages: dict[int, str] = {size: synthetic_event_page(size) for size in event_sizes}
+    for event_number, page in event_pages.items():
+        parkrun.api.cache.write_cache_str("event_result", f"event1-{event_number}.html", page)
+
+    all_events = scraper.fetch_events()
+    start_date: datetime.date = datetime.date.min
+    end_date: datetime.date = datetime.date.max
+
+    # Loading events
+    events_json: str = synthetic_events_json()
+    benchmarks.time("EventCollection", "events.json", lambda: EventCollection(json.loads(events_json)))
+    benchmarks.time("fetch_events", "index", lambda: (scraper._fetch_event_index.cache_clear(), scraper.fetch_events.cache_clear(), scraper.fetch_events()))
+
+    # Parsing
+    for fixture in ("runner_results.html", "runner_recent.html"):
+        page: str = read_fixture(fixture)
+        benchmarks.time("parse_runner_results_page", fixture, lambda: parse_runner_results_page(page))
+    page: str = read_fixture("event_result.html")
+    benchmarks.time("parse_event_result_page", "event_result.html", lambda: parse_event_result_page(page))
+
+    for size, page in runner_pages.items():
+        benchmarks.time("parse_runner_results_page", size, lambda: parse_runner_results_page(page))
+        fragment: str = extract_runner_results_fragment(page)
+        benchmarks.time("parse_runner_results_fragment", size, lambda: parse_runner_results_page(fragment))
+        benchmarks.time("fetch_runner_results", size, lambda: (clear_memoised(), scraper_runner.fetch_runner_results(size, start_date, end_date)))
+    for size, page in event_pages.items():
+        benchmarks.time("parse_event_result_page", size, lambda: parse_event_result_page(page))
+        fragment: str = extract_event_result_fragment(page)
+        benchmarks.time("parse_event_result_fragment", size, lambda: parse_event_result_page(fragment))
+        benchmarks.time("fetch_event_result", size, lambda: (clear_memoised(), scraper.fetch_event_result(event_name(1), size)))
+
+    # Runner construction and each lazily calculated stat
+    stat_names: list[str] = [name for name, attr in vars(Runner).items() if isinstance(attr, cached_property)]
+    for size in runner_sizes:
+        _, most_recent_age_cat_str, rows = parse_runner_results_page(runner_pages[size])
+        benchmarks.time("Runner", size, lambda: Runner(size, "Name", AgeCategory(most_recent_age_cat_str), RunnerResults.from_table(rows, all_events), start_date, end_date))
+        runner = Runner(size, "Name", AgeCategory(most_recent_age_cat_str), RunnerResults.from_table(rows, all_events), start_date, end_date)
+        for stat_name in stat_names:
+            benchmarks.time(f"Runner.{stat_name}", size, lambda: vars(Runner)[stat_name].func(runner))
+        year_ago: datetime.date = datetime.date.today() - datetime.timedelta(days=365)
+        benchmarks.time("Runner.slice", size, lambda: runner.slice(year_ago, end_date).floating_streak)
+
+    # Achievements and tables, with the runners already fetched
+    benchmarks.time("_calc_achievements", None, lambda: (_calc_achievements.cache_clear(), _calc_achievements()))
+    clear_memoised()
+    runner_ids: list[int] = list(runner_sizes)
+    scraper_runner.fetch_many_runner_results(runner_ids, start_date, end_date)
+    for table_name, table_func in TABLE_FUNCS.items():
+        def render() -> None:
+            with contextlib.redirect_stdout(io.StringIO()):
+                table_func(runner_ids, start_date, end_date)
+        benchmarks.time(table_name, len(runner_ids), render)
+
+    # Fetching runners through a stand-in for the network with some latency,
+    # ignoring the cached pages
+    use_adapter(FixtureAdapter({f"https://www.parkrun.org.uk/parkrunner/{number}/all/": page for number, page in runner_pages.items()}, FETCH_LATENCY))
+    parkrun._CACHE_FORCE_VALID = False
+    parkrun._CACHE_FORCE_INVALID = True
+    benchmarks.time("fetch_many_runner_results", len(runner_ids), lambda: (clear_memoised(), scraper_runner.fetch_many_runner_results(runner_ids, start_date, end_date)))
+    use_adapter(None)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark parsing, statistics and tables offline and output the timings as JSON.")
+    parser.add_argument("-o", "--output", type=Path, help="File to write the JSON results to, defaulting to standard output")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="Number of times to repeat each benchmark, reporting the minimum and mean")
+    parser.add_argument("--min-secs", type=float, default=0.2, help="Minimum number of seconds each repeat should take, calling the function more times if needed. 0 calls it once.")
+    parser.add_argument("--quick", action="store_true", help="Only use the smallest sizes, run each benchmark once and don't time imports, e.g. to check the benchmarks still run. The timings aren't reliable.")
+    parser.add_argument("--no-imports", action="store_true", help="Don't time how long it takes to import each module in a new process")
+    args = parser.parse_args()
+
+    # Don't log every cache hit or forced cache miss
+    logging.getLogger().setLevel(logging.ERROR)
+
+    if args.quick:
+        args.repeat, args.min_secs, args.no_imports = 1, 0.0, True
+
+    benchmarks = Benchmarks(args.repeat, args.min_secs)
+    if not args.no_imports:
+        time_imports(benchmarks)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        parkrun.api.cache.cache_dir = Path(cache_dir)
+        parkrun._CACHE_FORCE_VALID = True
+        parkrun._CACHE_FORCE_INVALID = False
+        parkrun._CACHE_BACKEND = "files"
+        parkrun._INCREMENTAL_REFRESH = False
+        parkrun.MIN_SECS_BETWEEN_QUERIES = 0
+        run(benchmarks, RUNNER_SIZES[:2] if args.quick else RUNNER_SIZES, EVENT_SIZES[:1] if args.quick else EVENT_SIZES)
+
+    output: str = json.dumps({
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "benchmarks": benchmarks.results,
+    }, indent=4)
+    if args.output is None:
+        print(output)
+    else:
+        args.output.write_text(output, encoding="utf-8")
+
+if __name__ == "__main__":
+    main()
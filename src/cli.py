@@ -5,44 +5,39 @@ parkrunners of choice.
 
 import argparse
 import datetime
+import importlib
+from pathlib import Path
 import parkrun
 from parkrun import ALL_PARKRUNNER_IDS
-from parkrun.graphs.activity import activity_graph
-from parkrun.graphs.times import time_graph
-from parkrun.tables.achievements import achievements
-from parkrun.tables.common_run_comparison import common_run_comparison
-from parkrun.tables.latest_update import latest_update
-from parkrun.tables.most_common import most_common_location, most_common_location_initial, most_common_month, most_common_time_seconds, most_common_year, most_common_country
-from parkrun.tables.pb_progress import pb_progress
-from parkrun.tables.runner_stats import runner_stats
-
-command_funcs: dict[str, callable] = {
-    "activity": activity_graph,
-    "times": time_graph,
-    "achievements": achievements,
-    "common_run_comparison": common_run_comparison,
-    "latest_update": latest_update,
-    "most_common_location": most_common_location,
-    "most_common_location_initial": most_common_location_initial,
-    "most_common_month": most_common_month,
-    "most_common_time_seconds": most_common_time_seconds,
-    "most_common_year": most_common_year,
-    "most_common_country": most_common_country,
-    "pb_progress": pb_progress,
-    "runner_stats": runner_stats,
-}
+from parkrun.commands import commands, commands_with_locations, commands_with_period, commands_without_dates, commands_without_runners
 
 parser = argparse.ArgumentParser(
     description="Print statistic tables or show graphs about parkrun results. The first positional argument must be the table or graph to show and all subsequent positional arguments must be integer parkrunner IDs of those to show. If no parkrunner IDs are given, use all environment variables starting with PARKRUNNER_ (e.g. those in the .env file)."
 )
 
-parser.add_argument("command", choices=command_funcs.keys(), help="The table or graph to run")
+parser.add_argument("command", choices=commands.keys(), help="The table or graph to run")
 parser.add_argument("runner", type=lambda arg: int(arg) if arg.isnumeric() else arg, nargs="*", help="Parkrunners to analyse. If none are given, use all environment variables starting with PARKRUNNER_ (e.g. those in the .env file). For each integer, use that as the parkrunner's ID. For each string, use the environment variable PARKRUNNER_<argument>.")
 parser.add_argument("-s", "--start", type=datetime.date.fromisoformat, nargs="?", default=datetime.date.min, help="Date to start from, in any format accepted by datetime.date.fromisoformat, defaulting to forever")
 parser.add_argument("-e", "--end", type=datetime.date.fromisoformat, nargs="?", default=datetime.date.max, help="Date to end at, in any format accepted by datetime.date.fromisoformat, defaulting to forever")
+parser.add_argument("-p", "--period", choices=("year", "quarter", "month"), default="year", help="The period to group results by for the runner_stats_by_period command, defaulting to year")
+parser.add_argument("-l", "--location", action="append", help="A location to fetch the full history of event results of for the crawl_event_results command. Can be given multiple times.")
+parser.add_argument("-c", "--country", help="A country, by name or top-level domain (e.g. UK), to fetch the full history of event results of every location in for the crawl_event_results command.")
 parser.add_argument("--cache-force-valid", action=argparse.BooleanOptionalAction, help="Force existing cache to be used even if out of date. This overrides the CACHE_FORCE_VALID environment variable, if it was set. This can be useful if you know it's up to date, but the current time is in the window where it's not certain results have come out yet so keeps refreshing.")
 parser.add_argument("--cache-force-invalid", action=argparse.BooleanOptionalAction, help="Force cache to be updated even if existing up to date cache exists. This overrides the CACHE_FORCE_INVALID environment variable, if it was set. This can be useful if results came out outside the window where it thinks they should have.")
+parser.add_argument("--cache-backend", choices=("files", "sqlite"), help="Where to store the cache: 'files' stores a file per page and 'sqlite' stores everything in one SQLite database. This overrides the CACHE_BACKEND environment variable, if it was set. Run the migrate_cache command to import the files into the SQLite database.")
+parser.add_argument("--cache-compression", choices=("none", "gzip", "zstd"), help="How to compress pages and parsed results written to the cache. Files with the same contents share the same compressed copy. zstd needs the zstandard package installed. Whatever this is, existing files in the cache are still read. This overrides the CACHE_COMPRESSION environment variable, if it was set.")
+parser.add_argument("--cache-page-mode", choices=("fragment", "full"), help="Whether to cache just the parts of runner and event result pages that are parsed ('fragment') or the whole pages ('full'), e.g. for debugging the parsers. This overrides the CACHE_PAGE_MODE environment variable, if it was set.")
+parser.add_argument("--incremental-refresh", action=argparse.BooleanOptionalAction, help="When a parkrunner's cached results are out of date, only fetch their recent results and merge them in rather than fetching all their results again. This overrides the INCREMENTAL_REFRESH environment variable, if it was set.")
 parser.add_argument("--table-max-width", type=int, help="The maximum number of characters wide that tables to be printed should be so they fit in your terminal. This overrides the TABLE_MAX_WIDTH environment variable, if it was set.")
+parser.add_argument("--min-secs-between-queries", type=float, help="The minimum number of seconds between queries to the same parkrun website, on average. This overrides the MIN_SECS_BETWEEN_QUERIES environment variable, if it was set.")
+parser.add_argument("--rate-limit-burst", type=int, help="The maximum number of queries that can be made to the same parkrun website in quick succession after not querying it for a while. This overrides the RATE_LIMIT_BURST environment variable, if it was set.")
+parser.add_argument("--fetch-max-workers", type=int, help="The maximum number of parkrunners' results to fetch from the website at once. This overrides the FETCH_MAX_WORKERS environment variable, if it was set.")
+parser.add_argument("--memory-cache-max-entries", type=int, help="The maximum number of pages, parkrunners and event results to keep in memory while running. This overrides the MEMORY_CACHE_MAX_ENTRIES environment variable, if it was set.")
+parser.add_argument("--memory-cache-max-bytes", type=int, help="The maximum estimated total size in bytes of the pages, parkrunners and event results to keep in memory while running. This overrides the MEMORY_CACHE_MAX_BYTES environment variable, if it was set.")
+parser.add_argument("--daemon", action=argparse.BooleanOptionalAction, default=True, help="Run tables in the daemon started by the daemon command, if it is running, which keeps everything in memory so is much faster. Tables are always run locally if any of the options that override environment variables or --fixtures-dir are given, since the daemon doesn't use them.")
+parser.add_argument("--daemon-port", type=int, help="The port on localhost that the daemon listens on. This overrides the DAEMON_PORT environment variable, if it was set.")
+parser.add_argument("--fixtures-dir", type=Path, help="Serve pages from this directory instead of querying the parkrun websites, e.g. for testing without the network. The first directory is the host and index.html files are served at their directory, e.g. www.parkrun.org.uk/parkrunner/1/all/index.html.")
+parser.add_argument("--fixtures-latency", type=float, default=0.0, help="The number of seconds to wait before serving each page from --fixtures-dir, to simulate the network.")
 
 args = parser.parse_args()
 
@@ -69,8 +64,65 @@ if args.cache_force_invalid:
     parkrun._CACHE_FORCE_INVALID = True
 elif args.cache_force_invalid is not None:
     parkrun._CACHE_FORCE_INVALID = False
+if args.cache_backend is not None:
+    parkrun._CACHE_BACKEND = args.cache_backend
+if args.cache_compression is not None:
+    parkrun._CACHE_COMPRESSION = args.cache_compression
+if args.cache_page_mode is not None:
+    parkrun._CACHE_PAGE_MODE = args.cache_page_mode
+if args.incremental_refresh is not None:
+    parkrun._INCREMENTAL_REFRESH = args.incremental_refresh
 if args.table_max_width is not None:
     parkrun._TABLE_MAX_WIDTH = args.table_max_width
+if args.min_secs_between_queries is not None:
+    parkrun.MIN_SECS_BETWEEN_QUERIES = args.min_secs_between_queries
+if args.rate_limit_burst is not None:
+    parkrun._RATE_LIMIT_BURST = args.rate_limit_burst
+if args.fetch_max_workers is not None:
+    parkrun._FETCH_MAX_WORKERS = args.fetch_max_workers
+if args.memory_cache_max_entries is not None:
+    parkrun._MEMORY_CACHE_MAX_ENTRIES = args.memory_cache_max_entries
+if args.memory_cache_max_bytes is not None:
+    parkrun._MEMORY_CACHE_MAX_BYTES = args.memory_cache_max_bytes
+if args.daemon_port is not None:
+    parkrun._DAEMON_PORT = args.daemon_port
+
+if args.fixtures_dir is not None:
+    from parkrun.api.transport import FixtureAdapter, use_adapter
+    use_adapter(FixtureAdapter.from_directory(args.fixtures_dir, args.fixtures_latency))
 
-# Call the function with the runner ids
-command_funcs[args.command](runner_ids, start_date=args.start, end_date=args.end)
+# The daemon runs with its own settings so only use it if none were overridden
+overridden: bool = args.fixtures_dir is not None or any(
+    value is not None for name, value in vars(args).items()
+    if name.startswith(("cache_", "incremental_", "table_", "min_", "rate_", "fetch_", "memory_"))
+)
+
+module_name, func_name = commands[args.command]
+if args.command in commands_without_runners:
+    kwargs: dict = dict()
+elif args.command in commands_with_locations:
+    kwargs: dict = {"location_names": args.location, "country": args.country}
+elif args.command in commands_without_dates:
+    kwargs: dict = dict()
+elif args.command in commands_with_period:
+    kwargs: dict = {"start_date": args.start, "end_date": args.end, "period": args.period}
+else:
+    kwargs: dict = {"start_date": args.start, "end_date": args.end}
+
+# Run tables in the daemon if it is running
+output: str | None = None
+if args.daemon and not overridden:
+    from parkrun.api.daemon import can_run_in_daemon, run_in_daemon
+    if can_run_in_daemon(args.command):
+        output = run_in_daemon(args.command, runner_ids, kwargs)
+
+if output is not None:
+    print(output, end="")
+
+# Otherwise import the command's function and call it with the runner ids
+else:
+    func: callable = getattr(importlib.import_module(module_name), func_name)
+    if args.command in commands_without_runners or args.command in commands_with_locations:
+        func(**kwargs)
+    else:
+        func(runner_ids, **kwargs)
@@ -43,8 +43,10 @@ try:
     from parkrun.tables.common_run_comparison import common_run_comparison
     from parkrun.tables.latest_update import latest_update
     from parkrun.tables.most_common import most_common_year, most_common_location, most_common_location_initial, most_common_month, most_common_time_seconds
+    from parkrun.tables.overlap import overlap_matrix, top_co_runners
     from parkrun.tables.pb_progress import pb_progress
     from parkrun.tables.runner_stats import runner_stats
+    from parkrun.tables.runner_stats_by_period import runner_stats_by_period
 
     #achievements(runner_ids, start_date, end_date)
     #common_run_comparison(runner_ids, start_date, end_date)
@@ -54,8 +56,11 @@ try:
     #most_common_location_initial(runner_ids, start_date, end_date)
     #most_common_month(runner_ids, start_date, end_date)
     #most_common_time_seconds(runner_ids, start_date, end_date)
+    #overlap_matrix(runner_ids, start_date, end_date)
+    #top_co_runners(runner_ids, start_date, end_date)
     #pb_progress(runner_ids, start_date, end_date)
     runner_stats(runner_ids, start_date, end_date)
+    #runner_stats_by_period(runner_ids, start_date, end_date)
 
 except ParkrunException as e:
     print(e)
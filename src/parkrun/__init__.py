@@ -1,6 +1,5 @@
 import dotenv
 import os
-from distutils.util import strtobool
 import logging
 
 # Log to stderr, DEBUG and above, only from this package
@@ -18,15 +17,18 @@ dotenv.load_dotenv()
 
 def _my_strtobool(env_var_name: str, default: bool) -> bool:
     """
-    Given the name of an environment variable to search for, use strtobool from
-    distutils to read it as a boolean and return the default if it's not present
-    or invalid according to strtobool.
+    Given the name of an environment variable to search for, read it as a
+    boolean the same way as strtobool from distutils and return the default if
+    it's not present or invalid according to strtobool. This doesn't use
+    distutils itself because it is slow to import and removed in Python 3.12.
     """
 
-    try:
-        return bool(strtobool(os.getenv(env_var_name, "invalid")))
-    except ValueError:
-        return default
+    value: str = os.getenv(env_var_name, "invalid").lower()
+    if value in ("y", "yes", "t", "true", "on", "1"):
+        return True
+    if value in ("n", "no", "f", "false", "off", "0"):
+        return False
+    return default
 
 PARKRUNNERS_ENV_NAME_TO_ID: dict[str, int] = dict()
 for key, value in os.environ.items():
@@ -40,7 +42,16 @@ ALL_PARKRUNNER_IDS: list[int] = PARKRUNNERS_ENV_NAME_TO_ID.values()
 _TABLE_MAX_WIDTH: int = int(os.getenv("TABLE_MAX_WIDTH", 180))
 _CACHE_FORCE_VALID: bool = _my_strtobool("CACHE_FORCE_VALID", False)
 _CACHE_FORCE_INVALID: bool = _my_strtobool("CACHE_FORCE_INVALID", False)
-MIN_SECS_BETWEEN_QUERIES: int = int(os.getenv("MIN_SECS_BETWEEN_QUERIES", 2))
+_INCREMENTAL_REFRESH: bool = _my_strtobool("INCREMENTAL_REFRESH", True)
+_CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "files").lower()
+_CACHE_COMPRESSION: str = os.getenv("CACHE_COMPRESSION", "gzip").lower()
+_CACHE_PAGE_MODE: str = os.getenv("CACHE_PAGE_MODE", "fragment").lower()
+MIN_SECS_BETWEEN_QUERIES: float = float(os.getenv("MIN_SECS_BETWEEN_QUERIES", 2))
+_RATE_LIMIT_BURST: int = int(os.getenv("RATE_LIMIT_BURST", 1))
+_FETCH_MAX_WORKERS: int = int(os.getenv("FETCH_MAX_WORKERS", 4))
+_MEMORY_CACHE_MAX_ENTRIES: int = int(os.getenv("MEMORY_CACHE_MAX_ENTRIES", 10000))
+_MEMORY_CACHE_MAX_BYTES: int = int(os.getenv("MEMORY_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+_DAEMON_PORT: int = int(os.getenv("DAEMON_PORT", 8642))
 
 def get_cache_force_valid() -> bool:
     return _CACHE_FORCE_VALID
@@ -48,5 +59,32 @@ def get_cache_force_valid() -> bool:
 def get_cache_force_invalid() -> bool:
     return _CACHE_FORCE_INVALID
 
+def get_cache_backend() -> str:
+    return _CACHE_BACKEND
+
+def get_cache_compression() -> str:
+    return _CACHE_COMPRESSION
+
+def get_cache_page_mode() -> str:
+    return _CACHE_PAGE_MODE
+
+def get_incremental_refresh() -> bool:
+    return _INCREMENTAL_REFRESH
+
 def get_table_max_width() -> int:
     return _TABLE_MAX_WIDTH
+
+def get_rate_limit_burst() -> int:
+    return _RATE_LIMIT_BURST
+
+def get_fetch_max_workers() -> int:
+    return _FETCH_MAX_WORKERS
+
+def get_memory_cache_max_entries() -> int:
+    return _MEMORY_CACHE_MAX_ENTRIES
+
+def get_memory_cache_max_bytes() -> int:
+    return _MEMORY_CACHE_MAX_BYTES
+
+def get_daemon_port() -> int:
+    return _DAEMON_PORT
@@ -1,9 +1,16 @@
 from datetime import datetime, timedelta, time, date
+import gzip
+import hashlib
+import io
 import logging
+import os
 from pathlib import Path
 import pickle
+import threading
+from typing import BinaryIO
 from platformdirs import user_cache_dir
-from parkrun import get_cache_force_valid, get_cache_force_invalid
+from parkrun import get_cache_backend, get_cache_compression, get_cache_force_valid, get_cache_force_invalid
+from parkrun.api.parkrun_exception import ParkrunException
 
 logger = logging.getLogger(__name__)
 
@@ -19,8 +26,20 @@ HR_RESULT_END: int = 13
 
 ENCODING = "utf-8"
 
+# The first bytes of gzip and zstd compressed data, used to detect whether
+# something in the cache is compressed so uncompressed files still work
+GZIP_MAGIC: bytes = b"\x1f\x8b"
+ZSTD_MAGIC: bytes = b"\x28\xb5\x2f\xfd"
+
+# When compressing, each file in the cache just contains this followed by the
+# SHA-256 hash of its contents, which are compressed in a blob named after the
+# hash in BLOBS_DIR_NAME. Files with the same contents therefore share a blob.
+BLOB_MAGIC: bytes = b"parkrun-blob:"
+BLOBS_DIR_NAME: str = "blobs"
+
 TYPES_CACHE_VALID_FOREVER = (
-    "event_result"
+    "event_result",
+    "event_result_parsed",
 )
 
 def most_recent_parkrun(reference: datetime = None) -> datetime:
@@ -93,50 +112,213 @@ def parkrun_before(reference: datetime.date) -> datetime.date:
     reference = datetime.combine(reference, time.min)
     return most_recent_parkrun(reference).date()
 
-def check_cache(type_name: str, file_name: str) -> None | bytes:
+def is_fresh(type_name: str, file_name: str, modified: datetime, allow_stale: bool = False) -> bool:
     """
-    If the data of type `type_name` and name `file_name` is in the cache and
-    valid then return the file's contents as bytes. Otherwise, return None.
-    The cache is invalidated if it is older than when results were probably all
-    out for the most recent parkrun. If the environment variable
-    `CACHE_FORCE_VALID` is set to true and the desired file is in the cache then
-    don't update it even if it's stale. This can be useful if you know it's up
-    to date, but the current time is in the window where it's not certain
-    results have come out yet so keeps refreshing.
+    Return whether the data of type `type_name` and name `file_name` that was
+    last modified at the given time is valid. See `check_cache` for when the
+    cache is valid. If `allow_stale` is true then it is always valid.
     """
 
-    sub_cache_dir: Path = cache_dir / type_name
-    if not sub_cache_dir.exists():
-        logger.debug("miss: Type dir '%s' doesn't exist", type_name)
-        return None
-
-    file_path: Path = sub_cache_dir / file_name
-    if not file_path.exists():
-        logger.debug("miss: File '%s' doesn't exist within existing type dir '%s'", file_name, type_name)
-        return None
+    if allow_stale:
+        return True
 
     # If the file in the cache is older than the most recent parkrun then
     # there might be updates so treat the cache as invalid, unless the
     # environment variable overrides it
-    modified: datetime = datetime.fromtimestamp(file_path.stat().st_mtime)
     if type_name not in TYPES_CACHE_VALID_FOREVER and modified < most_recent_parkrun():
         if get_cache_force_valid():
             logger.warning("force: Existing file '%s' within type dir '%s' is out of date but being used anyway", file_name, type_name)
         else:
             logger.debug("miss: Existing file '%s' within type dir '%s' is out of date", file_name, type_name)
-            return None
+            return False
 
     # Even if the cache is up to date, if the environment variable overrides
     # it then treat as a cache miss
     elif get_cache_force_invalid():
         logger.warning("force: Existing file '%s' within type dir '%s' is in date but being ignored", file_name, type_name)
+        return False
+
+    return True
+
+def _valid_cache_path(type_name: str, file_name: str, allow_stale: bool = False) -> None | Path:
+    """
+    If the data of type `type_name` and name `file_name` is in the cache and
+    valid then return the path to the file. Otherwise, return None. See
+    `check_cache` for when the cache is valid.
+    """
+
+    sub_cache_dir: Path = cache_dir / type_name
+    if not sub_cache_dir.exists():
+        logger.debug("miss: Type dir '%s' doesn't exist", type_name)
+        return None
+
+    file_path: Path = sub_cache_dir / file_name
+    if not file_path.exists():
+        logger.debug("miss: File '%s' doesn't exist within existing type dir '%s'", file_name, type_name)
+        return None
+
+    modified: datetime = datetime.fromtimestamp(file_path.stat().st_mtime)
+    if not is_fresh(type_name, file_name, modified, allow_stale):
+        return None
+
+    return file_path
+
+def last_modified(type_name: str, file_name: str) -> None | datetime:
+    """
+    Return when the data of type `type_name` and name `file_name` was last
+    modified, whether or not it is valid, or None if it isn't in the cache.
+    """
+
+    if get_cache_backend() == "sqlite":
+        from parkrun.api import cache_sqlite
+        return cache_sqlite.last_modified(type_name, file_name)
+
+    file_path: Path = cache_dir / type_name / file_name
+    if not file_path.exists():
+        return None
+    return datetime.fromtimestamp(file_path.stat().st_mtime)
+
+def is_cache_valid(type_name: str, file_name: str) -> bool:
+    """
+    Return whether the data of type `type_name` and name `file_name` is in the
+    cache and valid, without reading it. See `check_cache` for when the cache is
+    valid.
+    """
+
+    if get_cache_backend() == "sqlite":
+        from parkrun.api import cache_sqlite
+        return cache_sqlite.is_cache_valid(type_name, file_name)
+
+    return _valid_cache_path(type_name, file_name) is not None
+
+def mark_fresh(type_name: str, file_name: str, modified: datetime) -> bool:
+    """
+    Set the time the data of type `type_name` and name `file_name` in the cache
+    was last modified, even if that is in the future. This is used to mark data
+    as valid until the next parkrun once it is known to contain the results of
+    the most recent parkrun, by setting it to the end of the results window.
+    Return whether it is in the cache.
+    """
+
+    if get_cache_backend() == "sqlite":
+        from parkrun.api import cache_sqlite
+        return cache_sqlite.mark_fresh(type_name, file_name, modified.timestamp())
+
+    file_path: Path = cache_dir / type_name / file_name
+    if not file_path.exists():
+        return False
+
+    os.utime(file_path, (modified.timestamp(), modified.timestamp()))
+    logger.debug("fresh: %s/%s until %s", type_name, file_name, modified)
+    return True
+
+def _zstandard():
+    """
+    Return the zstandard module, which is an optional dependency.
+    """
+
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ParkrunException("The zstandard package must be installed to use CACHE_COMPRESSION=zstd", e)
+    return zstandard
+
+def compress(contents: bytes) -> bytes:
+    """
+    Compress the given contents with the algorithm chosen by the
+    `CACHE_COMPRESSION` environment variable, if any.
+    """
+
+    compression: str = get_cache_compression()
+    if compression == "gzip":
+        return gzip.compress(contents, mtime=0)
+    if compression == "zstd":
+        return _zstandard().ZstdCompressor().compress(contents)
+    return contents
+
+def open_decompressed(f: BinaryIO) -> BinaryIO:
+    """
+    Return a file object which streams the decompressed contents of the given
+    seekable file object, detecting how it was compressed (if at all) from its
+    first bytes. Closing the returned file object closes the given one.
+    """
+
+    magic: bytes = f.read(len(ZSTD_MAGIC))
+    f.seek(0)
+    if magic.startswith(GZIP_MAGIC):
+        decompressed = gzip.GzipFile(fileobj=f)
+        decompressed.myfileobj = f # So closing it closes f, like gzip.open
+        return decompressed
+    if magic == ZSTD_MAGIC:
+        # Buffer it since pickle needs readline
+        return io.BufferedReader(_zstandard().ZstdDecompressor().stream_reader(f, closefd=True))
+    return f
+
+def _blob_path(digest: str) -> Path:
+    return cache_dir / BLOBS_DIR_NAME / digest[:2] / digest
+
+def open_cache_file(file_path: Path) -> BinaryIO:
+    """
+    Return a file object which streams the decompressed contents of the given
+    file in the cache directory, following it to its blob if it has one.
+    """
+
+    f = open(file_path, "rb")
+    if f.read(len(BLOB_MAGIC)) == BLOB_MAGIC:
+        with f:
+            digest: str = f.read().decode(ENCODING)
+        f = open(_blob_path(digest), "rb")
+    else:
+        f.seek(0)
+
+    return open_decompressed(f)
+
+def open_cache(type_name: str, file_name: str, allow_stale: bool = False) -> None | BinaryIO:
+    """
+    The same as check_cache but return a file object which streams the
+    contents rather than reading them all at once.
+    """
+
+    if get_cache_backend() == "sqlite":
+        from parkrun.api import cache_sqlite
+        contents: bytes | None = cache_sqlite.check_cache(type_name, file_name, allow_stale)
+        return None if contents is None else open_decompressed(io.BytesIO(contents))
+
+    file_path: Path | None = _valid_cache_path(type_name, file_name, allow_stale)
+    if file_path is None:
+        return None
+
+    try:
+        f: BinaryIO = open_cache_file(file_path)
+    except FileNotFoundError:
+        logger.debug("miss: Blob of file '%s' within type dir '%s' doesn't exist", file_name, type_name)
         return None
 
     logger.debug("hit: %s/%s", type_name, file_name)
-    with open(file_path, "rb") as f:
+    return f
+
+def check_cache(type_name: str, file_name: str, allow_stale: bool = False) -> None | bytes:
+    """
+    If the data of type `type_name` and name `file_name` is in the cache and
+    valid then return the file's contents as bytes. Otherwise, return None.
+    The cache is invalidated if it is older than when results were probably all
+    out for the most recent parkrun. If the environment variable
+    `CACHE_FORCE_VALID` is set to true and the desired file is in the cache then
+    don't update it even if it's stale. This can be useful if you know it's up
+    to date, but the current time is in the window where it's not certain
+    results have come out yet so keeps refreshing. If `allow_stale` is true
+    then return the contents even if it's out of date. The contents are
+    decompressed if they were compressed.
+    """
+
+    f: BinaryIO | None = open_cache(type_name, file_name, allow_stale)
+    if f is None:
+        return None
+
+    with f:
         return f.read()
 
-def check_cache_str(type_name: str, file_name: str) -> None | str:
+def check_cache_str(type_name: str, file_name: str, allow_stale: bool = False) -> None | str:
     """
     If the data of type `type_name` and name `file_name` is in the cache and
     valid then return the file's contents as a string. Otherwise, return None.
@@ -145,15 +327,16 @@ def check_cache_str(type_name: str, file_name: str) -> None | str:
     `CACHE_FORCE_VALID` is set to true and the desired file is in the cache then
     don't update it even if it's stale. This can be useful if you know it's up
     to date, but the current time is in the window where it's not certain
-    results have come out yet so keeps refreshing.
+    results have come out yet so keeps refreshing. If `allow_stale` is true
+    then return the contents even if it's out of date.
     """
 
-    cache: str | None = check_cache(type_name, file_name)
+    cache: str | None = check_cache(type_name, file_name, allow_stale)
     if cache is None:
         return None
     return cache.decode(ENCODING)
 
-def check_cache_obj(type_name: str, file_name: str) -> None | object:
+def check_cache_obj(type_name: str, file_name: str, allow_stale: bool = False) -> None | object:
     """
     If the data of type `type_name` and name `file_name` is in the cache and
     valid then decode the file's contents with pickle and return as an object.
@@ -163,30 +346,96 @@ def check_cache_obj(type_name: str, file_name: str) -> None | object:
     `CACHE_FORCE_VALID` is set to true and the desired file is in the cache then
     don't update it even if it's stale. This can be useful if you know it's up
     to date, but the current time is in the window where it's not certain
-    results have come out yet so keeps refreshing.
+    results have come out yet so keeps refreshing. If `allow_stale` is true
+    then return the contents even if it's out of date.
     """
 
-    cache: str | None = check_cache(type_name, file_name)
-    if cache is None:
+    f: BinaryIO | None = open_cache(type_name, file_name, allow_stale)
+    if f is None:
         return None
-    return pickle.loads(cache)
+
+    with f:
+        return pickle.load(f)
+
+def _write_blob(contents: bytes) -> str:
+    """
+    Write the compressed contents to their blob unless it already exists and
+    return their hash.
+    """
+
+    digest: str = hashlib.sha256(contents).hexdigest()
+    blob_path: Path = _blob_path(digest)
+    if blob_path.exists():
+        logger.debug("dedupe: Blob '%s' already exists", digest)
+        return digest
+
+    # Write to a temporary file first so other threads never read half a blob
+    blob_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path: Path = blob_path.with_name(f"{digest}.{threading.get_ident()}.tmp")
+    with open(temp_path, "wb") as f:
+        f.write(compress(contents))
+    os.replace(temp_path, blob_path)
+    return digest
 
 def write_cache(type_name: str, file_name: str, contents: bytes) -> None:
     """
     Write the given contents to the given file name of the given type in the
-    cache.
+    cache, compressed according to the `CACHE_COMPRESSION` environment
+    variable. With the file backend, compressed contents are stored in a blob
+    shared by all files with the same contents.
     """
 
+    if get_cache_backend() == "sqlite":
+        from parkrun.api import cache_sqlite
+        cache_sqlite.write_cache(type_name, file_name, compress(contents))
+        return
+
     sub_cache_dir: Path = cache_dir / type_name
-    if not sub_cache_dir.exists():
-        sub_cache_dir.mkdir()
+    sub_cache_dir.mkdir(exist_ok=True)
+
+    if get_cache_compression() != "none":
+        contents = BLOB_MAGIC + _write_blob(contents).encode(ENCODING)
 
+    # Write to a temporary file first so other threads never read half a file
+    # or a pointer to a blob that's only partly written
     file_path: Path = sub_cache_dir / file_name
-    with open(file_path, "wb") as f:
+    temp_path: Path = file_path.with_name(f"{file_name}.{threading.get_ident()}.tmp")
+    with open(temp_path, "wb") as f:
         f.write(contents)
+    os.replace(temp_path, file_path)
 
     logger.debug("update: %s/%s", type_name, file_name)
 
+def collect_garbage_blobs() -> None:
+    """
+    Delete every blob that no file in the cache directory points to any more,
+    e.g. since the file has been updated with different contents. Blobs are
+    shared so can't be deleted when a file is updated without checking every
+    other file. Don't run this while other commands are writing to the cache
+    since a blob could be deleted just before a new file points to it.
+    """
+
+    blobs_dir: Path = cache_dir / BLOBS_DIR_NAME
+    if not blobs_dir.is_dir():
+        return
+
+    referenced: set[str] = set()
+    for sub_cache_dir in cache_dir.iterdir():
+        if not sub_cache_dir.is_dir() or sub_cache_dir.name == BLOBS_DIR_NAME:
+            continue
+        for file_path in sub_cache_dir.iterdir():
+            with open(file_path, "rb") as f:
+                if f.read(len(BLOB_MAGIC)) == BLOB_MAGIC:
+                    referenced.add(f.read().decode(ENCODING))
+
+    deleted: int = 0
+    for blob_path in blobs_dir.glob("*/*"):
+        if blob_path.name not in referenced and not blob_path.name.endswith(".tmp"):
+            blob_path.unlink()
+            deleted += 1
+
+    logger.info("Deleted %d blobs no longer in use", deleted)
+
 def write_cache_str(type_name: str, file_name: str, contents: str) -> None:
     """
     Write the given contents to the given file name of the given type in the
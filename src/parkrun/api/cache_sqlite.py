@@ -0,0 +1,393 @@
+"""
+Store the cache in a single SQLite database rather than a file per page, used if
+the `CACHE_BACKEND` environment variable is `sqlite`. Pages are stored in the
+`pages` table and the parsed results of parkrunners and events are stored in
+normalised tables so they don't need parsing again. Validity is decided in the
+same way as the file cache, using the time each row was last modified.
+"""
+
+from datetime import datetime
+import logging
+from pathlib import Path
+import pickle
+import sqlite3
+import threading
+import time
+from parkrun.api import cache
+
+logger = logging.getLogger(__name__)
+
+DB_FILE_NAME: str = "cache.sqlite3"
+
+SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS pages (
+    type_name TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    contents BLOB NOT NULL,
+    modified REAL NOT NULL,
+    PRIMARY KEY (type_name, file_name)
+);
+
+CREATE TABLE IF NOT EXISTS runners (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    most_recent_age_category TEXT NOT NULL,
+    html_hash TEXT NOT NULL,
+    parser_version INTEGER NOT NULL,
+    modified REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS results (
+    runner_id INTEGER NOT NULL REFERENCES runners (id) ON DELETE CASCADE,
+    row_index INTEGER NOT NULL,
+    event_name TEXT NOT NULL,
+    date TEXT NOT NULL,
+    run_number INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    time TEXT NOT NULL,
+    age_grade TEXT NOT NULL,
+    pb TEXT NOT NULL,
+    PRIMARY KEY (runner_id, row_index)
+);
+CREATE INDEX IF NOT EXISTS results_date ON results (date);
+CREATE INDEX IF NOT EXISTS results_event_name_date ON results (event_name, date);
+
+CREATE TABLE IF NOT EXISTS events (
+    event_id INTEGER NOT NULL,
+    event_number INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    html_hash TEXT NOT NULL,
+    parser_version INTEGER NOT NULL,
+    modified REAL NOT NULL,
+    PRIMARY KEY (event_id, event_number)
+);
+CREATE INDEX IF NOT EXISTS events_date ON events (date);
+
+CREATE TABLE IF NOT EXISTS event_results (
+    event_id INTEGER NOT NULL,
+    event_number INTEGER NOT NULL,
+    row_index INTEGER NOT NULL,
+    runner_id INTEGER NOT NULL,
+    position TEXT NOT NULL,
+    name TEXT NOT NULL,
+    gender TEXT,
+    age_group TEXT,
+    age_grade TEXT,
+    club TEXT,
+    groups TEXT,
+    achievement TEXT,
+    time TEXT NOT NULL,
+    PRIMARY KEY (event_id, event_number, row_index),
+    FOREIGN KEY (event_id, event_number) REFERENCES events (event_id, event_number) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS event_results_runner_id ON event_results (runner_id);
+"""
+
+_local = threading.local()
+
+def _connection() -> sqlite3.Connection:
+    """
+    Return this thread's connection to the database in the cache directory,
+    creating the database if it doesn't exist.
+    """
+
+    db_path: Path = cache.cache_dir / DB_FILE_NAME
+    if getattr(_local, "db_path", None) != db_path:
+        connection = sqlite3.connect(db_path)
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.execute("PRAGMA foreign_keys = ON")
+        connection.executescript(SCHEMA)
+        _local.connection = connection
+        _local.db_path = db_path
+    return _local.connection
+
+def _date_to_iso(date: str) -> str:
+    """
+    Convert a date in the form DD/MM/YYYY to YYYY-MM-DD so it sorts correctly.
+    """
+    day, month, year = date.split("/")
+    return f"{year}-{month}-{day}"
+
+def _iso_to_date(iso: str) -> str:
+    """
+    Convert a date in the form YYYY-MM-DD back to DD/MM/YYYY.
+    """
+    year, month, day = iso.split("-")
+    return f"{day}/{month}/{year}"
+
+def check_cache(type_name: str, file_name: str, allow_stale: bool = False) -> None | bytes:
+    """
+    The same as cache.check_cache but reading from the pages table.
+    """
+
+    row: tuple | None = _connection().execute(
+        "SELECT contents, modified FROM pages WHERE type_name = ? AND file_name = ?",
+        (type_name, file_name),
+    ).fetchone()
+    if row is None:
+        logger.debug("miss: '%s' of type '%s' doesn't exist", file_name, type_name)
+        return None
+
+    contents, modified = row
+    if not cache.is_fresh(type_name, file_name, datetime.fromtimestamp(modified), allow_stale):
+        return None
+
+    logger.debug("hit: %s/%s", type_name, file_name)
+    return contents
+
+def is_cache_valid(type_name: str, file_name: str) -> bool:
+    """
+    The same as cache.is_cache_valid but reading from the pages table.
+    """
+
+    row: tuple | None = _connection().execute(
+        "SELECT modified FROM pages WHERE type_name = ? AND file_name = ?",
+        (type_name, file_name),
+    ).fetchone()
+    return row is not None and cache.is_fresh(type_name, file_name, datetime.fromtimestamp(row[0]))
+
+def last_modified(type_name: str, file_name: str) -> None | datetime:
+    """
+    The same as cache.last_modified but reading from the pages table.
+    """
+
+    row: tuple | None = _connection().execute(
+        "SELECT modified FROM pages WHERE type_name = ? AND file_name = ?",
+        (type_name, file_name),
+    ).fetchone()
+    return None if row is None else datetime.fromtimestamp(row[0])
+
+def write_cache(type_name: str, file_name: str, contents: bytes, modified: float | None = None) -> None:
+    """
+    The same as cache.write_cache but writing to the pages table. If given, use
+    `modified` as the time it was last modified rather than now.
+    """
+
+    connection: sqlite3.Connection = _connection()
+    with connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO pages (type_name, file_name, contents, modified) VALUES (?, ?, ?, ?)",
+            (type_name, file_name, contents, time.time() if modified is None else modified),
+        )
+
+    logger.debug("update: %s/%s", type_name, file_name)
+
+def mark_fresh(type_name: str, file_name: str, modified: float) -> bool:
+    """
+    The same as cache.mark_fresh but updating the pages table.
+    """
+
+    connection: sqlite3.Connection = _connection()
+    with connection:
+        cursor: sqlite3.Cursor = connection.execute(
+            "UPDATE pages SET modified = ? WHERE type_name = ? AND file_name = ?",
+            (modified, type_name, file_name),
+        )
+    return cursor.rowcount > 0
+
+def check_runner(number: int, allow_stale: bool = False) -> None | dict:
+    """
+    If the parsed runner results page of the parkrunner with the given number is
+    in the cache and valid (or `allow_stale` is true), return a dictionary of
+    the hash of the page it was parsed from ("html_hash"), the parser version
+    ("parser_version") and the result of parse_runner_results_page ("name",
+    "most_recent_age_category" and "rows"). Otherwise, return None.
+    """
+
+    connection: sqlite3.Connection = _connection()
+    runner: tuple | None = connection.execute(
+        "SELECT name, most_recent_age_category, html_hash, parser_version, modified FROM runners WHERE id = ?",
+        (number,),
+    ).fetchone()
+    if runner is None:
+        logger.debug("miss: Runner '%s' doesn't exist", number)
+        return None
+
+    name, most_recent_age_category, html_hash, parser_version, modified = runner
+    if not cache.is_fresh("runner_results_parsed", str(number), datetime.fromtimestamp(modified), allow_stale):
+        return None
+
+    rows: list[list[str]] = [
+        [event_name, _iso_to_date(date), str(run_number), str(position), time_, age_grade, pb]
+        for event_name, date, run_number, position, time_, age_grade, pb in connection.execute(
+            "SELECT event_name, date, run_number, position, time, age_grade, pb FROM results WHERE runner_id = ? ORDER BY row_index",
+            (number,),
+        )
+    ]
+
+    logger.debug("hit: runner %s", number)
+    return {
+        "html_hash": html_hash,
+        "parser_version": parser_version,
+        "name": name,
+        "most_recent_age_category": most_recent_age_category,
+        "rows": rows,
+    }
+
+def write_runner(
+    number: int,
+    html_hash: str,
+    parser_version: int,
+    name: str,
+    most_recent_age_category: str,
+    rows: list[list[str]],
+    modified: float | None = None,
+) -> None:
+    """
+    Store the parsed runner results page of the parkrunner with the given
+    number, replacing any existing results.
+    """
+
+    connection: sqlite3.Connection = _connection()
+    with connection:
+        connection.execute("DELETE FROM runners WHERE id = ?", (number,))
+        connection.execute(
+            "INSERT INTO runners (id, name, most_recent_age_category, html_hash, parser_version, modified) VALUES (?, ?, ?, ?, ?, ?)",
+            (number, name, most_recent_age_category, html_hash, parser_version, time.time() if modified is None else modified),
+        )
+        connection.executemany(
+            "INSERT INTO results (runner_id, row_index, event_name, date, run_number, position, time, age_grade, pb) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (number, row_index, row[0], _date_to_iso(row[1]), int(row[2]), int(row[3]), row[4], row[5], row[6])
+                for row_index, row in enumerate(rows)
+            ),
+        )
+
+    logger.debug("update: runner %s", number)
+
+def mark_runner_fresh(number: int, modified: float) -> bool:
+    """
+    The same as cache.mark_fresh but for the parsed runner results of the
+    parkrunner with the given number.
+    """
+
+    connection: sqlite3.Connection = _connection()
+    with connection:
+        cursor: sqlite3.Cursor = connection.execute("UPDATE runners SET modified = ? WHERE id = ?", (modified, number))
+    return cursor.rowcount > 0
+
+def check_event_result(event_id: int, event_number: int) -> None | dict:
+    """
+    If the parsed event result page with the given event ID and number is in the
+    cache, return a dictionary of the hash of the page it was parsed from
+    ("html_hash"), the parser version ("parser_version"), the date in the form
+    YYYY-MM-DD ("date") and the rows as returned by parse_event_result_page
+    ("rows"). Otherwise, return None.
+    """
+
+    connection: sqlite3.Connection = _connection()
+    event: tuple | None = connection.execute(
+        "SELECT date, html_hash, parser_version, modified FROM events WHERE event_id = ? AND event_number = ?",
+        (event_id, event_number),
+    ).fetchone()
+    if event is None:
+        logger.debug("miss: Event result %s-%s doesn't exist", event_id, event_number)
+        return None
+
+    date, html_hash, parser_version, modified = event
+    if not cache.is_fresh("event_result_parsed", f"{event_id}-{event_number}", datetime.fromtimestamp(modified)):
+        return None
+
+    rows: list[dict[str, str]] = [
+        {
+            "position": position,
+            "name": name,
+            "gender": gender,
+            "agegroup": age_group,
+            "agegrade": age_grade,
+            "club": club,
+            "groups": groups,
+            "achievement": achievement,
+            "id": str(runner_id),
+            "time": time_,
+        }
+        for runner_id, position, name, gender, age_group, age_grade, club, groups, achievement, time_ in connection.execute(
+            "SELECT runner_id, position, name, gender, age_group, age_grade, club, groups, achievement, time FROM event_results WHERE event_id = ? AND event_number = ? ORDER BY row_index",
+            (event_id, event_number),
+        )
+    ]
+
+    logger.debug("hit: event result %s-%s", event_id, event_number)
+    return {
+        "html_hash": html_hash,
+        "parser_version": parser_version,
+        "date": date,
+        "rows": rows,
+    }
+
+def write_event_result(
+    event_id: int,
+    event_number: int,
+    html_hash: str,
+    parser_version: int,
+    date: str,
+    rows: list[dict[str, str]],
+) -> None:
+    """
+    Store the parsed event result page with the given event ID and number, where
+    the date is in the form YYYY-MM-DD, replacing any existing results.
+    """
+
+    connection: sqlite3.Connection = _connection()
+    with connection:
+        connection.execute("DELETE FROM events WHERE event_id = ? AND event_number = ?", (event_id, event_number))
+        connection.execute(
+            "INSERT INTO events (event_id, event_number, date, html_hash, parser_version, modified) VALUES (?, ?, ?, ?, ?, ?)",
+            (event_id, event_number, date, html_hash, parser_version, time.time()),
+        )
+        connection.executemany(
+            "INSERT INTO event_results (event_id, event_number, row_index, runner_id, position, name, gender, age_group, age_grade, club, groups, achievement, time) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (event_id, event_number, row_index, int(row["id"]), row["position"], row["name"], row["gender"], row["agegroup"], row["agegrade"], row["club"], row["groups"], row["achievement"], row["time"])
+                for row_index, row in enumerate(rows)
+            ),
+        )
+
+    logger.debug("update: event result %s-%s", event_id, event_number)
+
+def migrate_cache() -> None:
+    """
+    Import everything in the file cache directory into the database, keeping
+    the time each file was last modified. Parsed runner and event results are
+    imported into the normalised tables and everything else into the pages
+    table.
+    """
+
+    num_imported: int = 0
+    for sub_cache_dir in cache.cache_dir.iterdir():
+        if not sub_cache_dir.is_dir() or sub_cache_dir.name == cache.BLOBS_DIR_NAME:
+            continue
+
+        for file_path in sub_cache_dir.iterdir():
+            modified: float = file_path.stat().st_mtime
+            with cache.open_cache_file(file_path) as f:
+                contents: bytes = f.read()
+
+            if sub_cache_dir.name == "event_result_parsed":
+                parsed: dict = pickle.loads(contents)
+                write_event_result(
+                    parsed["event_id"],
+                    parsed["event_number"],
+                    parsed["html_hash"],
+                    parsed["parser_version"],
+                    parsed["date"],
+                    parsed["rows"],
+                )
+            elif sub_cache_dir.name == "runner_results_parsed":
+                parsed: dict = pickle.loads(contents)
+                write_runner(
+                    int(file_path.stem),
+                    parsed["html_hash"],
+                    parsed["parser_version"],
+                    parsed["name"],
+                    parsed["most_recent_age_category"],
+                    parsed["rows"],
+                    modified,
+                )
+            else:
+                write_cache(sub_cache_dir.name, file_path.name, cache.compress(contents), modified)
+
+            num_imported += 1
+
+    logger.info("Imported %d files from '%s' into '%s'", num_imported, cache.cache_dir, DB_FILE_NAME)
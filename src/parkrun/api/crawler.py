@@ -0,0 +1,159 @@
+"""
+Crawl the full history of event results at many locations, e.g. to analyse
+them offline. Each location's event results are fetched from event number 1
+until the website says the next one doesn't exist, by a pool of at most
+`FETCH_MAX_WORKERS` threads sharing the rate limit. Event result pages are
+valid in the cache forever so those already in it are skipped without being
+read. After each location's event results are fetched up to some event
+number, that number is written to the cache as a checkpoint so if the crawl is
+interrupted, running it again resumes from there.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import logging
+from parkrun import get_fetch_max_workers
+from parkrun.api.cache import check_cache_obj, write_cache_obj
+from parkrun.api.parkrun_exception import ParkrunException, ParkrunNotFoundException
+from parkrun.api.scraper import fetch_event_result_rows, fetch_events, is_event_result_cached
+from parkrun.models.event import Event
+from parkrun.models.event_collection import EventCollection
+
+logger = logging.getLogger(__name__)
+
+# How many event numbers to fetch between writing checkpoints
+CHECKPOINT_EVERY: int = 10
+
+def _checkpoint_file_name(event: Event) -> str:
+    return f"{event.url_name}.pickle"
+
+def read_checkpoint(event: Event) -> int:
+    """
+    Return the event number up to which all event results of the given event
+    have been crawled, or 0 if it hasn't been crawled.
+    """
+
+    checkpoint: dict | None = check_cache_obj("crawl_checkpoint", _checkpoint_file_name(event), allow_stale=True)
+    return 0 if checkpoint is None else checkpoint["done_up_to"]
+
+def write_checkpoint(event: Event, done_up_to: int) -> None:
+    write_cache_obj("crawl_checkpoint", _checkpoint_file_name(event), {"done_up_to": done_up_to})
+
+def _advance(done_up_to: int, done: set[int]) -> int:
+    """
+    Event results can complete in any order so return the event number up to
+    which all have completed, removing those from `done`.
+    """
+
+    while done_up_to + 1 in done:
+        done_up_to += 1
+        done.remove(done_up_to)
+    return done_up_to
+
+def crawl_event(event: Event, executor: ThreadPoolExecutor, max_in_flight: int) -> tuple[int, int]:
+    """
+    Fetch all event results of the given event that aren't in the cache,
+    starting after its checkpoint, with at most `max_in_flight` fetches
+    submitted to the executor at once. Return the last event number that
+    exists and the number of event results that were fetched.
+    """
+
+    if event.country.id_ == 0:
+        raise ParkrunException(f"Can't crawl '{event.name}' since it is discontinued")
+
+    done_up_to: int = read_checkpoint(event)
+    checkpointed: int = done_up_to
+    next_number: int = done_up_to + 1
+    not_found: int | None = None
+    done: set[int] = set()
+    in_flight: dict[Future, int] = dict()
+    num_fetched: int = 0
+    error: Exception | None = None
+
+    try:
+        while True:
+
+            # Keep the pool busy until an event number that doesn't exist or
+            # a fetch fails
+            while not_found is None and error is None and len(in_flight) < max_in_flight:
+                if is_event_result_cached(event, next_number):
+                    done.add(next_number)
+                else:
+                    in_flight[executor.submit(fetch_event_result_rows, event, next_number)] = next_number
+                next_number += 1
+
+            done_up_to = _advance(done_up_to, done)
+            if done_up_to - checkpointed >= CHECKPOINT_EVERY:
+                write_checkpoint(event, done_up_to)
+                checkpointed = done_up_to
+
+            if len(in_flight) == 0:
+                break
+
+            completed, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in completed:
+                number: int = in_flight.pop(future)
+                try:
+                    future.result()
+                except ParkrunNotFoundException:
+                    not_found = number if not_found is None else min(not_found, number)
+
+                    # Event numbers after one that doesn't exist don't either,
+                    # so don't fetch any that haven't started yet
+                    for other in [other for other, other_number in in_flight.items() if other_number > not_found]:
+                        if other.cancel():
+                            del in_flight[other]
+
+                # Let the other fetches finish so they are checkpointed
+                except Exception as e:
+                    error = error or e
+                else:
+                    done.add(number)
+                    num_fetched += 1
+                    logger.info("Crawled %s event number %d", event.name, number)
+
+        if error is not None:
+            raise error
+
+    # Still checkpoint what was fetched if interrupted or a fetch fails
+    finally:
+        for future in in_flight:
+            future.cancel()
+        done_up_to = _advance(done_up_to, done)
+        if done_up_to > checkpointed:
+            write_checkpoint(event, done_up_to)
+
+    return done_up_to, num_fetched
+
+def crawl_event_results(location_names: list[str] | None = None, country: str | None = None) -> None:
+    """
+    Fetch the full history of event results at each of the given locations and
+    every location in the given country, which can be the country's name or
+    top-level domain (e.g. "UK"). Print the number of event results at each
+    location and how many were fetched.
+    """
+
+    events: EventCollection = fetch_events()
+    to_crawl: list[Event] = []
+    for name in location_names or []:
+        event: Event | None = events.find_event_by_name(name)
+        if event is None:
+            suggestions: str = ", ".join(f"'{event.name}'" for event in events.search(name, 3))
+            raise ParkrunException(f"No event named '{name}', did you mean {suggestions}?")
+        to_crawl.append(event)
+    if country is not None:
+        country_events: list[Event] = [
+            event for event in events
+            if event.country.id_ != 0 and country.upper() in (event.country.tld, event.country.name.upper())
+        ]
+        if len(country_events) == 0:
+            raise ParkrunException(f"No events in country '{country}'")
+        to_crawl.extend(sorted(country_events, key=lambda event: event.name))
+
+    if len(to_crawl) == 0:
+        raise ParkrunException("Give the locations or country to crawl")
+
+    max_workers: int = max(get_fetch_max_workers(), 1)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for event in to_crawl:
+            last_number, num_fetched = crawl_event(event, executor, 2 * max_workers)
+            print(f"{event.name}: {last_number} event results, {num_fetched} fetched")
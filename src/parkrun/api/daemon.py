@@ -0,0 +1,245 @@
+"""
+A long-running local HTTP server that keeps the events, countries and parsed
+parkrunners in memory between commands so tables are printed in milliseconds
+rather than starting Python, importing everything and reading the cache each
+time. Start it with `cli.py daemon`. While it is running, cli.py sends table
+commands to it instead of running them itself.
+
+Everything kept in memory is cleared at the start of each results window
+(`HR_RESULT_START` on a parkrun day) and not kept during it, like the cache.
+At the end of the window (`HR_RESULT_END`), it is refreshed in the background
+by fetching the events and every parkrunner asked about so far again.
+
+Only this module's client functions are imported by cli.py when the daemon
+isn't running, so they only use the standard library.
+"""
+
+import datetime
+import http.client
+import json
+import logging
+from parkrun import get_daemon_port
+from parkrun.api.parkrun_exception import ParkrunException
+from parkrun.commands import commands
+
+logger = logging.getLogger(__name__)
+
+# Only table commands can be run by the daemon, and not graphs since they open
+# windows
+DAEMON_MODULE_PREFIX: str = "parkrun.tables."
+
+# How long to wait for the daemon to accept a connection before running the
+# command locally instead
+CONNECT_TIMEOUT_SECS: float = 0.2
+
+def can_run_in_daemon(command: str) -> bool:
+    """
+    Return whether the given command of cli.py is a table the daemon can run.
+    """
+    return command in commands and commands[command][0].startswith(DAEMON_MODULE_PREFIX)
+
+def run_in_daemon(command: str, runner_ids: list[int], kwargs: dict) -> str | None:
+    """
+    Run the given table command of cli.py with the given runner IDs and keyword
+    arguments in the daemon and return what it printed, or None if the daemon
+    isn't running. Raises ParkrunException if the command failed.
+    """
+
+    body: str = json.dumps({
+        "command": command,
+        "runner_ids": list(runner_ids),
+        "kwargs": {key: value.isoformat() if isinstance(value, datetime.date) else value for key, value in kwargs.items()},
+    })
+
+    connection = http.client.HTTPConnection("127.0.0.1", get_daemon_port(), timeout=CONNECT_TIMEOUT_SECS)
+    try:
+        connection.connect()
+    except OSError:
+        logger.debug("Daemon not running on port %d so running locally", get_daemon_port())
+        return None
+
+    # Commands that fetch from the website can take a while
+    try:
+        connection.sock.settimeout(None)
+        connection.request("POST", "/", body, {"Content-Type": "application/json"})
+        response: http.client.HTTPResponse = connection.getresponse()
+        output: str = response.read().decode("utf-8")
+    finally:
+        connection.close()
+
+    if response.status != 200:
+        raise ParkrunException(f"Daemon failed to run {command}: {output}")
+    return output
+
+def seconds_until_refresh(now: datetime.datetime) -> float:
+    """
+    Return the number of seconds from the given time until the end of the next
+    results window.
+    """
+
+    from parkrun.api.cache import HR_RESULT_END
+    from parkrun.api.parkrun_calendar import get_parkrun_calendar
+
+    calendar = get_parkrun_calendar()
+    index: int = calendar.index_on_or_before(now.date().toordinal())
+    refresh = datetime.datetime.combine(calendar.date(index), datetime.time(HR_RESULT_END))
+    if refresh <= now:
+        refresh = datetime.datetime.combine(calendar.date(index + 1), datetime.time(HR_RESULT_END))
+    return (refresh - now).total_seconds()
+
+def in_results_window(now: datetime.datetime) -> bool:
+    """
+    Return whether results could come out at any moment at the given time.
+    """
+
+    from parkrun.api.cache import HR_RESULT_END, HR_RESULT_START
+    from parkrun.api.parkrun_calendar import get_parkrun_calendar
+
+    return get_parkrun_calendar().index_of(now.date().toordinal()) is not None and HR_RESULT_START <= now.hour < HR_RESULT_END
+
+class Daemon:
+    """
+    Runs table commands one at a time, printing into a string, and keeps track
+    of the parkrunners asked about so they can be refreshed.
+    """
+
+    def __init__(self, runner_ids: list[int]):
+        import threading
+        self.runner_ids: set[int] = set(runner_ids)
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+        # The most recent parkrun when things were last kept in memory
+        self.fresh_for: datetime.datetime | None = None
+
+    def clear(self) -> None:
+        """
+        Clear everything kept in memory.
+        """
+
+        from parkrun.api import scraper
+        from parkrun.api.memory_cache import get_memory_cache
+
+        get_memory_cache().clear()
+        scraper._fetch_event_index.cache_clear()
+        scraper.fetch_events.cache_clear()
+        scraper.fetch_countries.cache_clear()
+
+    def warm(self) -> None:
+        """
+        Fetch the events, countries and every parkrunner asked about so far
+        into memory.
+        """
+
+        from parkrun.api.cache import most_recent_parkrun
+        from parkrun.api.scraper import fetch_countries
+        from parkrun.api.scraper_runner import fetch_many_runner_results
+
+        self.fresh_for = most_recent_parkrun()
+        fetch_countries()
+        fetch_many_runner_results(sorted(self.runner_ids))
+        logger.info("Warmed events and %d parkrunners", len(self.runner_ids))
+
+    def refresh(self) -> None:
+        """
+        Clear everything kept in memory and fetch it again.
+        """
+
+        with self.lock:
+            self.clear()
+            self.warm()
+
+    def refresh_loop(self) -> None:
+        """
+        Refresh everything at the end of each results window until stopped.
+        """
+
+        while not self.stopped.wait(seconds_until_refresh(datetime.datetime.now())):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Failed to refresh")
+
+    def run(self, command: str, runner_ids: list[int], kwargs: dict) -> str:
+        """
+        Run the given table command like cli.py and return what it printed.
+        Only commands in the same table as cli.py can be run.
+        """
+
+        import contextlib
+        import importlib
+        import io
+        from parkrun.api.cache import most_recent_parkrun
+
+        if not can_run_in_daemon(command):
+            raise ParkrunException(f"The daemon can't run '{command}'")
+        module_name, func_name = commands[command]
+        kwargs = {key: datetime.date.fromisoformat(value) if key.endswith("_date") else value for key, value in kwargs.items()}
+        func = getattr(importlib.import_module(module_name), func_name)
+
+        # Printing goes to sys.stdout so only run one command at a time
+        with self.lock:
+
+            # Results may have come out since things were kept in memory
+            now = datetime.datetime.now()
+            if in_results_window(now) or self.fresh_for != most_recent_parkrun(now):
+                self.clear()
+                self.fresh_for = most_recent_parkrun(now)
+
+            self.runner_ids.update(runner_ids)
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                func(runner_ids, **kwargs)
+            return output.getvalue()
+
+def make_server(daemon: Daemon, port: int) -> "ThreadingHTTPServer":
+    """
+    Return a server on the given port of localhost (any free port if 0) that
+    runs the commands it is sent in the given daemon.
+    """
+
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            try:
+                request: dict = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                status, output = 200, daemon.run(request["command"], request["runner_ids"], request["kwargs"])
+            except Exception as e:
+                logger.exception("Failed to run command")
+                status, output = 500, f"{type(e).__name__}: {e}"
+
+            body: bytes = output.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            logger.debug(format, *args)
+
+    return ThreadingHTTPServer(("127.0.0.1", port), Handler)
+
+def serve() -> None:
+    """
+    Run the daemon on the `DAEMON_PORT` of localhost until interrupted. The
+    parkrunners in the environment variables are fetched into memory first.
+    """
+
+    import threading
+    from parkrun import ALL_PARKRUNNER_IDS
+
+    daemon = Daemon(list(ALL_PARKRUNNER_IDS))
+    daemon.warm()
+
+    server = make_server(daemon, get_daemon_port())
+    threading.Thread(target=daemon.refresh_loop, daemon=True).start()
+    logger.info("Daemon listening on port %d", server.server_address[1])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.stopped.set()
+        server.server_close()
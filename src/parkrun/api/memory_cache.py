@@ -0,0 +1,170 @@
+"""
+A bounded least recently used cache in memory, shared by the scraper modules
+instead of functools.cache so a long-running process doesn't keep every page
+and parkrunner it has ever seen. The cache holds at most
+`MEMORY_CACHE_MAX_ENTRIES` entries with a total estimated size of at most
+`MEMORY_CACHE_MAX_BYTES` bytes, evicting the least recently used entries first.
+"""
+
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+import functools
+import logging
+import sys
+import threading
+from typing import Any
+from parkrun import get_memory_cache_max_bytes, get_memory_cache_max_entries
+
+logger = logging.getLogger(__name__)
+
+class MemoryCache:
+    """
+    A thread-safe LRU cache bounded by the number of entries and their total
+    size in bytes, as given when each entry is added. Counts the number of hits,
+    misses and evictions.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries: int = max_entries
+        self.max_bytes: int = max_bytes
+        self._entries: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self.num_bytes: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> tuple[bool, Any]:
+        """
+        Return whether the key is in the cache and if so, its value, otherwise
+        None.
+        """
+
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, self._entries[key][0]
+
+    def put(self, key: Hashable, value: Any, size: int) -> None:
+        """
+        Add the value with the given size in bytes to the cache, evicting the
+        least recently used entries until it fits. Values bigger than the whole
+        cache aren't added.
+        """
+
+        if size > self.max_bytes:
+            logger.debug("Not caching %s in memory since it is %d bytes", key, size)
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self.num_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.num_bytes += size
+
+            while len(self._entries) > self.max_entries or self.num_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.num_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self, prefix: Hashable | None = None) -> None:
+        """
+        Remove all entries, or only those whose key is a tuple starting with
+        the given prefix.
+        """
+
+        with self._lock:
+            if prefix is None:
+                self._entries.clear()
+                self.num_bytes = 0
+                return
+
+            for key in [key for key in self._entries if isinstance(key, tuple) and key[0] == prefix]:
+                self.num_bytes -= self._entries.pop(key)[1]
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.num_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        return f"MemoryCache({self.stats()})"
+
+_memory_cache: MemoryCache | None = None
+_memory_cache_lock = threading.Lock()
+
+def get_memory_cache() -> MemoryCache:
+    """
+    Return the MemoryCache shared by everything, creating it from the
+    `MEMORY_CACHE_MAX_ENTRIES` and `MEMORY_CACHE_MAX_BYTES` settings on first
+    use so command-line overrides are taken into account.
+    """
+
+    global _memory_cache
+    with _memory_cache_lock:
+        if _memory_cache is None:
+            _memory_cache = MemoryCache(get_memory_cache_max_entries(), get_memory_cache_max_bytes())
+        return _memory_cache
+
+def memory_cache(size_of: Callable[[Any], int] = sys.getsizeof) -> Callable[[Callable], Callable]:
+    """
+    Decorator like functools.cache but storing the results in the shared
+    MemoryCache, using `size_of` to estimate the size of each result in bytes.
+    Like functools.cache, the decorated function has a `cache_clear` method,
+    which removes only its own results. Unlike functools.cache, if several
+    threads miss on the same arguments at once, only the first calls the
+    function and the others wait for its result, e.g. so the same page isn't
+    fetched twice.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        name: str = f"{func.__module__}.{func.__qualname__}"
+
+        # A lock for each key being calculated, removed once it is in the cache
+        key_locks: dict[tuple, threading.Lock] = dict()
+        key_locks_lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key: tuple = (name, args, tuple(sorted(kwargs.items())))
+            found, value = get_memory_cache().get(key)
+            if found:
+                return value
+
+            with key_locks_lock:
+                key_lock: threading.Lock = key_locks.setdefault(key, threading.Lock())
+
+            # If another thread is already calculating it then wait for it to
+            # be in the cache, unless the other thread failed or it was too big
+            if not key_lock.acquire(blocking=False):
+                key_lock.acquire()
+                found, value = get_memory_cache().get(key)
+                if found:
+                    key_lock.release()
+                    return value
+
+            try:
+                value = func(*args, **kwargs)
+                get_memory_cache().put(key, value, size_of(value))
+                return value
+            finally:
+                with key_locks_lock:
+                    if key_locks.get(key) is key_lock:
+                        del key_locks[key]
+                key_lock.release()
+
+        wrapper.cache_clear = lambda: get_memory_cache().clear(name)
+        return wrapper
+
+    return decorator
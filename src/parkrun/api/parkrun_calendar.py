@@ -0,0 +1,94 @@
+"""
+A precomputed calendar of every date a parkrun could have taken place on, which
+is every Saturday as well as Christmas Day and New Years Day. Dates are given
+an index in the calendar so the parkrun before a date, whether a date is the
+parkrun after another and the number of parkruns between two dates are all
+integer arithmetic rather than calls to parkrun_before.
+"""
+
+from array import array
+import datetime
+from functools import cache
+
+FIRST_PARKRUN: datetime.date = datetime.date(2004, 10, 2)
+LAST_DATE: datetime.date = datetime.date(2100, 12, 31)
+
+class ParkrunCalendar:
+    """
+    All parkrun dates between `first` and `last` (inclusive), where `first`
+    must be a parkrun date. Most methods work on proleptic Gregorian ordinals,
+    as stored in RunnerResults, and raise IndexError for dates after `last`.
+    `date` and `parkrun_before` also raise IndexError before `first`.
+    """
+
+    def __init__(self, first: datetime.date = FIRST_PARKRUN, last: datetime.date = LAST_DATE):
+        self.first_ordinal: int = first.toordinal()
+        self.last_ordinal: int = last.toordinal()
+
+        # The ordinal of each parkrun date in order, and for each day the index
+        # of the most recent parkrun on or before that day
+        self.ordinals: array = array("l")
+        self._on_or_before: array = array("l")
+        for ordinal in range(self.first_ordinal, self.last_ordinal + 1):
+            date: datetime.date = datetime.date.fromordinal(ordinal)
+            if date.weekday() == 5 or (date.month, date.day) in ((12, 25), (1, 1)):
+                self.ordinals.append(ordinal)
+            self._on_or_before.append(len(self.ordinals) - 1)
+
+    def index_on_or_before(self, ordinal: int) -> int:
+        """
+        Return the index of the most recent parkrun on or before the given
+        date, or -1 if it's before the first parkrun.
+        """
+
+        if ordinal < self.first_ordinal:
+            return -1
+        return self._on_or_before[ordinal - self.first_ordinal]
+
+    def index_of(self, ordinal: int) -> int | None:
+        """
+        Return the index of the parkrun on the given date, or None if a parkrun
+        couldn't have taken place on it.
+        """
+
+        index: int = self.index_on_or_before(ordinal)
+        if index >= 0 and self.ordinals[index] == ordinal:
+            return index
+        return None
+
+    def index_before(self, ordinal: int) -> int:
+        """
+        Return the index of the parkrun before the given date, not including
+        the given date, like parkrun_before. This is -1 if there isn't one.
+        """
+
+        return self.index_on_or_before(ordinal - 1)
+
+    def date(self, index: int) -> datetime.date:
+        if index < 0:
+            raise IndexError("Before the first parkrun")
+        return datetime.date.fromordinal(self.ordinals[index])
+
+    def parkrun_before(self, date: datetime.date) -> datetime.date:
+        """
+        The same as cache.parkrun_before but using the calendar.
+        """
+
+        return self.date(self.index_before(date.toordinal()))
+
+    def count_between(self, start: datetime.date, end: datetime.date) -> int:
+        """
+        Return the number of parkruns between the given dates (inclusive).
+        """
+
+        if end < start:
+            return 0
+        return self.index_on_or_before(end.toordinal()) - self.index_on_or_before(start.toordinal() - 1)
+
+@cache
+def get_parkrun_calendar() -> ParkrunCalendar:
+    """
+    Return the ParkrunCalendar shared by everything, creating it on first use.
+    """
+
+    return ParkrunCalendar()
@@ -1,2 +1,8 @@
 class ParkrunException(Exception):
     pass
+
+class ParkrunNotFoundException(ParkrunException):
+    """
+    Raised when the parkrun website says something doesn't exist (404).
+    """
+    pass
@@ -0,0 +1,287 @@
+"""
+Extract the results tables from runner results and event result pages. The fast
+parsers use regular expressions to pull out just the rows of the results tables
+without building a tree of the whole page. If the page isn't laid out as
+expected, they fall back to parsing the whole page with BeautifulSoup, which is
+only imported if needed.
+
+The fragment extractors cut a page down to just the parts the parsers read so
+only that needs caching. Parsing a fragment gives the same as parsing the whole
+page.
+"""
+
+from parkrun.api.parkrun_exception import ParkrunException
+import html
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Increase whenever the output of the parsers changes so anything derived from
+# it can be invalidated
+PARSER_VERSION: int = 1
+
+# Increase whenever the fragment extractors change what they keep so cached
+# fragments are fetched again. Each fragment starts with FRAGMENT_HEADER.
+FRAGMENT_VERSION: int = 1
+FRAGMENT_HEADER: str = f"<!-- parkrun fragment {FRAGMENT_VERSION} -->"
+_RE_FRAGMENT_HEADER = re.compile(r"<!-- parkrun fragment (\d+) -->")
+
+_FLAGS = re.IGNORECASE | re.DOTALL
+_RE_TAG = re.compile(r"<[^>]*>")
+_RE_H2 = re.compile(r"<h2\b[^>]*>(.*?)</h2\s*>", _FLAGS)
+_RE_P = re.compile(r"<p\b[^>]*>(.*?)</p\s*>", _FLAGS)
+_RE_TABLE = re.compile(r"<table\b([^>]*)>(.*?)</table\s*>", _FLAGS)
+_RE_ID_RESULTS = re.compile(r"""\bid\s*=\s*["']results["']""", _FLAGS)
+_RE_TR = re.compile(r"<tr\b([^>]*)>(.*?)</tr\s*>", _FLAGS)
+_RE_TD = re.compile(r"<td\b[^>]*>(.*?)</td\s*>", _FLAGS)
+_RE_ATTR = re.compile(r"""([\w-]+)\s*=\s*(?:"([^"]*)"|'([^']*)')""", _FLAGS)
+_RE_EVENT_DATE = re.compile(
+    r"""<div\b[^>]*\bclass\s*=\s*"(?:[^"]*\s)?Results-header(?:\s[^"]*)?"[^>]*>.*?"""
+    r"""<h3\b[^>]*>.*?"""
+    r"""<span\b[^>]*\bclass\s*=\s*"(?:[^"]*\s)?format-date(?:\s[^"]*)?"[^>]*>(.*?)</span\s*>""",
+    _FLAGS,
+)
+_RE_COMPACT_LINK = re.compile(r"""<div\b[^>]*\bclass\s*=\s*"(?:[^"]*\s)?compact(?:\s[^"]*)?"[^>]*>.*?<a\b[^>]*\bhref\s*=\s*"([^"]*)\"""", _FLAGS)
+_RE_COMPACT_TEXT = re.compile(r"""<div\b[^>]*\bclass\s*=\s*"(?:[^"]*\s)?compact(?:\s[^"]*)?"[^>]*>(.*?)</div\s*>""", _FLAGS)
+
+# The data attributes of each row of the event result table that are kept
+EVENT_ROW_ATTRS: tuple[str] = (
+    "position",
+    "name",
+    "gender",
+    "agegroup",
+    "agegrade",
+    "club",
+    "groups",
+    "achievement",
+)
+
+def _text(fragment: str) -> str:
+    """
+    Return the text within the given HTML fragment with tags removed and
+    character references converted.
+    """
+    return html.unescape(_RE_TAG.sub("", fragment)).strip()
+
+def _parse_runner_results_page_fast(page: str, table_index: int = 2, num_tables: int | None = 3) -> tuple[str, str, list[list[str]]]:
+    h2s: list[re.Match] = list(_RE_H2.finditer(page))
+    if len(h2s) != 1:
+        raise ParkrunException(f"Found {len(h2s)} rather than 1 h2 tag")
+    h2_contents: str = h2s[0].group(1)
+    if h2_contents.startswith("<"):
+        raise ParkrunException("h2 tag doesn't start with the name")
+    name: str = html.unescape(h2_contents.split("<", 1)[0]).strip()
+
+    # The age category is the last word of the paragraph after the name, if the
+    # paragraph ends in text
+    most_recent_age_cat_str: str = ""
+    p: re.Match | None = _RE_P.search(page, h2s[0].end())
+    if p is not None and not p.group(1).endswith(">"):
+        words: list[str] = html.unescape(p.group(1).rsplit(">", 1)[-1]).split()
+        if len(words) > 0:
+            most_recent_age_cat_str = words[-1]
+
+    results_tables: list[str] = [table.group(2) for table in _RE_TABLE.finditer(page) if _RE_ID_RESULTS.search(table.group(1))]
+    if len(results_tables) <= table_index or (num_tables is not None and len(results_tables) != num_tables):
+        raise ParkrunException(f"Found {len(results_tables)} rather than {num_tables or f'more than {table_index}'} tables with id 'results'")
+
+    rows: list[list[str]] = [
+        [_text(col) for col in _RE_TD.findall(row.group(2))]
+        for row in _RE_TR.finditer(results_tables[table_index])
+    ]
+    return name, most_recent_age_cat_str, rows[1:] # Skip the header row
+
+def _parse_runner_results_page_bs4(page: str, table_index: int = 2, num_tables: int | None = 3) -> tuple[str, str, list[list[str]]]:
+    from bs4 import BeautifulSoup, Tag
+    soup = BeautifulSoup(page, 'html.parser')
+
+    # Extract name
+    h2s: list[Tag] = soup.findAll('h2')
+    if len(h2s) != 1:
+        raise ParkrunException(f"Found {len(h2s)} rather than 1 h2 tag")
+    name: str = h2s[0].contents[0].strip()
+
+    # Extract most recent age category
+    try:
+        most_recent_age_cat_str = h2s[0].findNext('p').contents[-1].split()[-1]
+    except:
+        most_recent_age_cat_str = ""
+
+    # Ignore other tables as can be worked out from main table
+    results_tables: list[Tag] = soup.findAll('table', {'id': 'results'})
+    if len(results_tables) <= table_index or (num_tables is not None and len(results_tables) != num_tables):
+        raise ParkrunException(f"Found {len(results_tables)} rather than {num_tables or f'more than {table_index}'} tables with id 'results'")
+    all_results_table: Tag = results_tables[table_index]
+
+    # Extract rows from the table
+    rows: list[Tag] = all_results_table.find_all('tr')
+    results: list[list[str]] = []
+    for row in rows[1:]: # Skip the header row
+        cols = row.find_all('td')
+        results.append([col.text.strip() for col in cols])
+
+    return name, most_recent_age_cat_str, results
+
+def parse_runner_results_page(page: str) -> tuple[str, str, list[list[str]]]:
+    """
+    Return the name, most recent age category and rows of the table of all
+    results from the HTML of a runner results page. Each row is a list of the
+    text in each column as expected by RunnerResult.from_table. Raises
+    ParkrunException if the page isn't laid out as expected.
+    """
+
+    try:
+        return _parse_runner_results_page_fast(page)
+    except Exception as e:
+        logger.warning("Fast parse of runner results page failed so falling back to BeautifulSoup: %s", e)
+    return _parse_runner_results_page_bs4(page)
+
+def parse_runner_recent_page(page: str) -> tuple[str, str, list[list[str]]]:
+    """
+    The same as parse_runner_results_page but for the page of a runner's recent
+    results (without /all/ in the URL) where the second table with id 'results'
+    has their most recent few results in the same form as the table of all
+    results.
+    """
+
+    try:
+        return _parse_runner_results_page_fast(page, 1, None)
+    except Exception as e:
+        logger.warning("Fast parse of runner recent page failed so falling back to BeautifulSoup: %s", e)
+    return _parse_runner_results_page_bs4(page, 1, None)
+
+def _parse_event_result_page_fast(page: str) -> tuple[str, list[dict[str, str]]]:
+    date: re.Match | None = _RE_EVENT_DATE.search(page)
+    if date is None:
+        raise ParkrunException("Couldn't find the date")
+
+    tables: list[str] = [table.group(2) for table in _RE_TABLE.finditer(page)]
+    if len(tables) != 2:
+        raise ParkrunException(f"Found {len(tables)} rather than 2 tables")
+
+    rows: list[dict[str, str]] = []
+    for row in list(_RE_TR.finditer(tables[0]))[1:]: # Skip the header row
+        attrs: dict[str, str] = {
+            match.group(1).lower(): html.unescape(match.group(2) if match.group(2) is not None else match.group(3))
+            for match in _RE_ATTR.finditer(row.group(1))
+        }
+
+        # If this position hasn't been claimed then the position shows up, but
+        # nothing else so skip it
+        if int(attrs["data-runs"]) == 0:
+            continue
+
+        cols: list[str] = _RE_TD.findall(row.group(2))
+        parsed_row: dict[str, str] = {attr: attrs.get(f"data-{attr}") for attr in EVENT_ROW_ATTRS}
+        parsed_row["id"] = html.unescape(_RE_COMPACT_LINK.search(cols[1]).group(1)).split("/")[-1]
+        parsed_row["time"] = _text(_RE_COMPACT_TEXT.search(cols[5]).group(1))
+        rows.append(parsed_row)
+
+    return _text(date.group(1)), rows
+
+def _parse_event_result_page_bs4(page: str) -> tuple[str, list[dict[str, str]]]:
+    from bs4 import BeautifulSoup, Tag
+    soup = BeautifulSoup(page, "html.parser")
+
+    # Extract date
+    date_text: str = soup.find("div", {"class": "Results-header"}).find("h3").find("span", {"class": "format-date"}).text.strip()
+
+    # Extract the tables with finishers and volunteers in
+    tables: list[Tag] = soup.find_all("table")
+    if len(tables) != 2:
+        raise ParkrunException(f"Found {len(tables)} rather than 2 tables")
+    finishers_table, volunteers_table = tables
+
+    # Extract rows from the table
+    finisher_rows: list[Tag] = finishers_table.find_all("tr")
+    rows: list[dict[str, str]] = []
+    for row in finisher_rows[1:]: # Skip the header row
+
+        # If this position hasn't been claimed then the position shows up, but
+        # nothing else and the ID is 2214 for some reason. In this case, we
+        # could add a special EventRunnerResult but instead we just skip it
+        if int(row.get("data-runs")) == 0:
+            continue
+
+        cols: list[Tag] = row.find_all("td")
+        parsed_row: dict[str, str] = {attr: row.get(f"data-{attr}") for attr in EVENT_ROW_ATTRS}
+        parsed_row["id"] = cols[1].find("div", {"class", "compact"}).find("a")["href"].split("/")[-1]
+        parsed_row["time"] = cols[5].find("div", {"class", "compact"}).text.strip()
+        rows.append(parsed_row)
+
+    return date_text, rows
+
+def parse_event_result_page(page: str) -> tuple[str, list[dict[str, str]]]:
+    """
+    Return the date text and the rows of the finishers table from the HTML of
+    an event result page. Each row is a dictionary from each of EVENT_ROW_ATTRS
+    as well as "id" and "time" to their text. Unclaimed positions are skipped.
+    Raises ParkrunException if the page isn't laid out as expected.
+    """
+
+    try:
+        return _parse_event_result_page_fast(page)
+    except Exception as e:
+        logger.warning("Fast parse of event result page failed so falling back to BeautifulSoup: %s", e)
+    return _parse_event_result_page_bs4(page)
+
+def is_outdated_fragment(page: str) -> bool:
+    """
+    Return whether the given page is a fragment from an older version of the
+    fragment extractors, so needs fetching again.
+    """
+
+    header: re.Match | None = _RE_FRAGMENT_HEADER.match(page)
+    return header is not None and int(header.group(1)) != FRAGMENT_VERSION
+
+def _extract_runner_page_fragment(page: str, table_index: int, num_tables: int | None) -> str:
+    h2s: list[re.Match] = list(_RE_H2.finditer(page))
+    if len(h2s) != 1:
+        raise ParkrunException(f"Found {len(h2s)} rather than 1 h2 tag")
+    p: re.Match | None = _RE_P.search(page, h2s[0].end())
+
+    results_tables: list[re.Match] = [table for table in _RE_TABLE.finditer(page) if _RE_ID_RESULTS.search(table.group(1))]
+    if len(results_tables) <= table_index or (num_tables is not None and len(results_tables) != num_tables):
+        raise ParkrunException(f"Found {len(results_tables)} rather than {num_tables or f'more than {table_index}'} tables with id 'results'")
+
+    # Keep the other tables but empty so there are still the same number
+    parts: list[str] = [FRAGMENT_HEADER, h2s[0].group(0)]
+    if p is not None:
+        parts.append(p.group(0))
+    parts.extend(table.group(0) if index == table_index else '<table id="results"></table>' for index, table in enumerate(results_tables))
+    return "\n".join(parts)
+
+def extract_runner_results_fragment(page: str) -> str:
+    """
+    Return just the parts of a runner results page that
+    parse_runner_results_page reads. Raises ParkrunException if the page isn't
+    laid out as expected.
+    """
+
+    return _extract_runner_page_fragment(page, 2, 3)
+
+def extract_runner_recent_fragment(page: str) -> str:
+    """
+    The same as extract_runner_results_fragment but for the page read by
+    parse_runner_recent_page.
+    """
+
+    return _extract_runner_page_fragment(page, 1, None)
+
+def extract_event_result_fragment(page: str) -> str:
+    """
+    Return just the parts of an event result page that parse_event_result_page
+    reads, including the whole volunteers table. Raises ParkrunException if the
+    page isn't laid out as expected.
+    """
+
+    date: re.Match | None = _RE_EVENT_DATE.search(page)
+    if date is None:
+        raise ParkrunException("Couldn't find the date")
+
+    tables: list[str] = [table.group(0) for table in _RE_TABLE.finditer(page)]
+    if len(tables) != 2:
+        raise ParkrunException(f"Found {len(tables)} rather than 2 tables")
+
+    return "\n".join([FRAGMENT_HEADER, date.group(0) + "</h3></div>"] + tables)
@@ -0,0 +1,132 @@
+"""
+Keep the cache of tracked parkrunners warm on parkrun days. Between
+`HR_RESULT_START` and `HR_RESULT_END` the cache is always treated as out of
+date since results could come out at any moment, and afterwards everything
+fetched before then is out of date, so the first command run after a parkrun
+has to fetch every parkrunner again. Instead, run the `prewarm` command in the
+background. During the results window, it polls the tracked parkrunners,
+backing off while none of their results come in. As soon as a parkrunner's
+result for the day is in, their cache is marked as valid until the next
+parkrun (see cache.mark_fresh) and they aren't polled again. At the end of the
+window, any parkrunners still without a result are fetched one last time,
+which is then valid as usual.
+"""
+
+from collections.abc import Callable
+import datetime
+import logging
+import time
+from parkrun.api.cache import HR_RESULT_END, HR_RESULT_START
+from parkrun.api.parkrun_calendar import ParkrunCalendar, get_parkrun_calendar
+from parkrun.api.scraper import fetch
+from parkrun.api.scraper_runner import clear_runner_memory, fetch_many_runner_results, mark_runner_fresh
+from parkrun.models.runner import Runner
+
+logger = logging.getLogger(__name__)
+
+# The number of seconds to wait between polls, which doubles after each poll
+# where no new results came in, up to the maximum
+POLL_INITIAL_SECS: float = 5 * 60
+POLL_MAX_SECS: float = 30 * 60
+
+def has_result_on(runner: Runner, date: datetime.date) -> bool:
+    """
+    Return whether the runner's most recent result is on the given date.
+    """
+    return len(runner.results) > 0 and runner.results.dates[0] == date.toordinal()
+
+class Prewarmer:
+    """
+    Polls the given parkrunners during each results window. The clock and sleep
+    function can be replaced for testing.
+    """
+
+    def __init__(
+        self,
+        runner_ids: list[int],
+        clock: Callable[[], datetime.datetime] = datetime.datetime.now,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.runner_ids: list[int] = list(dict.fromkeys(runner_ids))
+        self._clock: Callable[[], datetime.datetime] = clock
+        self._sleep: Callable[[float], None] = sleep
+
+    def poll(self, runner_ids: list[int], date: datetime.date) -> list[int]:
+        """
+        Fetch the given parkrunners again, mark those with a result on the given
+        date as fresh and return them.
+        """
+
+        # Make sure nothing is returned from memory
+        fetch.cache_clear()
+        clear_runner_memory()
+
+        try:
+            runners: list[Runner] = fetch_many_runner_results(runner_ids)
+        except Exception:
+            logger.exception("Failed to poll parkrunners")
+            return []
+
+        window_end = datetime.datetime.combine(date, datetime.time(HR_RESULT_END))
+        arrived: list[int] = []
+        for runner in runners:
+            if has_result_on(runner, date):
+                mark_runner_fresh(runner.number, window_end)
+                arrived.append(runner.number)
+        return arrived
+
+    def run_window(self, date: datetime.date) -> None:
+        """
+        Poll the parkrunners with backoff until all their results on the given
+        date are in or the results window has ended.
+        """
+
+        window_end = datetime.datetime.combine(date, datetime.time(HR_RESULT_END))
+        pending: list[int] = self.runner_ids
+        delay: float = POLL_INITIAL_SECS
+        while len(pending) > 0:
+            final: bool = self._clock() >= window_end
+            arrived: list[int] = self.poll(pending, date)
+            pending = [number for number in pending if number not in arrived]
+            logger.info("Results in for %d parkrunners, waiting for %d", len(arrived), len(pending))
+            if final:
+                break
+
+            # Poll more often again once results start coming in and always
+            # poll once more at the end of the window
+            delay = POLL_INITIAL_SECS if len(arrived) > 0 else min(2 * delay, POLL_MAX_SECS)
+            self._sleep(max(min(delay, (window_end - self._clock()).total_seconds()), 0))
+
+    def run(self) -> None:
+        """
+        Wait for each results window and poll the parkrunners during it,
+        forever. If it is already after the window on a parkrun day then poll
+        the parkrunners once straight away.
+        """
+
+        calendar: ParkrunCalendar = get_parkrun_calendar()
+        index: int = calendar.index_on_or_before(self._clock().date().toordinal())
+        if calendar.date(index) != self._clock().date():
+            index += 1
+
+        while True:
+            date: datetime.date = calendar.date(index)
+            window_start = datetime.datetime.combine(date, datetime.time(HR_RESULT_START))
+            wait_secs: float = (window_start - self._clock()).total_seconds()
+            if wait_secs > 0:
+                logger.info("Waiting until %s to poll %d parkrunners", window_start, len(self.runner_ids))
+                self._sleep(wait_secs)
+
+            self.run_window(date)
+            index += 1
+
+def prewarm(runner_ids: list[int]) -> None:
+    """
+    Poll the given parkrunners during each results window until interrupted,
+    so their cache is up to date as soon as their results are in.
+    """
+
+    try:
+        Prewarmer(runner_ids).run()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,143 @@
+"""
+Rate limit queries to the parkrun websites with a token bucket per host so that
+different hosts (e.g. www.parkrun.org.uk and images.parkrun.com) can be queried
+at the same time without any single host being queried too often.
+"""
+
+from collections.abc import Callable
+import logging
+import threading
+import time
+from urllib.parse import urlparse
+import parkrun
+from parkrun import get_rate_limit_burst
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """
+    A bucket that fills with tokens at `rate` tokens per second up to a maximum
+    of `burst` tokens. Each query takes a token, waiting for one to be added if
+    the bucket is empty. Waiting callers reserve their token in advance (the
+    bucket goes into debt) so they are served in the order they arrived and
+    nobody holds the lock while sleeping.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rate: float = rate
+        self.burst: int = max(burst, 1)
+        self._clock: Callable[[], float] = clock
+        self._sleep: Callable[[float], None] = sleep
+        self._tokens: float = self.burst
+        self._updated: float = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Take a token from the bucket and return the number of seconds the caller
+        must wait before it can be used, which is 0 if there was one available.
+        """
+
+        if self.rate <= 0:
+            return 0.0
+
+        with self._lock:
+            now: float = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        """
+        Take a token from the bucket, sleeping until one is available.
+        """
+
+        wait_secs: float = self.reserve()
+        if wait_secs > 0:
+            logger.debug("Rate limiting for %f seconds...", wait_secs)
+            self._sleep(wait_secs)
+
+    async def acquire_async(self) -> None:
+        """
+        Take a token from the bucket, asynchronously sleeping until one is
+        available.
+        """
+
+        # Imported here since it is slow and rarely needed
+        import asyncio
+
+        wait_secs: float = self.reserve()
+        if wait_secs > 0:
+            logger.debug("Rate limiting for %f seconds...", wait_secs)
+            await asyncio.sleep(wait_secs)
+
+class RateLimiter:
+    """
+    A TokenBucket for each host, created the first time the host is queried,
+    allowing one query every `min_secs_between_queries` seconds with bursts of
+    up to `burst` queries.
+    """
+
+    def __init__(
+        self,
+        min_secs_between_queries: float,
+        burst: int,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rate: float = 1 / min_secs_between_queries if min_secs_between_queries > 0 else 0.0
+        self.burst: int = burst
+        self._clock: Callable[[], float] = clock
+        self._sleep: Callable[[float], None] = sleep
+        self._buckets: dict[str, TokenBucket] = dict()
+        self._lock = threading.Lock()
+
+    def get_bucket(self, url: str) -> TokenBucket:
+        """
+        Return the TokenBucket for the host of the given URL.
+        """
+
+        host: str = urlparse(url).hostname or ""
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.rate, self.burst, self._clock, self._sleep)
+            return self._buckets[host]
+
+    def acquire(self, url: str) -> None:
+        """
+        Sleep until the host of the given URL can be queried.
+        """
+
+        self.get_bucket(url).acquire()
+
+    async def acquire_async(self, url: str) -> None:
+        """
+        Asynchronously sleep until the host of the given URL can be queried.
+        """
+
+        await self.get_bucket(url).acquire_async()
+
+_rate_limiter: RateLimiter | None = None
+_rate_limiter_lock = threading.Lock()
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Return the RateLimiter shared by all queries, creating it from the
+    `MIN_SECS_BETWEEN_QUERIES` and `RATE_LIMIT_BURST` settings on first use so
+    command-line overrides are taken into account.
+    """
+
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter(parkrun.MIN_SECS_BETWEEN_QUERIES, get_rate_limit_burst())
+        return _rate_limiter
@@ -1,28 +1,32 @@
-import parkrun
+from parkrun import get_cache_backend, get_cache_force_invalid, get_cache_page_mode
+from parkrun.api import cache_sqlite
 from parkrun.models.country_collection import CountryCollection
 from parkrun.models.event_collection import EventCollection
 from parkrun.models.event_result import EventResult
 from parkrun.models.event_runner_result import EventRunnerResult
 from parkrun.models.event import Event
+from parkrun.models.event_index import EVENT_INDEX_VERSION, EventIndex
 from parkrun.models.time import Time
 from parkrun.models.position import Position
 from parkrun.models.age_grade import AgeGrade
 from parkrun.models.age_category import AgeCategory
-from parkrun.api.parkrun_exception import ParkrunException
-from parkrun.api.cache import check_cache_str, write_cache_str
-import requests
-from bs4 import BeautifulSoup, Tag
+from parkrun.api.parkrun_exception import ParkrunException, ParkrunNotFoundException
+from parkrun.api.cache import ENCODING, check_cache_obj, check_cache_str, is_cache_valid, mark_fresh, write_cache_obj, write_cache_str
+from parkrun.api.parser import PARSER_VERSION, extract_event_result_fragment, is_outdated_fragment, parse_event_result_page
+from parkrun.api.memory_cache import memory_cache
+from parkrun.api.rate_limiter import get_rate_limiter
+from collections.abc import Callable
 from functools import cache
 import logging
 import json
 import datetime
+import hashlib
 import time
 
 logger = logging.getLogger(__name__)
 
 # Taken from https://github.com/BadgerHobbs/Parkrun-API-Python
-session = requests.Session()
-session.headers = {
+HEADERS: dict[str, str] = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:93.0) Gecko/20100101 Firefox/93.0",
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
     "Accept-Language": "en-US,en;q=0.5",
@@ -36,46 +40,137 @@ session.headers = {
     "Sec-Fetch-User": "?1"
 }
 
-last_query: datetime.datetime = datetime.datetime.min
-
 @cache
-def fetch(url: str, type_name: str, file_name: str, err_msg_404: str | None = None) -> str:
+def get_session() -> "requests.Session":
+    """
+    Return the requests session used for all queries, creating it on first use
+    so requests is only imported if something isn't in the cache.
+    """
+
+    import requests
+    session = requests.Session()
+    session.headers = HEADERS
+    return session
+
+def _validators_type_name(type_name: str) -> str:
+    return f"{type_name}_validators"
+
+def _validators_file_name(file_name: str) -> str:
+    return f"{file_name}.pickle"
+
+def _conditional_headers(type_name: str, file_name: str) -> dict[str, str]:
+    """
+    Return the headers to only fetch the given page if it has changed since it
+    was cached, using the ETag and Last-Modified headers it was served with.
+    """
+
+    validators: dict | None = check_cache_obj(_validators_type_name(type_name), _validators_file_name(file_name), allow_stale=True)
+    if validators is None:
+        return dict()
+
+    headers: dict[str, str] = dict()
+    if validators["etag"] is not None:
+        headers["If-None-Match"] = validators["etag"]
+    if validators["last_modified"] is not None:
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+def _write_validators(type_name: str, file_name: str, response: "requests.Response") -> None:
+    """
+    Store the ETag and Last-Modified headers of the given response for the page
+    of the given type and file names, if it has either.
+    """
+
+    etag: str | None = response.headers.get("ETag")
+    last_modified: str | None = response.headers.get("Last-Modified")
+    if etag is not None or last_modified is not None:
+        write_cache_obj(_validators_type_name(type_name), _validators_file_name(file_name), {
+            "etag": etag,
+            "last_modified": last_modified,
+        })
+
+# How many times to try querying a page if the connection fails or the website
+# has a server error (5xx), and how long to wait before the first retry, which
+# doubles after each
+MAX_FETCH_ATTEMPTS: int = 3
+RETRY_BACKOFF_SECS: float = 1.0
+
+def _get_with_retries(url: str, headers: dict[str, str]) -> "requests.Response":
+    """
+    Query the given URL with the given headers, waiting for the rate limit
+    before each attempt. Retry with exponential backoff if the connection fails
+    or there is a server error, up to MAX_FETCH_ATTEMPTS attempts in total. The
+    exception or response of the last attempt is raised or returned.
+    """
+
+    import requests
+
+    for attempt in range(MAX_FETCH_ATTEMPTS):
+        if attempt > 0:
+            backoff_secs: float = RETRY_BACKOFF_SECS * 2 ** (attempt - 1)
+            logger.warning("Retrying %s in %f seconds...", url, backoff_secs)
+            time.sleep(backoff_secs)
+
+        # Sleep if hitting this host too frequently
+        get_rate_limiter().acquire(url)
+
+        try:
+            response: requests.Response = get_session().get(url, headers=headers)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if attempt == MAX_FETCH_ATTEMPTS - 1:
+                raise
+            continue
+
+        if response.status_code < 500 or attempt == MAX_FETCH_ATTEMPTS - 1:
+            return response
+
+# Rough number of bytes used by an EventRunnerResult and the objects it
+# references
+EVENT_RUNNER_RESULT_SIZE: int = 1000
+
+@memory_cache()
+def fetch(
+    url: str,
+    type_name: str,
+    file_name: str,
+    err_msg_404: str | None = None,
+    extract_fragment: Callable[[str], str] | None = None,
+) -> str:
     """
     Get the data of given type and file names from the given URL, checking and
     updating the cache and handling errors. If given, raise a ParkrunException
     with the given error message upon 404. Also raises ParkrunException if fail
     to connect and nothing (even old) is in the cache. And raise HTTPError if
-    any other 4xx or 5xx status code is received.
+    any other 4xx or 5xx status code is received. Failing to connect and 5xx
+    status codes are retried first (see _get_with_retries). The ParkrunException raised
+    upon 404 is a ParkrunNotFoundException. If `extract_fragment` is given and
+    `CACHE_PAGE_MODE` is "fragment" then only the fragment of the page it
+    returns is cached and returned. If an out of date version is in the cache,
+    the page is only fetched if it has changed since then, according to the
+    ETag and Last-Modified headers it was served with, which are also cached.
     """
 
     # If it's in the cache, return that
     contents: str | None = check_cache_str(type_name, file_name)
-    if contents is not None:
+    if contents is not None and not is_outdated_fragment(contents):
         return contents
 
-    # Sleep if hitting the website too frequently
-    global last_query
-    wait_secs: float = (
-        datetime.timedelta(seconds=parkrun.MIN_SECS_BETWEEN_QUERIES) - \
-        (datetime.datetime.now() - last_query)
-    ).total_seconds()
+    import requests
 
-    if wait_secs > 0:
-        logger.debug("Rate limiting for %f seconds...", wait_secs)
-        time.sleep(wait_secs)
-
-    last_query = datetime.datetime.now()
+    # If there is an old version in the cache then only fetch the page if it
+    # has changed since then
+    headers: dict[str, str] = dict() if get_cache_force_invalid() else _conditional_headers(type_name, file_name)
+    stale: str | None = check_cache_str(type_name, file_name, allow_stale=True) if len(headers) > 0 else None
+    if stale is None or is_outdated_fragment(stale):
+        headers = dict()
 
     # Otherwise, try to fetch from the URL
     try:
-        response: requests.Response = session.get(url)
+        response: requests.Response = _get_with_retries(url, headers)
 
     # If can't connect then check the cache again, using any cached results
     except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.HTTPError) as e:
-        original_cache_force_valid: bool = parkrun._CACHE_FORCE_VALID
-        parkrun._CACHE_FORCE_VALID = True
-        contents: str | None = check_cache_str(type_name, file_name)
-        parkrun._CACHE_FORCE_VALID = original_cache_force_valid
+        contents: str | None = check_cache_str(type_name, file_name, allow_stale=True)
 
         # If no cache at all then raise exception
         if contents is None:
@@ -87,24 +182,66 @@ def fetch(url: str, type_name: str, file_name: str, err_msg_404: str | None = No
 
     # If provided, handle 404s with a special error message
     if response.status_code == 404 and err_msg_404 is not None:
-        raise ParkrunException(err_msg_404)
+        raise ParkrunNotFoundException(err_msg_404)
 
     # Raise a HTTPError for bad responses (4xx and 5xx)
     response.raise_for_status()
 
+    # If it hasn't changed then the old version is up to date
+    if response.status_code == 304 and len(headers) > 0:
+        logger.debug("not modified: %s/%s", type_name, file_name)
+        mark_fresh(type_name, file_name, datetime.datetime.now())
+        _write_validators(type_name, file_name, response)
+        return stale
+
+    # Cut down to just what is parsed unless it's not laid out as expected,
+    # in which case the parsers will fall back to the whole page
+    text: str = response.text
+    if extract_fragment is not None and get_cache_page_mode() == "fragment":
+        try:
+            text = extract_fragment(text)
+        except ParkrunException as e:
+            logger.warning("Caching all of %s/%s since extracting the fragment failed: %s", type_name, file_name, e)
+
     # Update the cache
-    write_cache_str(type_name, file_name, response.text)
+    write_cache_str(type_name, file_name, text)
+    _write_validators(type_name, file_name, response)
 
-    return response.text
+    return text
 
 @cache
-def _fetch_events_json() -> dict:
+def _fetch_event_index() -> EventIndex:
+    """
+    Return an EventIndex of events.json. The index is cached and invalidated in
+    the same way as events.json itself, so if it is valid then it was built
+    from the current events.json and neither needs reading. Otherwise,
+    events.json is fetched (or read from the cache if it is valid) and the
+    index is only built again if events.json has changed since, keeping the
+    old names of renamed events as aliases.
+    """
+
+    index: EventIndex | None = check_cache_obj("events_index", "events.pickle")
+    if index is not None and index.version == EVENT_INDEX_VERSION:
+        return index
+
     json_str: str = fetch(
         url="https://images.parkrun.com/events.json",
         type_name="events",
         file_name="events.json",
     )
-    return json.loads(json_str)
+    source_hash: str = hashlib.sha256(json_str.encode(ENCODING)).hexdigest()
+
+    # If events.json hasn't changed then the old index is up to date
+    index = check_cache_obj("events_index", "events.pickle", allow_stale=True)
+    if index is not None and index.version == EVENT_INDEX_VERSION and index.source_hash == source_hash:
+        mark_fresh("events_index", "events.pickle", datetime.datetime.now())
+        return index
+
+    # Keep the names of events that have been renamed so their old results
+    # are still found
+    index = EventIndex.from_dict(json.loads(json_str), source_hash, previous=index)
+    write_cache_obj("events_index", "events.pickle", index)
+    return index
 
 @cache
 def fetch_events() -> EventCollection:
@@ -112,7 +249,7 @@ def fetch_events() -> EventCollection:
     Return an EventCollection with all events.
     """
 
-    return EventCollection(_fetch_events_json())
+    return EventCollection(_fetch_event_index())
 
 @cache
 def fetch_countries() -> CountryCollection:
@@ -120,72 +257,112 @@ def fetch_countries() -> CountryCollection:
     Return a CountryCollection with all countries.
     """
 
-    return CountryCollection(_fetch_events_json())
+    return CountryCollection({"countries": _fetch_event_index().countries})
 
-@cache
-def fetch_event_result(
-    location_name: str,
-    event_number: int,
-) -> EventResult:
+def _parse_event_result_page_cached(event: Event, event_number: int, html: str) -> tuple[datetime.date, list[dict[str, str]]]:
     """
-    Return an EventResult object containing all results at the given location
-    for the given event number.
+    Return the date and rows of the given event result page of the given event
+    and event number. The result is cached along with a hash of the page and
+    the parser version so the page isn't parsed again unless it or the parser
+    has changed.
     """
 
-    # The URL depends on which country the location is in
-    events: EventCollection = fetch_events()
-    event: Event = events.get_event_by_name(location_name)
-    if event.country.id_ == 0:
-        raise ValueError("Event discontinued so can't fetch its results")
+    file_name: str = f"{event.url_name}-{event_number}.pickle"
+    html_hash: str = hashlib.sha256(html.encode(ENCODING)).hexdigest()
 
-    html: str = fetch(
-        url=f"https://{event.country.url}/{event.url_name}/results/{event_number}/",
-        type_name="event_result",
-        file_name=f"{event.url_name}-{event_number}.html",
-        err_msg_404=f"No event result exists at location '{location_name}' with event number {event_number}",
-    )
+    if get_cache_backend() == "sqlite":
+        cached: dict | None = cache_sqlite.check_event_result(event.id_, event_number)
+    else:
+        cached: dict | None = check_cache_obj("event_result_parsed", file_name)
+    if cached is not None and cached["parser_version"] == PARSER_VERSION and cached["html_hash"] == html_hash:
+        return datetime.date.fromisoformat(cached["date"]), cached["rows"]
 
-    # Parse the HTML response
-    soup = BeautifulSoup(html, "html.parser")
+    try:
+        date_text, rows = parse_event_result_page(html)
+    except ParkrunException as e:
+        raise ParkrunException(f"Unexpected event result page for location '{event.name}' with event number {event_number}: {e}") from e
 
     # Extract date
-    date_text: str = soup.find("div", {"class": "Results-header"}).find("h3").find("span", {"class": "format-date"}).text.strip()
     try:
         date: datetime.date = datetime.datetime.strptime(date_text, "%Y-%m-%d").date()
     except ValueError: # TODO: What if US format?
         date: datetime.date = datetime.datetime.strptime(date_text, "%d/%m/%Y").date()
 
-    # Extract the tables with finishers and volunteers in
-    tables: list[Tag] = soup.find_all("table")
-    assert len(tables) == 2, f"Unexpectedly found {len(tables)} rather than 2 tables in event result page for location '{location_name}' with event number {event_number}"
-    finishers_table, volunteers_table = tables
+    if get_cache_backend() == "sqlite":
+        cache_sqlite.write_event_result(event.id_, event_number, html_hash, PARSER_VERSION, date.isoformat(), rows)
+    else:
+        write_cache_obj("event_result_parsed", file_name, {
+            "parser_version": PARSER_VERSION,
+            "html_hash": html_hash,
+            "event_id": event.id_,
+            "event_number": event_number,
+            "date": date.isoformat(),
+            "rows": rows,
+        })
 
-    # Extract rows from the table
-    finisher_rows: list[Tag] = finishers_table.find_all("tr")
-    event_runner_results: list[EventRunnerResult] = []
-    for row in finisher_rows[1:]: # Skip the header row
+    return date, rows
 
-        # If this position hasn't been claimed then the position shows up, but
-        # nothing else and the ID is 2214 for some reason. In this case, we
-        # could add a special EventRunnerResult but instead we just skip it
-        if int(row.get("data-runs")) == 0:
-            continue
+def _event_result_file_name(event: Event, event_number: int) -> str:
+    return f"{event.url_name}-{event_number}.html"
+
+def is_event_result_cached(event: Event, event_number: int) -> bool:
+    """
+    Return whether the event result page of the given event and event number
+    is in the cache, without reading it.
+    """
+
+    return is_cache_valid("event_result", _event_result_file_name(event, event_number))
+
+def fetch_event_result_rows(event: Event, event_number: int) -> tuple[datetime.date, list[dict[str, str]]]:
+    """
+    Return the date and rows of the event result of the given event and event
+    number, fetching and parsing the page unless they are in the cache.
+    """
+
+    if event.country.id_ == 0:
+        raise ValueError("Event discontinued so can't fetch its results")
+
+    html: str = fetch(
+        url=f"https://{event.country.url}/{event.url_name}/results/{event_number}/",
+        type_name="event_result",
+        file_name=_event_result_file_name(event, event_number),
+        err_msg_404=f"No event result exists at location '{event.name}' with event number {event_number}",
+        extract_fragment=extract_event_result_fragment,
+    )
+
+    # Parse the HTML response, unless it has been parsed before
+    return _parse_event_result_page_cached(event, event_number, html)
 
-        cols: list[Tag] = row.find_all("td")
-        parkrunner_col: Tag = cols[1].find("div", {"class", "compact"})
-
-        event_runner_results.append(EventRunnerResult(
-            position=Position(row.get("data-position")),
-            name=row.get("data-name"),
-            id_=int(parkrunner_col.find("a")["href"].split("/")[-1]),
-            gender=row.get("data-gender"),
-            age_category=AgeCategory(row.get("data-agegroup")),
-            age_grade=AgeGrade(row.get("data-agegrade")),
-            club=row.get("data-club"),
-            groups=row.get("data-groups"),
-            achievement=row.get("data-achievement"),
-            time=Time.from_string(cols[5].find("div", {"class", "compact"}).text.strip()),
-        ))
+@memory_cache(lambda event_result: len(event_result.event_runner_results) * EVENT_RUNNER_RESULT_SIZE)
+def fetch_event_result(
+    location_name: str,
+    event_number: int,
+) -> EventResult:
+    """
+    Return an EventResult object containing all results at the given location
+    for the given event number.
+    """
+
+    # The URL depends on which country the location is in
+    events: EventCollection = fetch_events()
+    event: Event = events.get_event_by_name(location_name)
+    date, rows = fetch_event_result_rows(event, event_number)
+
+    event_runner_results: list[EventRunnerResult] = [
+        EventRunnerResult(
+            position=Position(row["position"]),
+            name=row["name"],
+            id_=int(row["id"]),
+            gender=row["gender"],
+            age_category=AgeCategory(row["agegroup"]),
+            age_grade=AgeGrade(row["agegrade"]),
+            club=row["club"],
+            groups=row["groups"],
+            achievement=row["achievement"],
+            time=Time.from_string(row["time"]),
+        )
+        for row in rows
+    ]
 
     # TODO: Volunteers table
 
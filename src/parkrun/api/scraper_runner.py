@@ -1,13 +1,250 @@
+from parkrun import get_cache_backend, get_cache_force_invalid, get_fetch_max_workers, get_incremental_refresh
+from parkrun.api import cache_sqlite
+from parkrun.api.cache import ENCODING, check_cache_obj, check_cache_str, is_cache_valid, last_modified, mark_fresh, write_cache_obj
+from parkrun.api.memory_cache import memory_cache
+from parkrun.api.parkrun_exception import ParkrunException
+from parkrun.api.parser import PARSER_VERSION, extract_runner_recent_fragment, extract_runner_results_fragment, parse_runner_recent_page, parse_runner_results_page
 from parkrun.api.scraper import fetch, fetch_events
 from parkrun.models.age_category import AgeCategory
 from parkrun.models.event_collection import EventCollection
 from parkrun.models.runner import Runner
-from parkrun.models.runner_result import RunnerResult
-from bs4 import BeautifulSoup, Tag
-from functools import cache
+from parkrun.models.runner_results import RunnerResults
+from concurrent.futures import Future, ThreadPoolExecutor
 import datetime
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# How many weeks a parkrunner's results are refreshed incrementally for before
+# all of them are fetched again, to pick up corrections to older results
+FULL_REFRESH_WEEKS: int = 4
+
+def _runner_results_file_name(number: int) -> str:
+    return f"{number}.html"
+
+def _hash_html(html: str) -> str:
+    return hashlib.sha256(html.encode(ENCODING)).hexdigest()
+
+def _check_parsed_runner(number: int, allow_stale: bool = False) -> dict | None:
+    """
+    Return the cached dictionary of the parsed runner results of the parkrunner
+    with the given number, containing the hash of the page it was parsed from
+    ("html_hash"), the parser version ("parser_version") and the result of
+    parsing ("name", "most_recent_age_category" and "rows"), or None if it's
+    not in the cache or not valid (unless `allow_stale` is true).
+    """
+
+    if get_cache_backend() == "sqlite":
+        return cache_sqlite.check_runner(number, allow_stale)
+    return check_cache_obj("runner_results_parsed", f"{number}.pickle", allow_stale)
+
+def _write_parsed_runner(number: int, parsed: dict) -> None:
+    """
+    Write the dictionary of the parsed runner results of the parkrunner with
+    the given number to the cache, as returned by _check_parsed_runner.
+    """
+
+    if get_cache_backend() == "sqlite":
+        cache_sqlite.write_runner(number, parsed["html_hash"], parsed["parser_version"], parsed["name"], parsed["most_recent_age_category"], parsed["rows"])
+    else:
+        write_cache_obj("runner_results_parsed", f"{number}.pickle", parsed)
+
+def _parse_runner_results_page_cached(number: int, html: str) -> tuple[str, str, list[list[str]]]:
+    """
+    Return the result of parse_runner_results_page on the given runner results
+    page of the parkrunner with the given number. The result is cached along
+    with a hash of the page and the parser version so the page isn't parsed
+    again unless it or the parser has changed.
+    """
+
+    # The page is the same as when it was parsed, so the parsed results are up
+    # to date even if they were cached before the most recent parkrun, e.g. if
+    # the page wasn't modified since then
+    html_hash: str = _hash_html(html)
+    cached: dict | None = _check_parsed_runner(number, allow_stale=True)
+    if cached is not None and cached["parser_version"] == PARSER_VERSION and cached["html_hash"] == html_hash:
+        return cached["name"], cached["most_recent_age_category"], cached["rows"]
+
+    try:
+        name, most_recent_age_cat_str, rows = parse_runner_results_page(html)
+    except ParkrunException as e:
+        raise ParkrunException(f"Unexpected runner results page of '{number}': {e}") from e
+
+    _write_parsed_runner(number, {
+        "parser_version": PARSER_VERSION,
+        "html_hash": html_hash,
+        "name": name,
+        "most_recent_age_category": most_recent_age_cat_str,
+        "rows": rows,
+    })
+
+    return name, most_recent_age_cat_str, rows
+
+def _result_key(row: list[str]) -> tuple[str, str, str]:
+    """
+    Return the date, location and run number of a row of a runner results table
+    which together identify the result.
+    """
+    return row[1], row[0], row[2]
+
+def merge_recent_rows(rows: list[list[str]], recent_rows: list[list[str]]) -> list[list[str]] | None:
+    """
+    Given the rows of all of a runner's results and the rows of their most
+    recent results (both most recent first), return the rows of all their
+    results with the recent results in place of the same results in all
+    results, since recent results are often corrected after first being
+    published. The recent results must overlap with the most recent of all
+    results, otherwise there could be results missing in between so return
+    None.
+    """
+
+    if len(rows) == 0:
+        return None
+
+    latest_key: tuple[str, str, str] = _result_key(rows[0])
+    for index, recent_row in enumerate(recent_rows):
+        if _result_key(recent_row) == latest_key:
+            break
+    else:
+        return None
+
+    # The rest of the recent results should be the same as the start of all
+    # results, otherwise something has changed further back
+    overlap: list[list[str]] = recent_rows[index:]
+    if list(map(_result_key, overlap)) != list(map(_result_key, rows[:len(overlap)])):
+        return None
+
+    return recent_rows + rows[len(overlap):]
+
+def _fetch_runner_results_incremental(number: int) -> tuple[str, str, list[list[str]]] | None:
+    """
+    Return the same as _parse_runner_results_page_cached but by fetching just
+    the parkrunner's recent results and merging them into their previously
+    parsed results, even if those are out of date. Return None if there are no
+    previously parsed results or they can't be merged so all the parkrunner's
+    results need fetching.
+    """
+
+    previous: dict | None = _check_parsed_runner(number, allow_stale=True)
+    if previous is None or previous["parser_version"] != PARSER_VERSION:
+        return None
+
+    html: str = fetch(
+        url=f"https://www.parkrun.org.uk/parkrunner/{number}/",
+        type_name="runner_recent",
+        file_name=_runner_results_file_name(number),
+        err_msg_404=f"No parkrunner exists with number '{number}'",
+        extract_fragment=extract_runner_recent_fragment,
+    )
+
+    # If these recent results have already been merged in then nothing to do
+    html_hash: str = _hash_html(html)
+    if previous["html_hash"] == html_hash:
+        return previous["name"], previous["most_recent_age_category"], previous["rows"]
+
+    try:
+        name, most_recent_age_cat_str, recent_rows = parse_runner_recent_page(html)
+    except ParkrunException as e:
+        logger.warning("Unexpected runner recent page of '%s' so fetching all results: %s", number, e)
+        return None
+
+    rows: list[list[str]] | None = merge_recent_rows(previous["rows"], recent_rows)
+    if rows is None:
+        logger.debug("Recent results of '%s' don't overlap with previous results so fetching all results", number)
+        return None
+
+    _write_parsed_runner(number, {
+        "parser_version": PARSER_VERSION,
+        "html_hash": html_hash,
+        "name": name,
+        "most_recent_age_category": most_recent_age_cat_str,
+        "rows": rows,
+    })
+
+    return name, most_recent_age_cat_str, rows
+
+def mark_runner_fresh(number: int, modified: datetime.datetime) -> None:
+    """
+    Mark the cached results of the parkrunner with the given number as last
+    modified at the given time (see cache.mark_fresh), whether they were
+    fetched in full or incrementally. Only the page their parsed results came
+    from is marked, since the other could be missing recent results.
+    """
+
+    parsed: dict | None = _check_parsed_runner(number, allow_stale=True)
+    if parsed is None:
+        return
+
+    for type_name in ("runner_results", "runner_recent"):
+        html: str | None = check_cache_str(type_name, _runner_results_file_name(number), allow_stale=True)
+        if html is not None and _hash_html(html) == parsed["html_hash"]:
+            mark_fresh(type_name, _runner_results_file_name(number), modified)
+
+    if get_cache_backend() == "sqlite":
+        cache_sqlite.mark_runner_fresh(number, modified.timestamp())
+    else:
+        mark_fresh("runner_results_parsed", f"{number}.pickle", modified)
+
+def _is_runner_cached(number: int) -> bool:
+    """
+    Return whether the results of the parkrunner with the given number can be
+    returned without fetching anything.
+    """
+
+    if is_cache_valid("runner_results", _runner_results_file_name(number)):
+        return True
+    return _use_incremental_refresh(number) and is_cache_valid("runner_recent", _runner_results_file_name(number))
+
+def _use_incremental_refresh(number: int) -> bool:
+    """
+    Return whether to try to just fetch the recent results of the parkrunner
+    with the given number rather than all their results. This is when all their
+    results are out of date, but were fetched in the last FULL_REFRESH_WEEKS
+    weeks, and the cache isn't forced to be invalid.
+    """
+
+    if not get_incremental_refresh() or get_cache_force_invalid():
+        return False
+    if is_cache_valid("runner_results", _runner_results_file_name(number)):
+        return False
+
+    modified: datetime.datetime | None = last_modified("runner_results", _runner_results_file_name(number))
+    return modified is not None and datetime.datetime.now() - modified < datetime.timedelta(weeks=FULL_REFRESH_WEEKS)
+
+@memory_cache(lambda runner: runner.results.estimated_size())
+def _fetch_all_runner_results(number: int) -> Runner:
+    """
+    Return a Runner object containing every parkrun the parkrunner has
+    completed. This is cached in memory by number only, so results between
+    different dates share the same entry.
+    """
+
+    # If all results are out of date then try to just fetch the recent results
+    parsed: tuple[str, str, list[list[str]]] | None = None
+    if _use_incremental_refresh(number):
+        parsed = _fetch_runner_results_incremental(number)
+
+    if parsed is None:
+        html: str = fetch(
+            url=f"https://www.parkrun.org.uk/parkrunner/{number}/all/",
+            type_name="runner_results",
+            file_name=_runner_results_file_name(number),
+            err_msg_404=f"No parkrunner exists with number '{number}'",
+            extract_fragment=extract_runner_results_fragment,
+        )
+
+        # Parse the HTML response, unless it has been parsed before
+        parsed = _parse_runner_results_page_cached(number, html)
+
+    name, most_recent_age_cat_str, results = parsed
+    most_recent_age_category: AgeCategory = AgeCategory(most_recent_age_cat_str)
+
+    all_events: EventCollection = fetch_events()
+    runner_results: RunnerResults = RunnerResults.from_table(results, all_events)
+
+    return Runner(number, name, most_recent_age_category, runner_results, datetime.date.min, datetime.date.max)
 
-@cache
 def fetch_runner_results(
     number: int,
     start_date: datetime.date = datetime.date.min,
@@ -18,42 +255,51 @@ def fetch_runner_results(
     between the start and end dates (inclusive), or all time if not provided.
     """
 
-    html: str = fetch(
-        url=f"https://www.parkrun.org.uk/parkrunner/{number}/all/",
-        type_name="runner_results",
-        file_name=f"{number}.html",
-        err_msg_404=f"No parkrunner exists with number '{number}'",
-    )
+    runner: Runner = _fetch_all_runner_results(number)
+    if start_date == datetime.date.min and end_date == datetime.date.max:
+        return runner
+    return runner.slice(start_date, end_date)
 
-    # Parse the HTML response
-    soup = BeautifulSoup(html, 'html.parser')
+def clear_runner_memory() -> None:
+    """
+    Forget the parkrunners kept in memory so they are read from the cache, or
+    fetched, again.
+    """
 
-    # Extract name
-    h2s: list[Tag] = soup.findAll('h2')
-    assert len(h2s) == 1, f"Unexpectedly found not 1 h2 tag in the runner results page of '{number}'"
-    name: str = h2s[0].contents[0].strip()
+    _fetch_all_runner_results.cache_clear()
 
-    # Extract most recent age category
-    try:
-        most_recent_age_cat_str = h2s[0].findNext('p').contents[-1].split()[-1]
-    except:
-        most_recent_age_cat_str = ""
-    most_recent_age_category: AgeCategory = AgeCategory(most_recent_age_cat_str)
+def fetch_many_runner_results(
+    numbers: list[int],
+    start_date: datetime.date = datetime.date.min,
+    end_date: datetime.date = datetime.date.max
+) -> list[Runner]:
+    """
+    Return a Runner object for each of the given parkrunner numbers, in the
+    same order, as if calling fetch_runner_results on each. Parkrunners whose
+    results are already in the cache are parsed straight away on this thread
+    while those that aren't are fetched and parsed by a pool of at most
+    `FETCH_MAX_WORKERS` threads. Fetches still share the same rate limit so
+    this only overlaps waiting for the website with parsing other pages. A
+    parkrunner being fetched by another thread at the same time, e.g. by
+    another call, isn't fetched again but waited for (see memory_cache).
+    """
 
-    # Ignore other tables as can be worked out from main table
-    results_tables: list[Tag] = soup.findAll('table', {'id': 'results'})
-    assert len(results_tables) == 3, f"Unexpectedly found not 3 tables with id 'results' in the runner results page of '{number}'"
-    all_results_table: Tag = results_tables[2]
+    # Make sure the events are loaded before starting any threads so they
+    # don't all try to fetch them at once
+    fetch_events()
 
-    # Extract rows from the table
-    rows: list[Tag] = all_results_table.find_all('tr')
-    results = []
-    for row in rows[1:]: # Skip the header row
-        cols = row.find_all('td')
-        results.append([col.text.strip() for col in cols])
+    runners: dict[int, Runner] = dict()
+    with ThreadPoolExecutor(max_workers=max(get_fetch_max_workers(), 1)) as executor:
+        futures: dict[int, Future] = dict()
+        for number in dict.fromkeys(numbers):
+            if not _is_runner_cached(number):
+                futures[number] = executor.submit(fetch_runner_results, number, start_date, end_date)
 
-    all_events: EventCollection = fetch_events()
-    runner_results: list[RunnerResult] = [RunnerResult.from_table(result, all_events) for result in results]
-    runner_results: list[RunnerResult] = list(filter(lambda result: start_date <= result.date <= end_date, runner_results))
+        for number in dict.fromkeys(numbers):
+            if number not in futures:
+                runners[number] = fetch_runner_results(number, start_date, end_date)
+
+        for number, future in futures.items():
+            runners[number] = future.result()
 
-    return Runner(number, name, most_recent_age_category, runner_results, start_date, end_date)
+    return [runners[number] for number in numbers]
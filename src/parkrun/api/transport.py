@@ -0,0 +1,153 @@
+"""
+Swap how the scraper queries the parkrun websites. By default, the requests
+session in scraper.py queries them over the network, but FixtureAdapter can be
+used instead to serve recorded pages locally with configurable latency and
+errors. This allows the fetching to be tested and benchmarked deterministically
+without the network.
+"""
+
+from __future__ import annotations
+from collections.abc import Callable
+from http import HTTPStatus
+import logging
+import os
+from pathlib import Path
+import threading
+import time
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from parkrun.api import scraper
+
+logger = logging.getLogger(__name__)
+
+class FixturePage:
+    """
+    A page served by FixtureAdapter with the given body and status code. If
+    `fail` is True, the connection fails instead. If `latency` isn't None, it
+    overrides the latency of the adapter for this page. If `etag` or
+    `last_modified` are given, they are served as the ETag and Last-Modified
+    headers and conditional requests matching them get a 304 with no body. If
+    `fail_times` isn't None, the page only fails (with `fail` or `status_code`)
+    the first `fail_times` times it is requested and is served with a 200 after
+    that, e.g. to test retrying.
+    """
+
+    def __init__(
+        self,
+        body: str = "",
+        status_code: int = 200,
+        fail: bool = False,
+        latency: float | None = None,
+        etag: str | None = None,
+        last_modified: str | None = None,
+        fail_times: int | None = None,
+    ):
+        self.body: str = body
+        self.status_code: int = status_code
+        self.fail: bool = fail
+        self.latency: float | None = latency
+        self.etag: str | None = etag
+        self.last_modified: str | None = last_modified
+        self.fail_times: int | None = fail_times
+        self.num_requests: int = 0
+
+    def is_not_modified(self, request: requests.PreparedRequest) -> bool:
+        """
+        Return whether the request is conditional and the page matches it.
+        """
+
+        if self.etag is not None and "If-None-Match" in request.headers:
+            return request.headers["If-None-Match"] == self.etag
+        return self.last_modified is not None and request.headers.get("If-Modified-Since") == self.last_modified
+
+class FixtureAdapter(BaseAdapter):
+    """
+    A requests adapter that serves the given pages by URL instead of querying
+    the network, waiting `latency` seconds before each response. Any URL not in
+    `pages` gets a 404. All URLs requested are recorded in `requested`, in
+    order.
+    """
+
+    def __init__(
+        self,
+        pages: dict[str, str | FixturePage] | None = None,
+        latency: float = 0.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        super().__init__()
+        self.pages: dict[str, FixturePage] = {
+            url: page if isinstance(page, FixturePage) else FixturePage(page)
+            for url, page in (pages or dict()).items()
+        }
+        self.latency: float = latency
+        self._sleep: Callable[[float], None] = sleep
+        self.requested: list[str] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def from_directory(directory: Path, latency: float = 0.0) -> FixtureAdapter:
+        """
+        Return a FixtureAdapter serving each file in the given directory at the
+        URL of its path, where the first directory is the host, e.g.
+        `www.parkrun.org.uk/parkrunner/1/all/index.html` is served at
+        `https://www.parkrun.org.uk/parkrunner/1/all/` and
+        `images.parkrun.com/events.json` at
+        `https://images.parkrun.com/events.json`.
+        """
+
+        pages: dict[str, str] = dict()
+        for root, _, file_names in os.walk(directory):
+            for file_name in file_names:
+                path: Path = Path(root) / file_name
+                url_path: str = path.relative_to(directory).as_posix()
+                if file_name == "index.html":
+                    url_path = url_path.removesuffix("index.html")
+                pages[f"https://{url_path}"] = path.read_text(encoding="utf-8")
+
+        logger.info("Serving %d pages from %s", len(pages), directory)
+        return FixtureAdapter(pages, latency)
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        page: FixturePage = self.pages.get(request.url, FixturePage(status_code=404))
+        with self._lock:
+            self.requested.append(request.url)
+            page.num_requests += 1
+            recovered: bool = page.fail_times is not None and page.num_requests > page.fail_times
+        latency: float = self.latency if page.latency is None else page.latency
+        if latency > 0:
+            self._sleep(latency)
+
+        if page.fail and not recovered:
+            raise requests.exceptions.ConnectionError(f"Fixture connection failure for {request.url}", request=request)
+
+        status_code: int = 200 if recovered else page.status_code
+        not_modified: bool = status_code == 200 and page.is_not_modified(request)
+        response = requests.Response()
+        response.status_code = 304 if not_modified else status_code
+        try:
+            response.reason = HTTPStatus(response.status_code).phrase
+        except ValueError:
+            response.reason = ""
+        if page.etag is not None:
+            response.headers["ETag"] = page.etag
+        if page.last_modified is not None:
+            response.headers["Last-Modified"] = page.last_modified
+        response._content = b"" if not_modified else page.body.encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self) -> None:
+        pass
+
+def use_adapter(adapter: BaseAdapter | None) -> None:
+    """
+    Make the scraper use the given adapter for all queries, or go back to
+    querying the network if None.
+    """
+
+    if adapter is None:
+        adapter = HTTPAdapter()
+    scraper.get_session().mount("https://", adapter)
+    scraper.get_session().mount("http://", adapter)
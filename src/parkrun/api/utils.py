@@ -1,5 +1,6 @@
 import datetime
 from collections import Counter
+from collections.abc import Sequence
 from typing import Any
 
 def maximals(*args, key=None) -> list:
@@ -64,6 +65,31 @@ def minimals(*args, key=None) -> list:
 
     return values
 
+def minimal_indexes(values: Sequence) -> list[int]:
+    """
+    Return the indexes of all elements of the given sequence that have the
+    minimum value, in order. Finding the minimum with the builtin min first
+    is much quicker than comparing each element in Python.
+    """
+
+    if len(values) == 0:
+        return []
+
+    min_value = min(values)
+    return [index for index, value in enumerate(values) if value == min_value]
+
+def maximal_indexes(values: Sequence) -> list[int]:
+    """
+    Return the indexes of all elements of the given sequence that have the
+    maximum value, in order.
+    """
+
+    if len(values) == 0:
+        return []
+
+    max_value = max(values)
+    return [index for index, value in enumerate(values) if value == max_value]
+
 def most_common(counter: Counter) -> tuple[list[Any], int]:
     """
     Given a counter, return the maximum number of any one thing and the list of
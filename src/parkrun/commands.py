@@ -0,0 +1,41 @@
+"""
+The commands that cli.py can run and the daemon can run for it.
+"""
+
+# The module and function of each command, only imported if it is run so that
+# starting up doesn't import every table and graph and their dependencies
+commands: dict[str, tuple[str, str]] = {
+    "activity": ("parkrun.graphs.activity", "activity_graph"),
+    "times": ("parkrun.graphs.times", "time_graph"),
+    "achievements": ("parkrun.tables.achievements", "achievements"),
+    "common_run_comparison": ("parkrun.tables.common_run_comparison", "common_run_comparison"),
+    "latest_update": ("parkrun.tables.latest_update", "latest_update"),
+    "most_common_location": ("parkrun.tables.most_common", "most_common_location"),
+    "most_common_location_initial": ("parkrun.tables.most_common", "most_common_location_initial"),
+    "most_common_month": ("parkrun.tables.most_common", "most_common_month"),
+    "most_common_time_seconds": ("parkrun.tables.most_common", "most_common_time_seconds"),
+    "most_common_year": ("parkrun.tables.most_common", "most_common_year"),
+    "most_common_country": ("parkrun.tables.most_common", "most_common_country"),
+    "overlap_matrix": ("parkrun.tables.overlap", "overlap_matrix"),
+    "top_co_runners": ("parkrun.tables.overlap", "top_co_runners"),
+    "pb_progress": ("parkrun.tables.pb_progress", "pb_progress"),
+    "runner_stats": ("parkrun.tables.runner_stats", "runner_stats"),
+    "runner_stats_by_period": ("parkrun.tables.runner_stats_by_period", "runner_stats_by_period"),
+    "migrate_cache": ("parkrun.api.cache_sqlite", "migrate_cache"),
+    "collect_garbage_blobs": ("parkrun.api.cache", "collect_garbage_blobs"),
+    "crawl_event_results": ("parkrun.api.crawler", "crawl_event_results"),
+    "daemon": ("parkrun.api.daemon", "serve"),
+    "prewarm": ("parkrun.api.prewarm", "prewarm"),
+}
+
+# Commands whose function takes no arguments
+commands_without_runners: set[str] = {"migrate_cache", "collect_garbage_blobs", "daemon"}
+
+# Commands whose function takes just the runners
+commands_without_dates: set[str] = {"prewarm"}
+
+# Commands whose function also takes the period to group results by
+commands_with_period: set[str] = {"runner_stats_by_period"}
+
+# Commands whose function takes locations and a country instead of runners
+commands_with_locations: set[str] = {"crawl_event_results"}
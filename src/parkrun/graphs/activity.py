@@ -1,6 +1,6 @@
 from parkrun import get_table_max_width
-from parkrun.api.cache import parkrun_before
-from parkrun.api.scraper_runner import fetch_runner_results
+from parkrun.api.parkrun_calendar import ParkrunCalendar, get_parkrun_calendar
+from parkrun.api.scraper_runner import fetch_many_runner_results
 from parkrun.api.utils import date_description
 from parkrun.models.runner import Runner
 from collections import Counter
@@ -25,7 +25,7 @@ def activity_graph(
     to the first and last ever parkrun by any runner.
     """
 
-    runners: list[Runner] = [fetch_runner_results(runner_id, start_date, end_date) for runner_id in runner_ids]
+    runners: list[Runner] = fetch_many_runner_results(runner_ids, start_date, end_date)
     runners_with_results: list[Runner] = list(filter(lambda runner: len(runner.results) > 0, runners))
 
     date_desc: str = date_description(start_date, end_date)
@@ -54,6 +54,7 @@ def activity_graph(
     runner_counts: list[list[int]] = [[] for _ in runner_ids]
     max_parkruns: list[int] = []
     num_months: int = _get_num_months(first_run_date, last_run_date)
+    calendar: ParkrunCalendar = get_parkrun_calendar()
     for month_num in range(num_months):
         years_to_add, month = divmod(first_run_date.month + month_num, 12)
         year: int = first_run_date.year + years_to_add
@@ -67,14 +68,9 @@ def activity_graph(
 
         # Calculate the maximum number of parkruns that could have been run
         # this month, staying within first_run_date and last_run_date
-        date: datetime.date = min(last_run_date + datetime.timedelta(days=1), datetime.date(year, month, 1) + relativedelta(months=1))
-        num_parkruns: int = 0
-        while True:
-            date = parkrun_before(date)
-            if date.month != month or date < first_run_date:
-                break
-            num_parkruns += 1
-        max_parkruns.append(num_parkruns)
+        month_start: datetime.date = datetime.date(year, month, 1)
+        month_end: datetime.date = month_start + relativedelta(months=1) - datetime.timedelta(days=1)
+        max_parkruns.append(calendar.count_between(max(month_start, first_run_date), min(month_end, last_run_date)))
 
     # Print the data too
     table = Texttable(get_table_max_width())
@@ -1,5 +1,5 @@
 from parkrun.models.runner import Runner
-from parkrun.api.scraper_runner import fetch_runner_results
+from parkrun.api.scraper_runner import fetch_many_runner_results
 from parkrun.api.utils import date_description
 import datetime
 import matplotlib.pyplot as plt
@@ -23,7 +23,7 @@ def time_graph(
     ran).
     """
 
-    runners: list[Runner] = [fetch_runner_results(runner_id, start_date, end_date) for runner_id in runner_ids]
+    runners: list[Runner] = fetch_many_runner_results(runner_ids, start_date, end_date)
 
     # Plot each parkrunner separately but on the same axis - `dates` will be
     # different for each parkrunner but MatPlotLib will work it out.
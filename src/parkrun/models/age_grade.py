@@ -4,6 +4,8 @@ class AgeGrade:
     Value is a float between 0 and 1 representing the percentage.
     String is formatted 'xx.xx%'.
     """
+    __slots__ = ("string", "value")
+
     def __init__(self, string: str):
         self.string: str = string
 
@@ -1,7 +1,16 @@
 from __future__ import annotations
-import pycountry
+from functools import cache, cached_property
 
-tld_to_name: dict[str, str] = {country.alpha_2.upper(): country.name for country in pycountry.countries}
+@cache
+def get_tld_to_name() -> dict[str, str]:
+    """
+    Return a dictionary from each upper case two letter country code to the name
+    of the country. This is built on first use because importing pycountry and
+    going through all countries is slow.
+    """
+
+    import pycountry
+    return {country.alpha_2.upper(): country.name for country in pycountry.countries}
 
 class Country:
     def __init__(
@@ -14,7 +23,10 @@ class Country:
         self.url: str | None = url
         self.bounds: list[int] = bounds
         self.tld: str = url.split(".")[-1].upper() if url is not None else "Unknown (discontinued event)"
-        self.name: str = tld_to_name.get(self.tld, self.tld)
+
+    @cached_property
+    def name(self) -> str:
+        return get_tld_to_name().get(self.tld, self.tld)
 
     def __eq__(self, other) -> bool:
         if isinstance(other, Country):
@@ -46,10 +46,11 @@ class Event:
     def __str__(self) -> str:
         return self.name
 
+    # Discontinued events all have ID 0 so are told apart by name
     def __eq__(self, other) -> bool:
         if isinstance(other, Event):
-            return self.id_ == other.id_
+            return self.id_ == other.id_ and (self.id_ != 0 or self.name == other.name)
         return False
 
     def __hash__(self) -> int:
-        return hash(self.id_)
+        return hash(self.id_) if self.id_ != 0 else hash(self.name)
@@ -1,30 +1,134 @@
+from bisect import bisect_left
+import difflib
+from functools import cached_property
+import threading
+from parkrun.models.country import Country
 from parkrun.models.country_collection import CountryCollection
 from parkrun.models.event import Event
+from parkrun.models.event_index import EventIndex, normalise_name
 
 class EventCollection:
-    def __init__(self, events: dict):
-        self._countries = CountryCollection(events)
-        self.events_by_id: dict[int, Event] = dict()
-        self.event_ids_by_name: dict[str, int] = dict()
-        for event in events["events"]["features"]:
-            event = Event.from_dict(event, self._countries)
-            self.events_by_id[event.id_] = event
-            self.event_ids_by_name[event.name] = event.id_
+    """
+    All events, from either the parsed events.json or an EventIndex of it. Each
+    Event is only created the first time it is looked up.
+    """
+
+    def __init__(self, events: dict | EventIndex):
+        self._index: EventIndex = events if isinstance(events, EventIndex) else EventIndex.from_dict(events)
+        self._countries = CountryCollection({"countries": self._index.countries})
+        self._rows_by_id: dict[int, int] = dict(zip(self._index.ids, range(len(self._index))))
+        self._rows_by_name: dict[str, int] = dict(zip(self._index.names, range(len(self._index))))
+        self._events: list[Event | None] = [None] * len(self._index)
+        self._discontinued: dict[str, Event] = dict()
+        self._discontinued_lock = threading.Lock()
+
+    def _event(self, row: int) -> Event:
+        event: Event | None = self._events[row]
+        if event is None:
+            index: EventIndex = self._index
+            country: Country | None = self._countries.get_country_by_id(index.country_ids[row])
+            if country is None:
+                country = self._countries.get_country_by_id(0)
+            event = Event(index.ids[row], index.names[row], index.url_names[row], index.lats[row], index.longs[row], country, index.series[row])
+            self._events[row] = event
+        return event
+
+    @cached_property
+    def events_by_id(self) -> dict[int, Event]:
+        return {event.id_: event for event in self}
+
+    @cached_property
+    def event_ids_by_name(self) -> dict[str, int]:
+        return {name: self._index.ids[row] for name, row in self._rows_by_name.items()}
+
+    @cached_property
+    def _rows_by_normalised_name(self) -> dict[str, int]:
+        """
+        The row of each event by its normalised current name and aliases. Only
+        built the first time a name isn't found exactly.
+        """
+
+        rows: dict[str, int] = dict()
+        for name, id_ in self._index.aliases.items():
+            if id_ in self._rows_by_id:
+                rows.setdefault(normalise_name(name), self._rows_by_id[id_])
+
+        # Current names take precedence over aliases
+        rows.update(zip(self._index.normalised_names, range(len(self._index))))
+        return rows
+
+    @cached_property
+    def _sorted_normalised_names(self) -> list[str]:
+        return sorted(self._rows_by_normalised_name)
+
+    def find_event_by_name(self, name: str) -> Event | None:
+        """
+        Return the event with the given name, or one it had previously, ignoring
+        accents, case and punctuation if not found exactly, or None if there is
+        none.
+        """
+
+        row: int | None = self._rows_by_name.get(name)
+        if row is None and name in self._index.aliases:
+            row = self._rows_by_id.get(self._index.aliases[name])
+        if row is None:
+            row = self._rows_by_normalised_name.get(normalise_name(name))
+        return None if row is None else self._event(row)
 
     def get_event_by_name(self, name: str) -> Event:
         """
-        Return the event with given name or a dummy event if not present.
+        Return the event with given name as in find_event_by_name or a dummy
+        event if not present. The same dummy event is returned for the same
+        name so results at a discontinued event share the same location.
         TODO: Should return None and handle in all uses?
         """
-        if name not in self.event_ids_by_name:
-            return Event(0, f"{name} (discontinued)", name, 0.0, 0.0, self._countries.get_country_by_id(0), 0)
-        return self.events_by_id[self.event_ids_by_name[name]]
+
+        event: Event | None = self.find_event_by_name(name)
+        if event is not None:
+            return event
+
+        # Runners' results are parsed on several threads at once
+        with self._discontinued_lock:
+            if name not in self._discontinued:
+                self._discontinued[name] = Event(0, f"{name} (discontinued)", name, 0.0, 0.0, self._countries.get_country_by_id(0), 0)
+            return self._discontinued[name]
 
     def get_event_by_id(self, id_: int) -> Event | None:
-        return self.events_by_id.get(id_)
+        row: int | None = self._rows_by_id.get(id_)
+        return None if row is None else self._event(row)
+
+    def search(self, query: str, limit: int = 10) -> list[Event]:
+        """
+        Return at most `limit` events whose names start with the given query,
+        ignoring accents, case and punctuation, in alphabetical order. If there
+        are fewer than that, follow them with the events whose names are most
+        similar to the query, e.g. to suggest events when one isn't found.
+        """
+
+        query = normalise_name(query)
+        names: list[str] = self._sorted_normalised_names
+        matches: list[str] = []
+        start: int = bisect_left(names, query)
+        for name in names[start:start + limit]:
+            if not name.startswith(query):
+                break
+            matches.append(name)
+
+        if len(matches) < limit:
+            for name in difflib.get_close_matches(query, names, limit):
+                if name not in matches and len(matches) < limit:
+                    matches.append(name)
+
+        # An event can have several names so only return it once
+        events: dict[int, Event] = dict()
+        for name in matches:
+            row: int = self._rows_by_normalised_name[name]
+            events.setdefault(row, self._event(row))
+        return list(events.values())
 
     def __iter__(self):
-        yield from self.events_by_id.values()
+        for row in self._rows_by_id.values():
+            yield self._event(row)
 
     def __repr__(self) -> str:
-        return f"EventCollection(count={len(self.event_ids_by_name)})"
+        return f"EventCollection(count={len(self._rows_by_name)})"
@@ -0,0 +1,98 @@
+from __future__ import annotations
+from array import array
+import re
+import unidecode
+
+# Increment when the columns of EventIndex change so indexes cached by older
+# versions are built again
+EVENT_INDEX_VERSION: int = 2
+
+_RE_NOT_ALPHANUMERIC = re.compile(r"[^0-9a-z]+")
+
+def normalise_name(name: str) -> str:
+    """
+    Return the given event name without accents, case, punctuation or extra
+    spaces so the same name written differently is found, e.g. "Ōtautahi" and
+    "St. Peter's" are normalised to "otautahi" and "st peter s".
+    """
+
+    return _RE_NOT_ALPHANUMERIC.sub(" ", unidecode.unidecode(name).lower()).strip()
+
+class EventIndex:
+    """
+    A compact table of every event in events.json, stored as a column per field
+    rather than an Event per event, so it can be cached and loaded quickly
+    without parsing events.json again. Row i of each column is for the i'th
+    event in events.json. `countries` is the "countries" object of events.json
+    as is since it is small. `normalised_names` are the names as returned by
+    normalise_name, precomputed since that is slow. `source_hash` is the SHA-256 hash of the
+    events.json it was built from so it is only built again when that changes.
+    `aliases` is the ID of each event by any names it had in previous versions
+    of events.json, since results are listed under the name at the time.
+    """
+
+    def __init__(
+        self,
+        source_hash: str,
+        countries: dict[str, dict],
+        ids: array,
+        names: list[str],
+        normalised_names: list[str],
+        url_names: list[str],
+        lats: array,
+        longs: array,
+        country_ids: array,
+        series: array,
+        aliases: dict[str, int],
+    ):
+        self.version: int = EVENT_INDEX_VERSION
+        self.source_hash: str = source_hash
+        self.countries: dict[str, dict] = countries
+        self.ids: array = ids
+        self.names: list[str] = names
+        self.normalised_names: list[str] = normalised_names
+        self.url_names: list[str] = url_names
+        self.lats: array = lats
+        self.longs: array = longs
+        self.country_ids: array = country_ids
+        self.series: array = series
+        self.aliases: dict[str, int] = aliases
+
+    @staticmethod
+    def from_dict(events: dict, source_hash: str = "", previous: EventIndex | None = None) -> EventIndex:
+        """
+        Return a new EventIndex of the given parsed events.json. If given, the
+        aliases of the index of the previous events.json are kept, along with
+        the previous names of any events that have been renamed since.
+        """
+
+        features: list[dict] = events["events"]["features"]
+        names: list[str] = [event["properties"]["EventShortName"] for event in features]
+        index = EventIndex(
+            source_hash,
+            events["countries"],
+            array("l", (event["id"] for event in features)),
+            names,
+            [normalise_name(name) for name in names],
+            [event["properties"]["eventname"] for event in features],
+            array("d", (event["geometry"]["coordinates"][0] for event in features)),
+            array("d", (event["geometry"]["coordinates"][1] for event in features)),
+            array("l", (event["properties"]["countrycode"] for event in features)),
+            array("b", (event["properties"]["seriesid"] for event in features)),
+            dict(),
+        )
+
+        if previous is not None:
+            current_names: set[str] = set(names)
+            ids: set[int] = set(index.ids)
+            old_names: dict[str, int] = dict(getattr(previous, "aliases", dict()))
+            old_names.update(zip(previous.names, previous.ids))
+            index.aliases = {name: id_ for name, id_ in old_names.items() if name not in current_names and id_ in ids}
+
+        return index
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __repr__(self) -> str:
+        return f"EventIndex(count={len(self)})"
@@ -2,6 +2,8 @@ from __future__ import annotations
 
 # TODO: Extend bool to inherit all its operations?
 class PB:
+    __slots__ = ("is_pb",)
+
     def __init__(self, is_pb: bool):
         self.is_pb: bool = is_pb
 
@@ -3,6 +3,8 @@ def get_ordinal_suffix(n: int) -> str:
 
 # TODO: Extend int to inherit all its operations?
 class Position:
+    __slots__ = ("value", "string")
+
     def __init__(self, position: str):
         self.value: int = int(position)
         self.string: str = f"{position}{get_ordinal_suffix(self.value)}"
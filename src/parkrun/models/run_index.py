@@ -0,0 +1,122 @@
+from __future__ import annotations
+import datetime
+from parkrun.models.event import Event
+from parkrun.models.runner import Runner
+from parkrun.models.runner_result import RunnerResult
+
+# A key identifying a single parkrun: a location key (see RunIndex) and the
+# proleptic Gregorian ordinal of the date
+RunKey = tuple[int, int]
+
+class RunIndex:
+    """
+    Index of the results of many runners by the parkrun they were at (location
+    and date) so who ran together can be looked up directly. Built in one pass
+    over each runner's result columns without creating RunnerResult objects or
+    formatting anything.
+
+    Runners are referred to by their index in `runners`. Locations are keyed by
+    their event ID, except that discontinued events all have ID 0 so each is
+    given its own negative key by name instead.
+    """
+
+    def __init__(self, runners: list[Runner]):
+        self.runners: list[Runner] = runners
+        self.locations: dict[int, Event] = dict()
+        self._discontinued_keys: dict[str, int] = dict()
+
+        # For each parkrun, the index of each runner there and of their result
+        self.runs: dict[RunKey, list[tuple[int, int]]] = dict()
+
+        # For each runner, the key of each of their results in order
+        self.runner_keys: list[list[RunKey]] = []
+
+        for runner_index, runner in enumerate(runners):
+            results = runner.results
+            location_keys: list[int] = [self._location_key(event) for event in results.events]
+            keys: list[RunKey] = [
+                (location_keys[event_index], ordinal)
+                for event_index, ordinal in zip(results.event_indexes, results.dates)
+            ]
+            for result_index, key in enumerate(keys):
+                self.runs.setdefault(key, []).append((runner_index, result_index))
+            self.runner_keys.append(keys)
+
+    def _location_key(self, event: Event) -> int:
+        if event.id_ != 0:
+            key: int = event.id_
+        else:
+            key: int = self._discontinued_keys.setdefault(event.name, -len(self._discontinued_keys) - 1)
+        self.locations.setdefault(key, event)
+        return key
+
+    def location(self, key: RunKey) -> Event:
+        return self.locations[key[0]]
+
+    def date(self, key: RunKey) -> datetime.date:
+        return datetime.date.fromordinal(key[1])
+
+    def result(self, runner_index: int, result_index: int) -> RunnerResult:
+        return self.runners[runner_index].results[result_index]
+
+    def sort_key(self, key: RunKey) -> tuple[int, str]:
+        """
+        Key to sort parkruns by date and then location name.
+        """
+        return key[1], self.location(key).name
+
+    def runners_at(self, key: RunKey) -> list[tuple[int, int]]:
+        """
+        Return the index of each runner at the given parkrun and of their
+        result there, in the order of `runners`.
+        """
+        return self.runs.get(key, [])
+
+    def together(self, min_runners: int = 2) -> dict[RunKey, list[tuple[int, int]]]:
+        """
+        Return the runners at each parkrun that at least `min_runners` of the
+        runners did, as in `runners_at`.
+        """
+        return {key: entries for key, entries in self.runs.items() if len({runner_index for runner_index, _ in entries}) >= min_runners}
+
+    def common_to_all(self) -> dict[RunKey, list[tuple[int, int]]]:
+        """
+        Return the runners at each parkrun that all the runners did, as in
+        `runners_at`.
+        """
+        return self.together(len(self.runners))
+
+    def common_runs(self, runner_index: int, other_index: int) -> list[RunKey]:
+        """
+        Return the parkruns that both of the given runners did, in the order of
+        the first runner's results (most recent first).
+        """
+
+        return [
+            key for key in self.runner_keys[runner_index]
+            if any(index == other_index for index, _ in self.runs[key])
+        ]
+
+    def overlap_matrix(self) -> list[list[int]]:
+        """
+        Return the number of parkruns that each pair of runners did together,
+        where the entry in row i and column j is for runners i and j, and the
+        diagonal is the number of different parkruns each runner did. This
+        takes time proportional to the total number of results plus, for each
+        parkrun, the square of the number of runners at it.
+        """
+
+        matrix: list[list[int]] = [[0] * len(self.runners) for _ in self.runners]
+        for entries in self.runs.values():
+            runner_indexes: set[int] = {runner_index for runner_index, _ in entries}
+            for runner_index in runner_indexes:
+                row: list[int] = matrix[runner_index]
+                for other_index in runner_indexes:
+                    row[other_index] += 1
+        return matrix
+
+    def __len__(self) -> int:
+        return len(self.runs)
+
+    def __repr__(self) -> str:
+        return f"RunIndex({len(self.runners)} runners, {len(self.runs)} parkruns)"
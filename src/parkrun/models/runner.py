@@ -1,13 +1,17 @@
+from __future__ import annotations
+from array import array
 import datetime
 from collections import Counter
 from functools import cached_property
 from parkrun.models.country import Country
 from parkrun.models.event import Event
-from parkrun.api.cache import most_recent_parkrun, parkrun_before
+from parkrun.api.cache import most_recent_parkrun
+from parkrun.api.parkrun_calendar import ParkrunCalendar, get_parkrun_calendar
 from parkrun.models.age_category import AgeCategory
 from parkrun.models.runner_result import RunnerResult
+from parkrun.models.runner_results import RunnerResults
 from parkrun.models.time import Time
-from parkrun.api.utils import minimals, maximals, most_common, date_description
+from parkrun.api.utils import minimal_indexes, maximal_indexes, most_common, date_description
 
 class Runner:
     def __init__(
@@ -15,58 +19,140 @@ class Runner:
         number: int,
         name: str,
         most_recent_age_category: AgeCategory,
-        results: list[RunnerResult],
+        results: RunnerResults | list[RunnerResult],
         start_date: datetime.date,
         end_date: datetime.date
     ):
         """
         Assume results in descending order of date. Only stores results
         between start_date and end_date, but most_recent_age_category could be
-        since then.
+        since then. A list of results is converted to RunnerResults.
         """
 
+        if not isinstance(results, RunnerResults):
+            results = RunnerResults.from_results(results)
+
         self.number: int = number
         self.name: str = name
         self.most_recent_age_category: AgeCategory = most_recent_age_category
-        self.results: list[RunnerResult] = results
+        self.results: RunnerResults = results
         self.start_date: datetime.date = start_date
         self.end_date: datetime.date = end_date
 
-        # Calculated stats
-        # TODO: Move these to different function?
-        self.best_times: list[RunnerResult] = minimals(results, key=lambda result: result.time.timedelta)
-        self.best_positions: list[RunnerResult] = minimals(results, key=lambda result: result.position.value)
-        self.best_age_grades: list[RunnerResult] = maximals(results, key=lambda result: result.age_grade.value)
-        self.first_result: RunnerResult | None = results[-1] if len(results) > 0 else None
-        self.latest_result: RunnerResult | None = results[0] if len(results) > 0 else None
+    def slice(self, start_date: datetime.date, end_date: datetime.date) -> Runner:
+        """
+        Return a Runner with just the results between the given dates
+        (inclusive) and within this Runner's dates. The results are a view of
+        this Runner's results so nothing is parsed or copied, but the stats are
+        calculated separately.
+        """
+
+        start_date = max(start_date, self.start_date)
+        end_date = min(end_date, self.end_date)
+        return Runner(self.number, self.name, self.most_recent_age_category, self.results.filter_dates(start_date, end_date), start_date, end_date)
+
+    def _results_at(self, indexes: list[int]) -> list[RunnerResult]:
+        return [self.results[index] for index in indexes]
+
+    @cached_property
+    def best_times(self) -> list[RunnerResult]:
+        """
+        All results with the fastest time, most recent first.
+        """
+        return self._results_at(minimal_indexes(self.results.seconds))
+
+    @cached_property
+    def best_positions(self) -> list[RunnerResult]:
+        """
+        All results with the best finish position, most recent first.
+        """
+        return self._results_at(minimal_indexes(self.results.positions))
+
+    @cached_property
+    def best_age_grades(self) -> list[RunnerResult]:
+        """
+        All results with the highest age grade, most recent first.
+        """
+        return self._results_at(maximal_indexes(self.results.age_grades))
+
+    @property
+    def first_result(self) -> RunnerResult | None:
+        return self.results[-1] if len(self.results) > 0 else None
+
+    @property
+    def latest_result(self) -> RunnerResult | None:
+        return self.results[0] if len(self.results) > 0 else None
+
+    @cached_property
+    def total_run_time(self) -> Time:
+        return Time.from_timedelta(datetime.timedelta(seconds=sum(self.results.seconds)))
+
+    @cached_property
+    def average_run_time(self) -> Time:
+        return Time.from_timedelta(self.total_run_time.timedelta / max(len(self.results), 1))
+
+    @cached_property
+    def unique_locations(self) -> set[Event]:
+        """
+        The locations of the results. Views of the results share the list of
+        events with the original so use the locations counter, not that list.
+        """
+        return set(self.locations_counter)
+
+    @cached_property
+    def num_unique_locations(self) -> int:
+        return len(self.unique_locations)
 
-        self.total_run_time: Time = Time.from_timedelta(sum(map(lambda result: result.time.timedelta, results), start=datetime.timedelta()))
-        self.average_run_time: Time = Time.from_timedelta(self.total_run_time.timedelta / max(len(results), 1))
-        # total_seconds: int = round(ans.total_seconds())
-        # mins, secs = divmod(total_seconds, 60)
-        # return f"{mins:02d}:{secs:02d}"
+    @cached_property
+    def tourism_percentage(self) -> float:
+        return self.num_unique_locations / max(len(self.results), 1)
 
-        self.unique_locations: set[Event] = set(map(lambda result: result.location, results))
-        self.num_unique_locations: int = len(self.unique_locations)
+    @cached_property
+    def year_counter(self) -> Counter:
+        """
+        Counter of the number of results in each year. The dates are counted
+        first so each distinct date is only converted to a year once.
+        """
 
-        self.tourism_percentage: float = self.num_unique_locations / max(len(results), 1)
+        year_counter: Counter = Counter()
+        for ordinal, count in Counter(self.results.dates).items():
+            year_counter[datetime.date.fromordinal(ordinal).year] += count
+        return year_counter
 
-        self.year_counter: Counter = Counter(result.date.year for result in results)
-        most_common_year: tuple[list[int], int] = most_common(self.year_counter)
-        self.most_runs_per_year_years: list[int] = most_common_year[0]
-        self.most_runs_per_year_count: int = most_common_year[1]
+    @cached_property
+    def most_runs_per_year_years(self) -> list[int]:
+        return most_common(self.year_counter)[0]
 
-        self.locations_counter: Counter = Counter(result.location for result in results)
-        most_common_location: tuple[list[Event], int] = most_common(self.locations_counter)
-        self.most_runs_per_location_locations: list[Event] = most_common_location[0]
-        self.most_runs_per_location_count: int = most_common_location[1]
+    @cached_property
+    def most_runs_per_year_count(self) -> int:
+        return most_common(self.year_counter)[1]
+
+    @cached_property
+    def locations_counter(self) -> Counter:
+        """
+        Counter of the number of results at each location. The location
+        indexes are counted first so each location is only hashed once.
+        """
+
+        locations_counter: Counter = Counter()
+        for event_index, count in Counter(self.results.event_indexes).items():
+            locations_counter[self.results.events[event_index]] += count
+        return locations_counter
+
+    @cached_property
+    def most_runs_per_location_locations(self) -> list[Event]:
+        return most_common(self.locations_counter)[0]
+
+    @cached_property
+    def most_runs_per_location_count(self) -> int:
+        return most_common(self.locations_counter)[1]
 
     @cached_property
     def countries_visited(self) -> set[Country]:
         """
         A set of Country objects visited
         """
-        return {result.location.country for result in self.results if result.location.country.id_ != 0}
+        return {location.country for location in self.unique_locations if location.country.id_ != 0}
 
     @cached_property
     def consistency(self) -> float:
@@ -100,17 +186,18 @@ class Runner:
         but these do not make sense when the streak is 0.
         """
 
-        target_parkrun_date: datetime.date = most_recent_parkrun().date()
-        end: datetime.date = target_parkrun_date
+        calendar: ParkrunCalendar = get_parkrun_calendar()
+        end: datetime.date = most_recent_parkrun().date()
+        target_index: int | None = calendar.index_of(end.toordinal())
         _streak: int = 0
         index: int = 0
 
-        while len(self.results) > index and self.results[index].date == target_parkrun_date:
-            target_parkrun_date = parkrun_before(target_parkrun_date)
+        while len(self.results) > index and calendar.index_of(self.results.dates[index]) == target_index:
+            target_index -= 1
             _streak += 1
             index += 1
 
-        start: datetime.date = self.results[index - 1].date if 0 <= index - 1 < len(self.results) else end
+        start: datetime.date = self.results.date(index - 1) if 0 <= index - 1 < len(self.results) else end
 
         return _streak, start, end
 
@@ -130,21 +217,24 @@ class Runner:
             return longest_streak, stretches
 
         # Go through parkruns from most recent to oldest and initialise the
-        # first streak as the most recent parkrun they did
+        # first streak as the most recent parkrun they did. Compare indexes in
+        # the parkrun calendar rather than dates
+        calendar: ParkrunCalendar = get_parkrun_calendar()
+        dates: array = self.results.dates
         current_streak: int = 1
-        target_parkrun_date: datetime.date = parkrun_before(self.results[0].date)
-        current_end: datetime.date = self.results[0].date
+        target_index: int = calendar.index_before(dates[0])
+        current_end: datetime.date = self.results.date(0)
 
-        for index, result in enumerate(self.results[1:], 1):
+        for index in range(1, len(dates)):
 
-            if result.date == target_parkrun_date:
+            if calendar.index_of(dates[index]) == target_index:
                 current_streak += 1
-                target_parkrun_date = parkrun_before(target_parkrun_date)
+                target_index -= 1
             else:
 
                 # Save the streak starting at the previous parkrun that the
                 # runner ran
-                start: datetime.date = self.results[index - 1].date
+                start: datetime.date = self.results.date(index - 1)
                 if current_streak > longest_streak:
                     longest_streak = current_streak
                     stretches = [(start, current_end)]
@@ -152,11 +242,11 @@ class Runner:
                     stretches.append((start, current_end))
 
                 current_streak = 1
-                target_parkrun_date = parkrun_before(result.date)
-                current_end = result.date
+                target_index = calendar.index_before(dates[index])
+                current_end = self.results.date(index)
 
         # Save the streak starting at the last parkrun that the runner ran
-        start: datetime.date = self.results[-1].date
+        start: datetime.date = self.results.date(-1)
         if current_streak > longest_streak:
             longest_streak = current_streak
             stretches = [(start, current_end)]
@@ -183,14 +273,14 @@ class Runner:
             return 0, today, today
 
         _streak: int = 0
-        end: datetime.date = self.results[0].date
+        end: datetime.date = self.results.date(0)
         for index in range(len(self.results)):
-            if self.locations_counter[self.results[index].location] != 1:
-                start: datetime.date = self.results[index - 1].date if index > 0 else end
+            if self.locations_counter[self.results.location(index)] != 1:
+                start: datetime.date = self.results.date(index - 1) if index > 0 else end
                 break
             _streak += 1
         else:
-            start: datetime.date = self.results[-1].date
+            start: datetime.date = self.results.date(-1)
         return _streak, start, end
 
     @cached_property
@@ -213,19 +303,20 @@ class Runner:
             return 0, today, today
 
         locations: set[str] = set()
-        end: datetime.date = self.results[0].date
+        end: datetime.date = self.results.date(0)
 
-        for index, result in enumerate(self.results):
-            if result.location.name in locations:
+        for index in range(len(self.results)):
+            location: Event = self.results.location(index)
+            if location.name in locations:
 
                 # This is never out of range because the first element is never
                 # already in the set
-                start: datetime.date = self.results[index - 1].date
+                start: datetime.date = self.results.date(index - 1)
                 break
             else:
-                locations.add(result.location.name)
+                locations.add(location.name)
         else:
-            start: datetime.date = self.results[-1].date
+            start: datetime.date = self.results.date(-1)
 
         return len(locations), start, end
 
@@ -244,17 +335,17 @@ class Runner:
         longest_streak: int = 0
         stretches: list[tuple[datetime.date, datetime.date]] = []
 
-        locations_done_so_far: set[int] = set()
+        locations_done_so_far: set[Event] = set()
         start: datetime.date | None = None
         current_streak: int = 0
 
         # Go through in reverse order (chronological order)
         for index in range(len(self.results) - 1, -1, -1):
-            result = self.results[index]
+            location: Event = self.results.location(index)
 
-            if result.location.id_ in locations_done_so_far:
+            if location in locations_done_so_far:
                 if start is not None:
-                    end: datetime.date = self.results[index + 1].date
+                    end: datetime.date = self.results.date(index + 1)
                     if current_streak > longest_streak:
                         longest_streak = current_streak
                         stretches = [(start, end)]
@@ -263,15 +354,15 @@ class Runner:
                     start = None
 
             elif start is None:
-                start = result.date
+                start = self.results.date(index)
                 current_streak = 1
             else:
                 current_streak += 1
 
-            locations_done_so_far.add(result.location.id_)
+            locations_done_so_far.add(location)
 
         if start is not None:
-            end: datetime.date = self.results[0].date
+            end: datetime.date = self.results.date(0)
             if current_streak > longest_streak:
                 longest_streak = current_streak
                 stretches = [(start, end)]
@@ -299,17 +390,18 @@ class Runner:
         if len(self.results) == 0:
             return longest_streak, stretches
 
-        current_locations: set[int] = set()
+        current_locations: set[Event] = set()
         streak_end_index: int = 0
 
-        for index, result in enumerate(self.results):
+        for index in range(len(self.results)):
+            location: Event = self.results.location(index)
 
-            if result.location.id_ in current_locations:
+            if location in current_locations:
 
                 # Save the streak starting at the previous parkrun that the
                 # runner ran
-                start: datetime.date = self.results[index - 1].date
-                end: datetime.date = self.results[streak_end_index].date
+                start: datetime.date = self.results.date(index - 1)
+                end: datetime.date = self.results.date(streak_end_index)
                 if len(current_locations) > longest_streak:
                     longest_streak = len(current_locations)
                     stretches = [(start, end)]
@@ -318,15 +410,15 @@ class Runner:
 
                 # Move the end of the streak backwards in time until it doesn't
                 # contain the current location
-                while result.location.id_ in current_locations:
-                    current_locations.remove(self.results[streak_end_index].location.id_)
+                while location in current_locations:
+                    current_locations.remove(self.results.location(streak_end_index))
                     streak_end_index += 1
 
-            current_locations.add(result.location.id_)
+            current_locations.add(location)
 
         # Save the streak starting at the last parkrun that the runner ran
-        start: datetime.date = self.results[-1].date
-        end: datetime.date = self.results[streak_end_index].date
+        start: datetime.date = self.results.date(-1)
+        end: datetime.date = self.results.date(streak_end_index)
         if len(current_locations) > longest_streak:
             longest_streak = len(current_locations)
             stretches = [(start, end)]
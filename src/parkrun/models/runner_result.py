@@ -8,6 +8,8 @@ from parkrun.models.time import Time
 from parkrun.models.pb import PB
 
 class RunnerResult:
+    __slots__ = ("location", "date", "run_number", "position", "time", "age_grade", "pb")
+
     def __init__(
         self,
         location: Event,
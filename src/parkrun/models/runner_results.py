@@ -0,0 +1,220 @@
+from __future__ import annotations
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterator, Sequence
+import datetime
+import operator
+from parkrun.models.age_grade import AgeGrade
+from parkrun.models.event import Event
+from parkrun.models.event_collection import EventCollection
+from parkrun.models.pb import PB
+from parkrun.models.position import Position
+from parkrun.models.runner_result import RunnerResult
+from parkrun.models.time import Time
+
+# Rough number of bytes used by a RunnerResult and the objects it references
+RESULT_SIZE: int = 600
+
+class RunnerResults(Sequence):
+    """
+    All of a runner's results, most recent first, stored as a column per field
+    rather than an object per result so it is compact and quick to calculate
+    stats over. Indexing or iterating creates RunnerResult objects, but only
+    the first time each result is needed.
+
+    Results between two dates are a view sharing the same columns and
+    RunnerResult objects rather than a copy (see `filter_dates`), in which
+    case the columns are memoryviews of the original arrays.
+
+    Columns:
+    - `event_indexes`: Index into `events` of the location of each result.
+    - `dates`: Proleptic Gregorian ordinal of the date of each result.
+    - `run_numbers`: Run number of the location.
+    - `positions`: Finish position.
+    - `seconds`: Finish time in seconds.
+    - `age_grades`: Age grade between 0 and 1, or 0 if there isn't one.
+    - `pbs`: 1 if it is a PB, otherwise 0.
+    """
+
+    def __init__(
+        self,
+        events: list[Event],
+        event_indexes: array,
+        dates: array,
+        run_numbers: array,
+        positions: array,
+        seconds: array,
+        age_grades: array,
+        pbs: array,
+        results: list[RunnerResult | None] | None = None,
+        offset: int = 0,
+    ):
+        """
+        If given, `results` is a list of the RunnerResult objects already
+        created (or None) which may be shared with other RunnerResults, where
+        index 0 of this is at index `offset` of the list.
+        """
+
+        self.events: list[Event] = events
+        self.event_indexes: array | memoryview = event_indexes
+        self.dates: array | memoryview = dates
+        self.run_numbers: array | memoryview = run_numbers
+        self.positions: array | memoryview = positions
+        self.seconds: array | memoryview = seconds
+        self.age_grades: array | memoryview = age_grades
+        self.pbs: array | memoryview = pbs
+        self._results: list[RunnerResult | None] = [None] * len(dates) if results is None else results
+        self._offset: int = offset
+
+    @staticmethod
+    def from_results(results: list[RunnerResult]) -> RunnerResults:
+        """
+        Return a new RunnerResults with the given results.
+        """
+
+        # Discontinued events all have the same ID so also use the name
+        events: list[Event] = []
+        event_to_index: dict[tuple[int, str], int] = dict()
+        event_indexes: array = array("l")
+        for result in results:
+            key: tuple[int, str] = (result.location.id_, result.location.name)
+            if key not in event_to_index:
+                event_to_index[key] = len(events)
+                events.append(result.location)
+            event_indexes.append(event_to_index[key])
+
+        # Keep the existing objects rather than creating them again
+        return RunnerResults(
+            events,
+            event_indexes,
+            array("l", (result.date.toordinal() for result in results)),
+            array("l", (result.run_number for result in results)),
+            array("l", (result.position.value for result in results)),
+            array("l", (round(result.time.timedelta.total_seconds()) for result in results)),
+            array("d", (result.age_grade.value for result in results)),
+            array("b", (result.pb.is_pb for result in results)),
+            list(results),
+        )
+
+    @staticmethod
+    def from_table(table_rows: list[list[str]], all_events: EventCollection) -> RunnerResults:
+        """
+        Return a new RunnerResults from the rows of a table as described in
+        RunnerResult.from_table without creating a RunnerResult for each.
+        """
+
+        events: list[Event] = []
+        name_to_index: dict[str, int] = dict()
+        event_indexes: array = array("l")
+        dates: array = array("l")
+        run_numbers: array = array("l")
+        positions: array = array("l")
+        seconds: array = array("l")
+        age_grades: array = array("d")
+        pbs: array = array("b")
+
+        for row in table_rows:
+            if row[0] not in name_to_index:
+                name_to_index[row[0]] = len(events)
+                events.append(all_events.get_event_by_name(row[0]))
+            event_indexes.append(name_to_index[row[0]])
+
+            day, month, year = row[1].split("/")
+            dates.append(datetime.date(int(year), int(month), int(day)).toordinal())
+
+            run_numbers.append(int(row[2]))
+            positions.append(int(row[3]))
+
+            time_seconds: int = 0
+            for part in row[4].split(":"):
+                time_seconds = time_seconds * 60 + int(part)
+            seconds.append(time_seconds)
+
+            age_grades.append(AgeGrade(row[5]).value)
+            pbs.append(row[6] == "PB")
+
+        return RunnerResults(events, event_indexes, dates, run_numbers, positions, seconds, age_grades, pbs)
+
+    def slice(self, start: int, stop: int) -> RunnerResults:
+        """
+        Return a view of the results from index `start` up to but not including
+        `stop` without copying anything.
+        """
+
+        start, stop, _ = slice(start, stop).indices(len(self))
+        stop = max(start, stop)
+        return RunnerResults(
+            self.events,
+            memoryview(self.event_indexes)[start:stop],
+            memoryview(self.dates)[start:stop],
+            memoryview(self.run_numbers)[start:stop],
+            memoryview(self.positions)[start:stop],
+            memoryview(self.seconds)[start:stop],
+            memoryview(self.age_grades)[start:stop],
+            memoryview(self.pbs)[start:stop],
+            self._results,
+            self._offset + start,
+        )
+
+    def filter_dates(self, start_date: datetime.date, end_date: datetime.date) -> RunnerResults:
+        """
+        Return a view of just the results between the given dates (inclusive),
+        found by binary search since the results are most recent first.
+        """
+
+        # Negate the dates so they are in ascending order for bisect
+        start: int = bisect_left(self.dates, -end_date.toordinal(), key=operator.neg)
+        stop: int = bisect_right(self.dates, -start_date.toordinal(), key=operator.neg)
+        return self.slice(start, stop)
+
+    def estimated_size(self) -> int:
+        """
+        Return a rough estimate of the number of bytes used, including a
+        RunnerResult for every result since they are created when needed.
+        """
+
+        columns: tuple[array] = (self.event_indexes, self.dates, self.run_numbers, self.positions, self.seconds, self.age_grades, self.pbs)
+        return sum(column.itemsize * len(column) for column in columns) + len(self) * RESULT_SIZE
+
+    def location(self, index: int) -> Event:
+        return self.events[self.event_indexes[index]]
+
+    def date(self, index: int) -> datetime.date:
+        return datetime.date.fromordinal(self.dates[index])
+
+    def _create_result(self, index: int) -> RunnerResult:
+        age_grade: float = self.age_grades[index]
+        return RunnerResult(
+            self.location(index),
+            self.date(index),
+            self.run_numbers[index],
+            Position(str(self.positions[index])),
+            Time.from_timedelta(datetime.timedelta(seconds=self.seconds[index])),
+            AgeGrade(f"{age_grade * 100:.2f}%" if age_grade != 0 else ""),
+            PB(bool(self.pbs[index])),
+        )
+
+    def __getitem__(self, index: int | slice) -> RunnerResult | list[RunnerResult]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("RunnerResults index out of range")
+
+        result: RunnerResult | None = self._results[self._offset + index]
+        if result is None:
+            result = self._create_result(index)
+            self._results[self._offset + index] = result
+        return result
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __iter__(self) -> Iterator[RunnerResult]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def __repr__(self) -> str:
+        return f"RunnerResults(count={len(self)})"
@@ -8,6 +8,8 @@ class Time:
     string is formatted H:MM:SS or MM:SS or 'x day[s], H:MM:SS' (only if not
     from a single run, e.g. total run time).
     """
+    __slots__ = ("string", "timedelta")
+
     def __init__(self, string: str, timedelta: datetime.timedelta):
         self.string: str = string
         self.timedelta: datetime.timedelta = timedelta
@@ -7,7 +7,7 @@ import datetime
 from collections.abc import Callable
 from functools import cache
 from parkrun import get_table_max_width
-from parkrun.api.scraper_runner import fetch_runner_results
+from parkrun.api.scraper_runner import fetch_many_runner_results
 from parkrun.api.scraper import fetch_events
 from parkrun.api.utils import date_description
 from parkrun.models.runner import Runner
@@ -41,7 +41,7 @@ def achievement_location_matches(name: str, pattern: str | re.Pattern) -> tuple[
     if isinstance(pattern, str):
         pattern: re.Pattern = re.compile(pattern, flags=re.IGNORECASE)
 
-    ticklist = sorted(event.name for event in fetch_events().events_by_id.values() if event.is_adult() and pattern.search(event.name))
+    ticklist = sorted(event.name for event in fetch_events() if event.is_adult() and pattern.search(event.name))
 
     return name, lambda result: result.location.name, ticklist
 
@@ -199,7 +199,7 @@ def achievements(runner_ids: list[int], start_date: datetime.date, end_date: dat
     parkrunner.
     """
 
-    runners: list[Runner] = [fetch_runner_results(runner_id, start_date, end_date) for runner_id in runner_ids]
+    runners: list[Runner] = fetch_many_runner_results(runner_ids, start_date, end_date)
 
     print(f"Achievements {date_description(start_date, end_date)}")
 
@@ -4,13 +4,12 @@ parkrunners did together.
 """
 
 import datetime
+from parkrun.models.run_index import RunIndex, RunKey
 from parkrun.models.runner import Runner
 from parkrun import get_table_max_width
-from parkrun.api.scraper_runner import fetch_runner_results
+from parkrun.api.scraper_runner import fetch_many_runner_results
 from parkrun.api.utils import date_description
-from functools import reduce
 from texttable import Texttable
-from typing import Iterable
 
 def common_run_comparison(runner_ids: list[int], start_date: datetime.date, end_date: datetime.date) -> None:
     """
@@ -18,26 +17,18 @@ def common_run_comparison(runner_ids: list[int], start_date: datetime.date, end_
     parkrunners did together.
     """
 
-    def runner_to_set_events(runner: Runner) -> set[str]:
-        return {result.format_for_event() for result in runner.results}
-
-    runners: list[Runner] = [fetch_runner_results(runner_id, start_date, end_date) for runner_id in runner_ids]
-    runners_events: Iterable[set[str]] = map(runner_to_set_events, runners)
-    events_in_common: set[str] = reduce(lambda a, b: a.intersection(b), runners_events)
+    runners: list[Runner] = fetch_many_runner_results(runner_ids, start_date, end_date)
+    index = RunIndex(runners)
+    events_in_common: dict[RunKey, list[tuple[int, int]]] = index.common_to_all()
 
     print(f"{len(events_in_common)} events in common {date_description(start_date, end_date)}")
 
-    rows: dict[str, list[str]] = {event_in_common: [] for event_in_common in events_in_common}
-    identities: list[str] = []
-    for runner in runners:
-        identities.append(runner.format_identity())
-        for result in runner.results:
-            event: str = result.format_for_event()
-            if event in rows:
-                rows[event].append(result.format_for_result())
-
     table = Texttable(get_table_max_width())
-    table.header(["Parkrunner"] + identities)
-    for event in sorted(rows):
-        table.add_row([event] + rows[event])
+    table.header(["Parkrunner"] + [runner.format_identity() for runner in runners])
+    for key in sorted(events_in_common, key=index.sort_key):
+        entries: list[tuple[int, int]] = events_in_common[key]
+        table.add_row(
+            [index.result(*entries[0]).format_for_event()]
+            + [index.result(*entry).format_for_result() for entry in entries]
+        )
     print(table.draw())
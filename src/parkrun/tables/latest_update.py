@@ -7,7 +7,7 @@ import datetime
 from texttable import Texttable
 from parkrun.api.cache import most_recent_parkrun
 from parkrun import get_table_max_width
-from parkrun.api.scraper_runner import fetch_runner_results
+from parkrun.api.scraper_runner import fetch_many_runner_results
 from parkrun.models.position import get_ordinal_suffix
 from parkrun.models.runner import Runner
 from parkrun.models.runner_result import RunnerResult
@@ -29,7 +29,7 @@ def latest_update(runner_ids: list[int], start_date: datetime.date, end_date: da
     # Get the most recent parkrun that occurred before the end date
     most_recent_parkrun_date: datetime.date = most_recent_parkrun(datetime.datetime.combine(end_date, datetime.time(23, 59, 59))).date()
 
-    runners: list[Runner] = [fetch_runner_results(runner_id, start_date, end_date) for runner_id in runner_ids]
+    runners: list[Runner] = fetch_many_runner_results(runner_ids, start_date, end_date)
 
     print(f"Parkrunners who did the parkrun on {most_recent_parkrun_date}")
 
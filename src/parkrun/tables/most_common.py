@@ -9,7 +9,7 @@ from parkrun.models.country_collection import CountryCollection
 from parkrun.models.runner import Runner
 from parkrun.models.runner_result import RunnerResult
 from parkrun import get_table_max_width
-from parkrun.api.scraper_runner import fetch_runner_results
+from parkrun.api.scraper_runner import fetch_many_runner_results
 from parkrun.api.scraper import fetch_countries
 from collections.abc import Callable
 from collections import Counter
@@ -29,7 +29,7 @@ def most_common_things_runner(runner_ids: list[int], runner_to_counter: Callable
     this: most_common_things_runner(runner_ids, lambda runner: runner.locations_counter)
     """
 
-    runners: list[Runner] = [fetch_runner_results(runner_id, start_date, end_date) for runner_id in runner_ids]
+    runners: list[Runner] = fetch_many_runner_results(runner_ids, start_date, end_date)
     counters: list[Counter] = list(map(runner_to_counter, runners))
     most_common_things: list[list[tuple[Any, int]]] = [counter.most_common() for counter in counters]
 
@@ -0,0 +1,60 @@
+"""
+Print tables of how many parkruns each pair of given parkrunners did together,
+which works for large groups such as a whole club, unlike
+common_run_comparison which only shows parkruns all of them did.
+"""
+
+import datetime
+from parkrun import get_table_max_width
+from parkrun.api.scraper_runner import fetch_many_runner_results
+from parkrun.api.utils import date_description
+from parkrun.models.run_index import RunIndex
+from parkrun.models.runner import Runner
+from texttable import Texttable
+
+# The number of co-runners to show for each parkrunner in top_co_runners
+NUM_TOP_CO_RUNNERS: int = 5
+
+def overlap_matrix(runner_ids: list[int], start_date: datetime.date, end_date: datetime.date) -> None:
+    """
+    Print a table with a row and column for each given parkrunner where each
+    cell is the number of parkruns the two did together. The diagonal is the
+    number of parkruns each did. Columns are labelled by the number of the
+    parkrunner's row to keep the table narrow.
+    """
+
+    runners: list[Runner] = fetch_many_runner_results(runner_ids, start_date, end_date)
+    matrix: list[list[int]] = RunIndex(runners).overlap_matrix()
+
+    print(f"Parkruns done together {date_description(start_date, end_date)}")
+
+    table = Texttable(get_table_max_width())
+    table.header(["Parkrunner"] + [str(index + 1) for index in range(len(runners))])
+    for index, (runner, row) in enumerate(zip(runners, matrix)):
+        table.add_row([f"{index + 1}. {runner.format_identity()}"] + row)
+    print(table.draw())
+
+def top_co_runners(runner_ids: list[int], start_date: datetime.date, end_date: datetime.date) -> None:
+    """
+    Print a table with the NUM_TOP_CO_RUNNERS other given parkrunners that each
+    given parkrunner did the most parkruns with and how many.
+    """
+
+    runners: list[Runner] = fetch_many_runner_results(runner_ids, start_date, end_date)
+    matrix: list[list[int]] = RunIndex(runners).overlap_matrix()
+
+    print(f"Top {NUM_TOP_CO_RUNNERS} co-runners {date_description(start_date, end_date)}")
+
+    table = Texttable(get_table_max_width())
+    table.header(["Parkrunner", "Parkruns", "Top Co-Runners"])
+    for runner_index, (runner, row) in enumerate(zip(runners, matrix)):
+
+        # Most parkruns together first, then in the order given
+        others: list[int] = [other_index for other_index, count in enumerate(row) if count > 0 and other_index != runner_index]
+        top: list[int] = sorted(others, key=lambda other_index: -row[other_index])[:NUM_TOP_CO_RUNNERS]
+        table.add_row([
+            runner.format_identity(),
+            row[runner_index],
+            "\n".join(f"{runners[other_index].format_identity()}: {row[other_index]}" for other_index in top),
+        ])
+    print(table.draw())
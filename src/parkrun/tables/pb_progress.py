@@ -6,7 +6,7 @@ side-by-side.
 from parkrun.models.runner import Runner
 from parkrun.models.time import Time
 from parkrun import get_table_max_width
-from parkrun.api.scraper_runner import fetch_runner_results
+from parkrun.api.scraper_runner import fetch_many_runner_results
 from parkrun.api.utils import date_description
 from texttable import Texttable
 import datetime
@@ -26,7 +26,7 @@ def pb_progress(runner_ids: list[int], start_date: datetime.date, end_date: date
     today: datetime.date = datetime.date.today()
     num_runners: int = len(runner_ids)
 
-    runners: list[Runner] = [fetch_runner_results(runner_id, start_date, end_date) for runner_id in runner_ids]
+    runners: list[Runner] = fetch_many_runner_results(runner_ids, start_date, end_date)
 
     # Populate a dictionary with a key for each date that any parkrunner
     # improved their PB. The corresponding value is a list with an element for
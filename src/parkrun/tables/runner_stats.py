@@ -7,7 +7,7 @@ from parkrun.models.runner import Runner
 from parkrun.models.runner_result import RunnerResult
 from typing import Any
 from parkrun import get_table_max_width
-from parkrun.api.scraper_runner import fetch_runner_results
+from parkrun.api.scraper_runner import fetch_many_runner_results
 from parkrun.api.utils import date_description
 from collections.abc import Callable
 from texttable import Texttable
@@ -65,7 +65,7 @@ def runner_stats(runner_ids: list[int], start_date: datetime.date, end_date: dat
     Print a table with statistics about each given parkrunner side-by-side.
     """
 
-    runners: list[Runner] = [fetch_runner_results(runner_id, start_date, end_date) for runner_id in runner_ids]
+    runners: list[Runner] = fetch_many_runner_results(runner_ids, start_date, end_date)
 
     print(f"Runner stats {date_description(start_date, end_date)}")
 
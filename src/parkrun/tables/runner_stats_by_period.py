@@ -0,0 +1,97 @@
+"""
+Print a table for each given parkrunner with the same statistics as
+runner_stats for each year (or other period) side-by-side.
+"""
+
+from bisect import bisect_right
+import calendar
+import datetime
+import operator
+from collections.abc import Callable
+from parkrun import get_table_max_width
+from parkrun.api.scraper_runner import fetch_many_runner_results
+from parkrun.api.utils import date_description
+from parkrun.models.runner import Runner
+from parkrun.tables.runner_stats import STATS
+from texttable import Texttable
+
+def year_period(date: datetime.date) -> tuple[str, datetime.date, datetime.date]:
+    return str(date.year), datetime.date(date.year, 1, 1), datetime.date(date.year, 12, 31)
+
+def quarter_period(date: datetime.date) -> tuple[str, datetime.date, datetime.date]:
+    first_month: int = (date.month - 1) // 3 * 3 + 1
+    last_month: int = first_month + 2
+    return (
+        f"{date.year} Q{first_month // 3 + 1}",
+        datetime.date(date.year, first_month, 1),
+        datetime.date(date.year, last_month, calendar.monthrange(date.year, last_month)[1]),
+    )
+
+def month_period(date: datetime.date) -> tuple[str, datetime.date, datetime.date]:
+    return date.strftime("%Y-%m"), date.replace(day=1), date.replace(day=calendar.monthrange(date.year, date.month)[1])
+
+# For each period, a function from a date to the name of the period it is in
+# and the first and last dates of that period
+PERIODS: dict[str, Callable[[datetime.date], tuple[str, datetime.date, datetime.date]]] = {
+    "year": year_period,
+    "quarter": quarter_period,
+    "month": month_period,
+}
+
+def split_into_periods(runner: Runner, period: str = "year") -> list[tuple[str, Runner]]:
+    """
+    Return the name of each period the runner has results in, oldest first,
+    with a Runner with just the results in that period. Each period is found
+    by binary search and each Runner is a view of the original results, so
+    nothing is copied and each stat is calculated over each result once in
+    total. The stats aren't accumulated for every period in one pass since
+    that duplicated Runner's calculations. Runner's properties are quick over
+    views since they use builtins over the columns, so for 1500 results this
+    is as quick as accumulating by year and about 15% slower by month, where
+    each period has few results.
+    """
+
+    get_period: Callable[[datetime.date], tuple[str, datetime.date, datetime.date]] = PERIODS[period]
+    results = runner.results
+    periods: list[tuple[str, Runner]] = []
+    index: int = 0
+    while index < len(results):
+        name, first, last = get_period(results.date(index))
+
+        # Results are most recent first so the period continues until a result
+        # before its first date. Negate the dates so they are in ascending
+        # order for bisect.
+        stop: int = bisect_right(results.dates, -first.toordinal(), index + 1, key=operator.neg)
+
+        periods.append((name, Runner(
+            runner.number,
+            runner.name,
+            runner.most_recent_age_category,
+            results.slice(index, stop),
+            max(first, runner.start_date),
+            min(last, runner.end_date),
+        )))
+        index = stop
+
+    periods.reverse()
+    return periods
+
+def runner_stats_by_period(runner_ids: list[int], start_date: datetime.date, end_date: datetime.date, period: str = "year") -> None:
+    """
+    Print a table for each given parkrunner with the same statistics as
+    runner_stats for each period they ran in side-by-side, where `period` is
+    one of those in PERIODS.
+    """
+
+    runners: list[Runner] = fetch_many_runner_results(runner_ids, start_date, end_date)
+
+    print(f"Runner stats by {period} {date_description(start_date, end_date)}")
+
+    for runner in runners:
+        periods: list[tuple[str, Runner]] = split_into_periods(runner, period)
+
+        table = Texttable(get_table_max_width())
+        table.header([runner.format_identity()] + [name for name, _ in periods])
+        for stat_name, stat_func in STATS:
+            table.add_row([stat_name] + [stat_func(period_runner) for _, period_runner in periods])
+        print(table.draw())
@@ -1,18 +1,67 @@
-from parameterized import parameterized
+from parameterized import param, parameterized
 import unittest
 import datetime
 from parkrun.models.age_category import AgeCategory
 from parkrun.models.runner import Runner
 from parkrun.models.runner_result import RunnerResult
+from parkrun.models.runner_results import RunnerResults
+from parkrun.models.run_index import RunIndex
+from parkrun.models.event_collection import EventCollection
+from parkrun.models.event_index import EventIndex
 from parkrun.models.event import Event
+from parkrun.models.country import Country
 from parkrun.models.position import Position
 from parkrun.models.time import Time
 from parkrun.models.age_grade import AgeGrade
 from parkrun.models.pb import PB
-from parkrun.api.cache import most_recent_parkrun, HR_RESULT_START, HR_RESULT_END
+from parkrun.api.cache import most_recent_parkrun, parkrun_before, HR_RESULT_START, HR_RESULT_END
+from parkrun.api.parkrun_calendar import FIRST_PARKRUN, get_parkrun_calendar
+from parkrun.api.rate_limiter import RateLimiter, TokenBucket
+from parkrun.api.parser import extract_event_result_fragment, extract_runner_recent_fragment, extract_runner_results_fragment, is_outdated_fragment, parse_event_result_page, parse_runner_recent_page, parse_runner_results_page, _parse_runner_results_page_fast, _parse_runner_results_page_bs4, _parse_event_result_page_fast, _parse_event_result_page_bs4
 from parkrun.graphs.activity import _get_num_months
+from parkrun.tables.runner_stats import STATS
+from parkrun.tables.runner_stats_by_period import split_into_periods
+from parkrun.api.utils import minimal_indexes, maximal_indexes
+from collections import Counter
+from collections.abc import Callable
 from parkrun import _my_strtobool
+import parkrun
+import parkrun.api.cache
+import parkrun.api.cache_sqlite
+import parkrun.api.scraper_runner
+import parkrun.api.rate_limiter
+import parkrun.api.memory_cache
+import parkrun.api.crawler
+import parkrun.api.daemon
+import parkrun.api.prewarm
+import parkrun.tables.overlap
+import parkrun.tables.runner_stats_by_period
+from parkrun.api.parkrun_exception import ParkrunException, ParkrunNotFoundException
+from parkrun.api.scraper import fetch
+from parkrun.api.transport import FixtureAdapter, FixturePage, use_adapter
+import requests
+import benchmarks
 import os
+import subprocess
+import sys
+from pathlib import Path
+import tempfile
+import io
+import importlib.util
+import json
+import pickle
+import socket
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from unittest import mock
+
+FIXTURES_DIR: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def read_fixture(file_name: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, file_name), encoding="utf-8") as f:
+        return f.read()
 
 DUMMY_EVENT: Event = Event(0, "Name", "name", 0.0, 0.0, 0, 0)
 DUMMY_POSITION: Position = Position("1")
@@ -60,6 +109,110 @@ class TestStreaks(unittest.TestCase):
         runner = Runner(1, "Name", AgeCategory("SM20-24"), [RunnerResult(Event(loc_id, "Name", "name", 0.0, 0.0, 0, 0), date, 0, DUMMY_POSITION, DUMMY_TIME, DUMMY_AGE_GRADE, DUMMY_PB) for loc_id, date in results], datetime.date.min, datetime.date.max)
         self.assertEqual(runner.floating_tourist_streak, expected)
 
+    def test_floating_tourist_streaks_discontinued(self):
+        # Discontinued events all have ID 0 but are different locations
+        old = Event(0, "Old (discontinued)", "Old", 0.0, 0.0, 0, 0)
+        older = Event(0, "Older (discontinued)", "Older", 0.0, 0.0, 0, 0)
+        dates = [datetime.date(2026, 4, 11), datetime.date(2026, 4, 4)]
+        runner = Runner(1, "Name", AgeCategory("SM20-24"), [RunnerResult(event, date, 0, DUMMY_POSITION, DUMMY_TIME, DUMMY_AGE_GRADE, DUMMY_PB) for event, date in zip([old, older], dates)], datetime.date.min, datetime.date.max)
+        self.assertEqual(runner.floating_tourist_streak, (2, [(dates[1], dates[0])]))
+        self.assertEqual(runner.floating_tourist_streak2, (2, [(dates[1], dates[0])]))
+
+class TestRunnerStats(unittest.TestCase):
+
+    @parameterized.expand([
+        ([], [], []),
+        ([3], [0], [0]),
+        ([3, 1, 2, 1], [1, 3], [0]),
+        ([2.5, 2.5, 0.0], [2], [0, 1]),
+    ])
+    def test_minimal_maximal_indexes(self, values: list, expected_min: list[int], expected_max: list[int]):
+        self.assertEqual(minimal_indexes(values), expected_min)
+        self.assertEqual(maximal_indexes(values), expected_max)
+
+    def test_matches_results(self):
+        a = Event(1, "A", "a", 0.0, 0.0, 0, 0)
+        b = Event(2, "B", "b", 0.0, 0.0, 0, 0)
+        results = [
+            RunnerResult(a, datetime.date(2026, 1, 3), 3, Position("5"), Time.from_string("21:00"), AgeGrade("60.00%"), PB(False)),
+            RunnerResult(b, datetime.date(2025, 12, 27), 8, Position("2"), Time.from_string("20:00"), AgeGrade("62.00%"), PB(True)),
+            RunnerResult(a, datetime.date(2025, 12, 20), 2, Position("2"), Time.from_string("20:00"), AgeGrade("62.00%"), PB(False)),
+            RunnerResult(a, datetime.date(2025, 12, 13), 1, Position("9"), Time.from_string("23:30"), AgeGrade(""), PB(True)),
+        ]
+        runner = Runner(1, "Name", AgeCategory("SM20-24"), results, datetime.date.min, datetime.date.max)
+        self.assertEqual(runner.best_times, results[1:3])
+        self.assertEqual(runner.best_positions, results[1:3])
+        self.assertEqual(runner.best_age_grades, results[1:3])
+        self.assertEqual(runner.first_result, results[-1])
+        self.assertEqual(runner.latest_result, results[0])
+        self.assertEqual(str(runner.total_run_time), "1:24:30")
+        self.assertEqual(str(runner.average_run_time), "21:07")
+        self.assertEqual(runner.unique_locations, {a, b})
+        self.assertEqual(runner.tourism_percentage, 0.5)
+        self.assertEqual(runner.year_counter, Counter({2025: 3, 2026: 1}))
+        self.assertEqual((runner.most_runs_per_year_years, runner.most_runs_per_year_count), ([2025], 3))
+        self.assertEqual(runner.locations_counter, Counter({a: 3, b: 1}))
+        self.assertEqual((runner.most_runs_per_location_locations, runner.most_runs_per_location_count), ([a], 3))
+
+    def test_no_results(self):
+        runner = Runner(1, "Name", AgeCategory("SM20-24"), [], datetime.date.min, datetime.date.max)
+        self.assertEqual(runner.best_times, [])
+        self.assertIsNone(runner.latest_result)
+        self.assertEqual(str(runner.average_run_time), "00:00")
+        self.assertEqual((runner.most_runs_per_year_years, runner.most_runs_per_year_count), ([], 0))
+
+class TestRunnerStatsByPeriod(unittest.TestCase):
+
+    @parameterized.expand([
+        ("year", ["2025", "2026"]),
+        ("quarter", ["2025 Q3", "2025 Q4", "2026 Q1"]),
+        ("month", ["2025-09", "2025-12", "2026-01"]),
+    ])
+    def test_matches_runner_slice(self, period: str, expected_names: list[str]):
+        a = Event(1, "A", "a", 0.0, 0.0, Country(97, "www.parkrun.org.uk", []), 1)
+        b = Event(2, "B", "b", 0.0, 0.0, Country(32, "www.parkrun.com.au", []), 1)
+        results = [
+            RunnerResult(a, datetime.date(2026, 1, 3), 3, Position("5"), Time.from_string("21:00"), AgeGrade("60.00%"), PB(False)),
+            RunnerResult(b, datetime.date(2025, 12, 27), 8, Position("2"), Time.from_string("20:00"), AgeGrade("62.00%"), PB(True)),
+            RunnerResult(a, datetime.date(2025, 12, 20), 2, Position("2"), Time.from_string("20:00"), AgeGrade("62.00%"), PB(False)),
+            RunnerResult(a, datetime.date(2025, 9, 13), 1, Position("9"), Time.from_string("23:30"), AgeGrade(""), PB(True)),
+        ]
+        runner = Runner(1, "Name", AgeCategory("SM20-24"), results, datetime.date.min, datetime.date.max)
+        periods = split_into_periods(runner, period)
+        self.assertEqual([name for name, _ in periods], expected_names)
+        for _, period_runner in periods:
+            sliced = runner.slice(period_runner.start_date, period_runner.end_date)
+            self.assertEqual([str(stat_func(period_runner)) for _, stat_func in STATS], [str(stat_func(sliced)) for _, stat_func in STATS])
+
+    def test_no_results(self):
+        runner = Runner(1, "Name", AgeCategory("SM20-24"), [], datetime.date.min, datetime.date.max)
+        self.assertEqual(split_into_periods(runner), [])
+
+    @parameterized.expand([(100,), (400,)])
+    def test_linear_in_results(self, num_results: int):
+        dates: list[datetime.date] = [datetime.date(2026, 4, 11) - datetime.timedelta(weeks=week) for week in range(num_results)]
+        event = Event(1, "A", "a", 0.0, 0.0, Country(97, "www.parkrun.org.uk", []), 1)
+        runner = Runner(1, "Name", AgeCategory("SM20-24"), [RunnerResult(event, date, 0, DUMMY_POSITION, DUMMY_TIME, DUMMY_AGE_GRADE, DUMMY_PB) for date in dates], datetime.date.min, datetime.date.max)
+        runner.results._results = [None] * num_results
+        month_period = mock.Mock(wraps=parkrun.tables.runner_stats_by_period.PERIODS["month"])
+        with mock.patch.dict(parkrun.tables.runner_stats_by_period.PERIODS, {"month": month_period}):
+            periods = split_into_periods(runner, "month")
+        self.assertEqual(month_period.call_count, len(periods))
+
+        # Each period is a view of the next results, oldest first, so together
+        # they have each result exactly once
+        views: list[RunnerResults] = [period_runner.results for _, period_runner in reversed(periods)]
+        self.assertEqual([view._offset for view in views], [sum(map(len, views[:index])) for index in range(len(views))])
+        self.assertEqual(sum(map(len, views)), num_results)
+
+        # Calculating every stat of every period creates each result at most
+        # once since the views share them
+        with mock.patch.object(RunnerResults, "_create_result", autospec=True, side_effect=RunnerResults._create_result) as create_result:
+            for _, period_runner in periods:
+                for _, stat_func in STATS:
+                    stat_func(period_runner)
+        self.assertLessEqual(create_result.call_count, num_results)
+
 class TestMostRecentParkrun(unittest.TestCase):
 
     def test_today_is_saturday_before_start(self):
@@ -212,6 +365,36 @@ class TestMostRecentParkrun(unittest.TestCase):
         expected = datetime.datetime(2026, 1, 3, HR_RESULT_END)
         self.assertEqual(result, expected)
 
+class TestParkrunCalendar(unittest.TestCase):
+
+    def test_parkrun_before_parity(self):
+        calendar = get_parkrun_calendar()
+        date: datetime.date = FIRST_PARKRUN + datetime.timedelta(days=1)
+        while date < datetime.date(2040, 1, 1):
+            self.assertEqual(calendar.parkrun_before(date), parkrun_before(date), date)
+            date += datetime.timedelta(days=1)
+
+    @parameterized.expand([
+        (datetime.date(2025, 12, 25), 0),
+        (datetime.date(2025, 12, 26), None),
+        (datetime.date(2026, 1, 1), 2),
+        (datetime.date(2026, 1, 3), 3),
+    ])
+    def test_index_of(self, date: datetime.date, offset: int | None):
+        calendar = get_parkrun_calendar()
+        christmas_index: int = calendar.index_of(datetime.date(2025, 12, 25).toordinal())
+        expected: int | None = None if offset is None else christmas_index + offset
+        self.assertEqual(calendar.index_of(date.toordinal()), expected)
+
+    @parameterized.expand([
+        (datetime.date(2025, 12, 1), datetime.date(2025, 12, 31), 5),
+        (datetime.date(2025, 12, 20), datetime.date(2026, 1, 3), 5),
+        (datetime.date(2025, 12, 21), datetime.date(2025, 12, 24), 0),
+        (datetime.date(2025, 12, 31), datetime.date(2025, 12, 1), 0),
+    ])
+    def test_count_between(self, start: datetime.date, end: datetime.date, expected: int):
+        self.assertEqual(get_parkrun_calendar().count_between(start, end), expected)
+
 class TestActivityGraph(unittest.TestCase):
     @parameterized.expand([
         (2025, 12, 2025, 12, 1),
@@ -274,5 +457,1028 @@ class TestMyStrToBool(unittest.TestCase):
 
         self.assertEqual(_my_strtobool(TestMyStrToBool.ENV_VAR_NAME, default), expected)
 
+class FakeClock:
+    """
+    A clock for rate limiting tests that only moves when slept on.
+    """
+
+    def __init__(self):
+        self.now: float = 0.0
+        self.slept: list[float] = []
+
+    def clock(self) -> float:
+        return self.now
+
+    def sleep(self, secs: float) -> None:
+        self.slept.append(secs)
+        self.now += secs
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_first_query_not_limited(self):
+        clock = FakeClock()
+        bucket = TokenBucket(0.5, 1, clock.clock, clock.sleep)
+        bucket.acquire()
+        self.assertEqual(clock.slept, [])
+
+    def test_second_query_waits(self):
+        clock = FakeClock()
+        bucket = TokenBucket(0.5, 1, clock.clock, clock.sleep)
+        bucket.acquire()
+        bucket.acquire()
+        self.assertEqual(clock.slept, [2.0])
+
+    def test_burst(self):
+        clock = FakeClock()
+        bucket = TokenBucket(0.5, 3, clock.clock, clock.sleep)
+        for _ in range(4):
+            bucket.acquire()
+        self.assertEqual(clock.slept, [2.0])
+
+    def test_refills_over_time(self):
+        clock = FakeClock()
+        bucket = TokenBucket(0.5, 1, clock.clock, clock.sleep)
+        bucket.acquire()
+        clock.now += 1.5
+        bucket.acquire()
+        self.assertEqual(clock.slept, [0.5])
+
+    def test_reservations_queue(self):
+        clock = FakeClock()
+        bucket = TokenBucket(0.5, 1, clock.clock, clock.sleep)
+        self.assertEqual([bucket.reserve() for _ in range(3)], [0.0, 2.0, 4.0])
+
+    def run_async(self, *acquires) -> list[float]:
+        """
+        Run the given coroutines at the same time and return how long each
+        waited for, without actually waiting.
+        """
+
+        slept: list[float] = []
+        real_sleep = asyncio.sleep
+
+        async def sleep(secs: float) -> None:
+            slept.append(secs)
+            await real_sleep(0)
+
+        async def run() -> None:
+            await asyncio.gather(*acquires)
+
+        with mock.patch("asyncio.sleep", sleep):
+            asyncio.run(run())
+        return slept
+
+    def test_acquire_async_refills(self):
+        clock = FakeClock()
+        bucket = TokenBucket(0.5, 1, clock.clock, clock.sleep)
+        self.assertEqual(self.run_async(bucket.acquire_async()), [])
+        clock.now += 1.5
+        self.assertEqual(self.run_async(bucket.acquire_async()), [0.5])
+        self.assertEqual(clock.slept, [])
+
+    def test_acquire_async_reservations_queue(self):
+        clock = FakeClock()
+        limiter = RateLimiter(2, 2, clock.clock, clock.sleep)
+        url: str = "https://www.parkrun.org.uk/parkrunner/1/all/"
+
+        # Each waiting caller reserves a token before sleeping so they wait
+        # one after another rather than all for the same token
+        slept: list[float] = self.run_async(*(limiter.acquire_async(url) for _ in range(5)), limiter.acquire_async("https://images.parkrun.com/events.json"))
+        self.assertEqual(slept, [2.0, 4.0, 6.0])
+        self.assertEqual(limiter.get_bucket(url).reserve(), 8.0)
+
+    def test_no_limit(self):
+        clock = FakeClock()
+        limiter = RateLimiter(0, 1, clock.clock, clock.sleep)
+        for _ in range(3):
+            limiter.acquire("https://www.parkrun.org.uk/")
+        self.assertEqual(clock.slept, [])
+
+    def test_hosts_independent(self):
+        clock = FakeClock()
+        limiter = RateLimiter(2, 1, clock.clock, clock.sleep)
+        limiter.acquire("https://www.parkrun.org.uk/parkrunner/1/all/")
+        limiter.acquire("https://images.parkrun.com/events.json")
+        limiter.acquire("https://www.parkrun.com.au/")
+        self.assertEqual(clock.slept, [])
+        limiter.acquire("https://www.parkrun.org.uk/parkrunner/2/all/")
+        self.assertEqual(clock.slept, [2.0])
+
+class TestParser(unittest.TestCase):
+
+    def test_runner_results_page_parity(self):
+        page: str = read_fixture("runner_results.html")
+        self.assertEqual(_parse_runner_results_page_fast(page), _parse_runner_results_page_bs4(page))
+
+    def test_runner_results_page(self):
+        name, most_recent_age_cat_str, rows = _parse_runner_results_page_fast(read_fixture("runner_results.html"))
+        self.assertEqual(name, "Jane O'DONNELL-SMITH")
+        self.assertEqual(most_recent_age_cat_str, "VW35-39")
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0], ["Bushy Park", "12/04/2025", "1100", "40", "19:58", "70.12%", "PB"])
+        self.assertEqual(rows[2], ["St Peters & Friends", "01/01/2025", "9", "7", "1:02:10", "25.01%", ""])
+
+    def test_event_result_page_parity(self):
+        page: str = read_fixture("event_result.html")
+        self.assertEqual(_parse_event_result_page_fast(page), _parse_event_result_page_bs4(page))
+
+    def test_event_result_page(self):
+        date_text, rows = _parse_event_result_page_fast(read_fixture("event_result.html"))
+        self.assertEqual(date_text, "12/04/2025")
+        self.assertEqual([row["position"] for row in rows], ["1", "3", "4"]) # Position 2 unclaimed
+        self.assertEqual(rows[0]["name"], "Alex 'Quick' JONES")
+        self.assertEqual(rows[1]["id"], "2222222")
+        self.assertEqual(rows[1]["time"], "18:20")
+        self.assertEqual(rows[1]["groups"], "Club & Friends")
+
+    @parameterized.expand([
+        ("runner_results.html", extract_runner_results_fragment, parse_runner_results_page),
+        ("runner_recent.html", extract_runner_recent_fragment, parse_runner_recent_page),
+        ("event_result.html", extract_event_result_fragment, parse_event_result_page),
+    ])
+    def test_fragment_parity(self, file_name: str, extract_fragment: Callable[[str], str], parse: Callable):
+        page: str = read_fixture(file_name)
+        fragment: str = extract_fragment(page)
+        self.assertLess(len(fragment), len(page))
+        self.assertFalse(is_outdated_fragment(fragment))
+        self.assertEqual(parse(fragment), parse(page))
+
+    def test_fragment_bs4_parity(self):
+        page: str = read_fixture("event_result.html")
+        self.assertEqual(_parse_event_result_page_bs4(extract_event_result_fragment(page)), _parse_event_result_page_fast(page))
+        page = read_fixture("runner_results.html")
+        self.assertEqual(_parse_runner_results_page_bs4(extract_runner_results_fragment(page)), _parse_runner_results_page_fast(page))
+
+    def test_outdated_fragment(self):
+        self.assertTrue(is_outdated_fragment("<!-- parkrun fragment 0 -->\n<h2>Name</h2>"))
+        self.assertFalse(is_outdated_fragment(read_fixture("runner_results.html")))
+
+class TestRunnerResults(unittest.TestCase):
+
+    def test_from_table(self):
+        _, _, rows = parse_runner_results_page(read_fixture("runner_results.html"))
+        all_events = EventCollection({"countries": {"0": {"url": None, "bounds": []}}, "events": {"features": []}})
+        runner_results = RunnerResults.from_table(rows, all_events)
+        self.assertEqual(len(runner_results), len(rows))
+        for result, row in zip(runner_results, rows):
+            expected = RunnerResult.from_table(row, all_events)
+            self.assertEqual(result.location.name, expected.location.name)
+            self.assertEqual(result.date, expected.date)
+            self.assertEqual(result.run_number, expected.run_number)
+            self.assertEqual(result.position.string, expected.position.string)
+            self.assertEqual(result.time.timedelta, expected.time.timedelta)
+            self.assertEqual(result.age_grade.string, expected.age_grade.string)
+            self.assertEqual(result.pb.is_pb, expected.pb.is_pb)
+
+    def test_from_results(self):
+        results = [
+            RunnerResult(Event(1, "A", "a", 0.0, 0.0, 0, 0), datetime.date(2026, 4, 11), 2, Position("3"), Time.from_string("1:02:03"), AgeGrade("61.23%"), PB(True)),
+            RunnerResult(Event(0, "B (discontinued)", "B", 0.0, 0.0, 0, 0), datetime.date(2026, 4, 4), 1, Position("12"), Time.from_string("25:00"), AgeGrade(""), PB(False)),
+            RunnerResult(Event(0, "C (discontinued)", "C", 0.0, 0.0, 0, 0), datetime.date(2026, 3, 28), 7, Position("1"), Time.from_string("19:59"), AgeGrade("70.00%"), PB(False)),
+        ]
+        runner_results = RunnerResults.from_results(results)
+        self.assertEqual(list(runner_results), results)
+        self.assertEqual([runner_results.location(i).name for i in range(3)], ["A", "B (discontinued)", "C (discontinued)"])
+
+        # Created from the columns rather than the original objects
+        created = runner_results.slice(0, 3)
+        created._results = [None] * 3
+        self.assertEqual([str(result.time) for result in created], ["1:02:03", "25:00", "19:59"])
+        self.assertEqual([str(result.age_grade) for result in created], ["61.23%", "", "70.00%"])
+        self.assertEqual([result.pb.is_pb for result in created], [True, False, False])
+        self.assertIs(created[-1], created[2])
+
+    def test_filter_dates(self):
+        results = [RunnerResult(DUMMY_EVENT, date, 0, DUMMY_POSITION, DUMMY_TIME, DUMMY_AGE_GRADE, DUMMY_PB) for date in (datetime.date(2026, 4, 11), datetime.date(2026, 4, 4), datetime.date(2026, 3, 28))]
+        runner_results = RunnerResults.from_results(results).filter_dates(datetime.date(2026, 3, 29), datetime.date(2026, 4, 4))
+        self.assertEqual(list(runner_results), results[1:2])
+
+    @parameterized.expand([
+        (datetime.date.min, datetime.date.max, [0, 1, 2, 3]),
+        (datetime.date(2026, 3, 28), datetime.date(2026, 4, 4), [1, 2]),
+        (datetime.date(2026, 3, 29), datetime.date(2026, 4, 3), []),
+        (datetime.date(2026, 4, 12), datetime.date.max, []),
+        (datetime.date(2026, 4, 4), datetime.date(2026, 3, 28), []),
+    ])
+    def test_runner_slice(self, start_date: datetime.date, end_date: datetime.date, expected: list[int]):
+        dates: list[datetime.date] = [datetime.date(2026, 4, 11), datetime.date(2026, 4, 4), datetime.date(2026, 3, 28), datetime.date(2026, 3, 21)]
+        runner = Runner(1, "Name", AgeCategory("SM20-24"), [RunnerResult(DUMMY_EVENT, date, 0, DUMMY_POSITION, DUMMY_TIME, DUMMY_AGE_GRADE, DUMMY_PB) for date in dates], datetime.date.min, datetime.date.max)
+        sliced = runner.slice(start_date, end_date)
+        self.assertEqual([result.date for result in sliced.results], [dates[index] for index in expected])
+        for index, result in zip(expected, sliced.results):
+            self.assertIs(result, runner.results[index])
+
+    def test_runner_slice_locations(self):
+        events: list[Event] = [Event(id_, f"Event {id_}", f"event{id_}", 0.0, 0.0, 0, 0) for id_ in (1, 2)]
+        results = [RunnerResult(event, date, 0, DUMMY_POSITION, DUMMY_TIME, DUMMY_AGE_GRADE, DUMMY_PB) for event, date in zip(events, (datetime.date(2026, 4, 11), datetime.date(2026, 4, 4)))]
+        runner = Runner(1, "Name", AgeCategory("SM20-24"), results, datetime.date.min, datetime.date.max)
+        sliced = runner.slice(datetime.date(2026, 4, 4), datetime.date(2026, 4, 4))
+        self.assertEqual((runner.num_unique_locations, sliced.unique_locations), (2, {events[1]}))
+
+    def test_view_shares_results(self):
+        results = [RunnerResult(DUMMY_EVENT, datetime.date(2026, 4, 11) - datetime.timedelta(weeks=week), 0, Position(str(week + 1)), DUMMY_TIME, DUMMY_AGE_GRADE, DUMMY_PB) for week in range(5)]
+        runner_results = RunnerResults.from_results(results)
+        runner_results._results = [None] * 5
+        view = runner_results.slice(1, 4).slice(1, 3)
+        self.assertEqual([result.position.value for result in view], [3, 4])
+        self.assertIs(view[-1], runner_results[3])
+        self.assertIsNone(runner_results._results[0])
+        with self.assertRaises(IndexError):
+            view[2]
+
+def overlapping_runners() -> list[Runner]:
+    """
+    Three runners who each did three parkruns, with each pair doing two of
+    them together, including at different discontinued events.
+    """
+
+    a = Event(1, "A", "a", 0.0, 0.0, 0, 0)
+    b = Event(2, "B", "b", 0.0, 0.0, 0, 0)
+    old = Event(0, "Old (discontinued)", "Old", 0.0, 0.0, 0, 0)
+    older = Event(0, "Older (discontinued)", "Older", 0.0, 0.0, 0, 0)
+    saturdays: list[datetime.date] = [datetime.date(2026, 4, 11) - datetime.timedelta(weeks=week) for week in range(3)]
+
+    def runner(number: int, runs: list[tuple[Event, datetime.date]]) -> Runner:
+        results = [RunnerResult(event, date, 0, Position(str(number)), DUMMY_TIME, DUMMY_AGE_GRADE, DUMMY_PB) for event, date in runs]
+        return Runner(number, "Name", AgeCategory("SM20-24"), results, datetime.date.min, datetime.date.max)
+
+    return [
+        runner(1, [(a, saturdays[0]), (b, saturdays[1]), (old, saturdays[2])]),
+        runner(2, [(a, saturdays[0]), (b, saturdays[1]), (older, saturdays[2])]),
+        runner(3, [(a, saturdays[0]), (a, saturdays[1]), (old, saturdays[2])]),
+    ]
+
+class TestRunIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.runners: list[Runner] = overlapping_runners()
+        self.index = RunIndex(self.runners)
+
+    def formatted(self, keys) -> set[str]:
+        return {self.index.result(*self.index.runners_at(key)[0]).format_for_event() for key in keys}
+
+    def test_common_to_all(self):
+        expected: set[str] = set.intersection(*({result.format_for_event() for result in runner.results} for runner in self.runners))
+        common = self.index.common_to_all()
+        self.assertEqual(self.formatted(common), expected)
+        self.assertEqual([[self.index.result(*entry).position.value for entry in entries] for entries in common.values()], [[1, 2, 3]])
+
+    def test_common_runs(self):
+        self.assertEqual(self.formatted(self.index.common_runs(0, 1)), {"2026-04-11 A", "2026-04-04 B"})
+        self.assertEqual(self.formatted(self.index.common_runs(0, 2)), {"2026-04-11 A", "2026-03-28 Old (discontinued)"})
+
+    def test_overlap_matrix(self):
+        self.assertEqual(self.index.overlap_matrix(), [[3, 2, 2], [2, 3, 1], [2, 1, 3]])
+
+    def test_overlap_tables(self):
+        with mock.patch.object(parkrun.tables.overlap, "fetch_many_runner_results", return_value=self.runners), mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            parkrun.tables.overlap.overlap_matrix([1, 2, 3], datetime.date.min, datetime.date.max)
+            parkrun.tables.overlap.top_co_runners([1, 2, 3], datetime.date.min, datetime.date.max)
+        self.assertIn("| 1. Name (1) | 3 | 2 | 2 |", stdout.getvalue())
+        self.assertIn("Name (2): 2", stdout.getvalue())
+
+class TestDaemon(unittest.TestCase):
+
+    def setUp(self):
+        self.runners: list[Runner] = overlapping_runners()
+        daemon = parkrun.api.daemon.Daemon([])
+        server = parkrun.api.daemon.make_server(daemon, 0)
+        thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.01})
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        patcher = mock.patch.object(parkrun, "_DAEMON_PORT", server.server_address[1])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_runs_table(self):
+        with mock.patch.object(parkrun.tables.overlap, "fetch_many_runner_results", return_value=self.runners) as fetch:
+            output = parkrun.api.daemon.run_in_daemon("overlap_matrix", [1, 2, 3], {"start_date": datetime.date(2026, 1, 1), "end_date": datetime.date.max})
+        self.assertIn("| 1. Name (1) | 3 | 2 | 2 |", output)
+        fetch.assert_called_once_with([1, 2, 3], datetime.date(2026, 1, 1), datetime.date.max)
+
+    @parameterized.expand([
+        ("migrate_cache",),
+        ("activity",),
+        ("unknown",),
+    ])
+    def test_only_runs_tables(self, command: str):
+        with self.assertRaisesRegex(ParkrunException, f"can't run '{command}'"):
+            parkrun.api.daemon.run_in_daemon(command, [], {})
+
+    def test_not_running(self):
+        with socket.socket() as free:
+            free.bind(("127.0.0.1", 0))
+            port: int = free.getsockname()[1]
+        with mock.patch.object(parkrun, "_DAEMON_PORT", port):
+            self.assertIsNone(parkrun.api.daemon.run_in_daemon("overlap_matrix", [1], {}))
+
+    @parameterized.expand([
+        param("before window", datetime.datetime(2026, 4, 11, 9), 4 * 60 * 60),
+        param("in window", datetime.datetime(2026, 4, 11, 12, 30), 30 * 60),
+        param("after window", datetime.datetime(2026, 4, 11, 14), 7 * 24 * 60 * 60 - 60 * 60),
+        param("christmas", datetime.datetime(2026, 12, 24, 14), 23 * 60 * 60),
+    ])
+    def test_seconds_until_refresh(self, _: str, now: datetime.datetime, expected: float):
+        self.assertEqual(parkrun.api.daemon.seconds_until_refresh(now), expected)
+
+class TestBenchmarkPages(unittest.TestCase):
+
+    @parameterized.expand([(10,), (1500,)])
+    def test_synthetic_runner_page(self, num_results: int):
+        name, most_recent_age_cat_str, rows = _parse_runner_results_page_fast(benchmarks.synthetic_runner_page(num_results, num_results))
+        self.assertEqual((name, most_recent_age_cat_str, len(rows)), (f"Runner {num_results}", "SM30-34", num_results))
+
+    @parameterized.expand([(50,), (2000,)])
+    def test_synthetic_event_page(self, num_finishers: int):
+        date_text, rows = _parse_event_result_page_fast(benchmarks.synthetic_event_page(num_finishers))
+        self.assertEqual((date_text, len(rows)), ("12/04/2025", num_finishers))
+
+    def test_quick(self):
+        process = subprocess.run([sys.executable, "benchmarks.py", "--quick"], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+        results: list[dict] = json.loads(process.stdout)["benchmarks"]
+        self.assertGreater(len(results), 0)
+        self.assertEqual({(result["repeat"], result["number"]) for result in results}, {(1, 1)})
+        self.assertNotIn("import", {result["name"] for result in results})
+
+class TestLazyImports(unittest.TestCase):
+
+    def imported_modules(self, args: list[str]) -> set[str]:
+        process = subprocess.run([sys.executable, "-X", "importtime"] + args, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+        return {line.split("|")[-1].strip() for line in process.stderr.splitlines() if line.startswith("import time:")}
+
+    def test_cli_help(self):
+        modules: set[str] = self.imported_modules(["cli.py", "--help"])
+        for module in ("matplotlib", "bs4", "requests", "pycountry", "texttable", "parkrun.tables.runner_stats"):
+            self.assertNotIn(module, modules)
+
+    def test_table(self):
+        modules: set[str] = self.imported_modules(["-c", "import parkrun.tables.latest_update"])
+        for module in ("matplotlib", "bs4", "requests", "pycountry", "asyncio", "distutils"):
+            self.assertNotIn(module, modules)
+
+class TestMemoryCache(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = parkrun.api.memory_cache.MemoryCache(max_entries=2, max_bytes=100)
+        cache.put("a", 1, 10)
+        cache.put("b", 2, 10)
+        self.assertEqual(cache.get("a"), (True, 1))
+        cache.put("c", 3, 10)
+        self.assertEqual(cache.get("b"), (False, None))
+        self.assertEqual(cache.get("a"), (True, 1))
+        self.assertEqual(cache.get("c"), (True, 3))
+        self.assertEqual(cache.stats(), {"entries": 2, "bytes": 20, "hits": 3, "misses": 1, "evictions": 1})
+
+    def test_evicts_by_size(self):
+        cache = parkrun.api.memory_cache.MemoryCache(max_entries=10, max_bytes=100)
+        cache.put("a", 1, 60)
+        cache.put("b", 2, 30)
+        cache.put("c", 3, 30)
+        self.assertEqual(cache.get("a"), (False, None))
+        cache.put("d", 4, 101)
+        self.assertEqual(cache.get("d"), (False, None))
+        self.assertEqual(cache.stats()["bytes"], 60)
+
+    def test_decorator(self):
+        cache = parkrun.api.memory_cache.MemoryCache(max_entries=10, max_bytes=100)
+        calls: list[int] = []
+
+        @parkrun.api.memory_cache.memory_cache(lambda value: 1)
+        def square(n: int) -> int:
+            calls.append(n)
+            return n * n
+
+        with mock.patch.object(parkrun.api.memory_cache, "_memory_cache", cache):
+            self.assertEqual([square(2), square(2), square(n=2), square(3)], [4, 4, 4, 9])
+            self.assertEqual(calls, [2, 2, 3])
+            cache.put("other", 0, 1)
+            square.cache_clear()
+            self.assertEqual(len(cache), 1)
+
+    def test_concurrent_misses_call_once(self):
+        cache = parkrun.api.memory_cache.MemoryCache(max_entries=10, max_bytes=100)
+        calls: list[int] = []
+        started = threading.Event()
+        release = threading.Event()
+
+        @parkrun.api.memory_cache.memory_cache(lambda value: 1)
+        def slow_square(n: int) -> int:
+            calls.append(n)
+            started.set()
+            release.wait(5)
+            return n * n
+
+        with mock.patch.object(parkrun.api.memory_cache, "_memory_cache", cache), ThreadPoolExecutor(max_workers=2) as executor:
+            first = executor.submit(slow_square, 2)
+            started.wait(5)
+            second = executor.submit(slow_square, 2)
+            time.sleep(0.05)
+            release.set()
+            self.assertEqual((first.result(), second.result()), (4, 4))
+        self.assertEqual(calls, [2])
+
+    def test_runner_shared_between_dates(self):
+        runner = Runner(1, "Name", AgeCategory("SM20-24"), [RunnerResult(DUMMY_EVENT, date, 0, DUMMY_POSITION, DUMMY_TIME, DUMMY_AGE_GRADE, DUMMY_PB) for date in (datetime.date(2026, 4, 11), datetime.date(2026, 4, 4))], datetime.date.min, datetime.date.max)
+        with mock.patch.object(parkrun.api.scraper_runner, "_fetch_all_runner_results", return_value=runner) as fetch_all:
+            self.assertIs(parkrun.api.scraper_runner.fetch_runner_results(1), runner)
+            self.assertEqual([result.date for result in parkrun.api.scraper_runner.fetch_runner_results(1, datetime.date(2026, 4, 5)).results], [datetime.date(2026, 4, 11)])
+            fetch_all.assert_called_with(1)
+
+class TempCacheTestCase(unittest.TestCase):
+    """
+    Point the cache at an empty temporary directory for each test.
+    """
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        patcher = mock.patch.object(parkrun.api.cache, "cache_dir", Path(temp_dir.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+class TestParsedRunnerResultsCache(TempCacheTestCase):
+
+    def parse(self, page: str) -> tuple[tuple[str, str, list[list[str]]], int]:
+        """
+        Return the parsed page and how many times it was actually parsed.
+        """
+        with mock.patch.object(parkrun.api.scraper_runner, "parse_runner_results_page", wraps=parkrun.api.scraper_runner.parse_runner_results_page) as parse:
+            parsed = parkrun.api.scraper_runner._parse_runner_results_page_cached(1, page)
+            return parsed, parse.call_count
+
+    def test_warm_cache_not_reparsed(self):
+        page: str = read_fixture("runner_results.html")
+        first, first_parses = self.parse(page)
+        second, second_parses = self.parse(page)
+        self.assertEqual((first_parses, second_parses), (1, 0))
+        self.assertEqual(first, second)
+
+    def test_stale_unchanged_page_not_reparsed(self):
+        page: str = read_fixture("runner_results.html")
+        self.parse(page)
+        parkrun.api.cache.mark_fresh("runner_results_parsed", "1.pickle", datetime.datetime(2000, 1, 1))
+        self.assertEqual(self.parse(page)[1], 0)
+
+    def test_changed_page_reparsed(self):
+        page: str = read_fixture("runner_results.html")
+        self.parse(page)
+        parsed, parses = self.parse(page.replace("VW35-39", "VW40-44"))
+        self.assertEqual(parses, 1)
+        self.assertEqual(parsed[1], "VW40-44")
+
+def row(location: str, date: str, run_number: str) -> list[str]:
+    return [location, date, run_number, "1", "20:00", "50.00%", ""]
+
+class TestIncrementalRefresh(TempCacheTestCase):
+
+    @parameterized.expand([
+        ([], [row("A", "12/04/2025", "2")], None),
+        ([row("A", "12/04/2025", "2")], [row("A", "12/04/2025", "2")], [row("A", "12/04/2025", "2")]),
+        ([row("A", "12/04/2025", "2")], [row("B", "19/04/2025", "5"), row("A", "12/04/2025", "2")], [row("B", "19/04/2025", "5"), row("A", "12/04/2025", "2")]),
+        ([row("A", "12/04/2025", "2"), row("A", "05/04/2025", "1")], [row("B", "19/04/2025", "5"), row("A", "12/04/2025", "2"), row("A", "05/04/2025", "1")], [row("B", "19/04/2025", "5"), row("A", "12/04/2025", "2"), row("A", "05/04/2025", "1")]),
+        ([row("A", "12/04/2025", "2")], [row("B", "26/04/2025", "6"), row("B", "19/04/2025", "5")], None),
+        ([row("A", "12/04/2025", "2"), row("A", "05/04/2025", "1")], [row("A", "12/04/2025", "2"), row("C", "05/04/2025", "1")], None),
+    ])
+    def test_merge_recent_rows(self, rows: list[list[str]], recent_rows: list[list[str]], expected: list[list[str]] | None):
+        self.assertEqual(parkrun.api.scraper_runner.merge_recent_rows(rows, recent_rows), expected)
+
+    def test_merge_keeps_corrections(self):
+        corrected: list[str] = row("A", "12/04/2025", "2")
+        corrected[4] = "19:59"
+        merged = parkrun.api.scraper_runner.merge_recent_rows([row("A", "12/04/2025", "2"), row("A", "05/04/2025", "1")], [corrected])
+        self.assertEqual(merged, [corrected, row("A", "05/04/2025", "1")])
+
+    @parameterized.expand([
+        param("out of date", datetime.timedelta(weeks=1), True),
+        param("too long since all fetched", datetime.timedelta(weeks=parkrun.api.scraper_runner.FULL_REFRESH_WEEKS), False),
+        param("force invalid", datetime.timedelta(weeks=1), False, force_invalid=True),
+        param("up to date", datetime.timedelta(), False),
+    ])
+    def test_use_incremental_refresh(self, _: str, age: datetime.timedelta, expected: bool, force_invalid: bool = False):
+        parkrun.api.cache.write_cache_str("runner_results", "1.html", "page")
+        if age:
+            parkrun.api.cache.mark_fresh("runner_results", "1.html", datetime.datetime.now() - age)
+        with mock.patch.object(parkrun, "_CACHE_FORCE_INVALID", force_invalid), mock.patch.object(parkrun, "_INCREMENTAL_REFRESH", True):
+            self.assertEqual(parkrun.api.scraper_runner._use_incremental_refresh(1), expected)
+
+    def test_no_previous_results(self):
+        self.assertIsNone(parkrun.api.scraper_runner._fetch_runner_results_incremental(1))
+
+    def test_merges_recent_results(self):
+        _, _, all_rows = parkrun.api.scraper_runner._parse_runner_results_page_cached(1, read_fixture("runner_results.html"))
+        with mock.patch.object(parkrun.api.scraper_runner, "fetch", return_value=read_fixture("runner_recent.html")):
+            name, _, rows = parkrun.api.scraper_runner._fetch_runner_results_incremental(1)
+            self.assertEqual(name, "Jane O'DONNELL-SMITH")
+            self.assertEqual(rows[1:], all_rows)
+            self.assertEqual(rows[0][:3], ["Bromley", "19/04/2025", "801"])
+
+            # Already merged so not parsed again
+            with mock.patch.object(parkrun.api.scraper_runner, "parse_runner_recent_page") as parse:
+                self.assertEqual(parkrun.api.scraper_runner._fetch_runner_results_incremental(1)[2], rows)
+                parse.assert_not_called()
+
+class TestPrewarm(TempCacheTestCase):
+
+    SATURDAY: datetime.date = datetime.date(2026, 4, 11)
+
+    def setUp(self):
+        super().setUp()
+        self.now = datetime.datetime.combine(self.SATURDAY, datetime.time(HR_RESULT_START))
+        self.slept: list[float] = []
+
+    def sleep(self, secs: float) -> None:
+        self.slept.append(secs)
+        self.now += datetime.timedelta(seconds=secs)
+
+    def runner(self, number: int, dates: list[datetime.date]) -> Runner:
+        results = [RunnerResult(DUMMY_EVENT, date, 0, DUMMY_POSITION, DUMMY_TIME, DUMMY_AGE_GRADE, DUMMY_PB) for date in dates]
+        return Runner(number, "Name", AgeCategory("SM20-24"), results, datetime.date.min, datetime.date.max)
+
+    def test_polls_until_results_in(self):
+        last_week: datetime.date = self.SATURDAY - datetime.timedelta(weeks=1)
+        polls: list[list[int]] = []
+
+        def fetch_many_runner_results(numbers: list[int]) -> list[Runner]:
+            polls.append(numbers)
+            return [self.runner(number, [self.SATURDAY, last_week] if number == 1 and len(polls) > 1 else [last_week]) for number in numbers]
+
+        with mock.patch.object(parkrun.api.prewarm, "fetch_many_runner_results", side_effect=fetch_many_runner_results), mock.patch.object(parkrun.api.prewarm, "mark_runner_fresh") as mark_runner_fresh:
+            parkrun.api.prewarm.Prewarmer([1, 2, 1], lambda: self.now, self.sleep).run_window(self.SATURDAY)
+
+        # Backs off until runner 1's result is in, then only polls runner 2
+        # until one last time at the end of the window
+        self.assertEqual(polls[:3], [[1, 2], [1, 2], [2]])
+        self.assertEqual(self.slept[:4], [600, 300, 600, 1200])
+        self.assertEqual(self.now, datetime.datetime.combine(self.SATURDAY, datetime.time(HR_RESULT_END)))
+        mark_runner_fresh.assert_called_once_with(1, self.now)
+
+    @parameterized.expand([("files",), ("sqlite",)])
+    def test_mark_runner_fresh(self, backend: str):
+        patcher = mock.patch.object(parkrun, "_CACHE_BACKEND", backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        page: str = read_fixture("runner_results.html")
+        parkrun.api.cache.write_cache_str("runner_results", "1.html", page)
+        parkrun.api.cache.write_cache_str("runner_recent", "1.html", "different")
+        parkrun.api.scraper_runner._parse_runner_results_page_cached(1, page)
+
+        # Results could have come out since everything was written
+        window_end: datetime.datetime = datetime.datetime.now() + datetime.timedelta(hours=1)
+        with mock.patch.object(parkrun.api.cache, "most_recent_parkrun", return_value=window_end):
+            self.assertFalse(parkrun.api.scraper_runner._is_runner_cached(1))
+            parkrun.api.scraper_runner.mark_runner_fresh(1, window_end)
+            self.assertTrue(parkrun.api.cache.is_cache_valid("runner_results", "1.html"))
+            self.assertIsNotNone(parkrun.api.scraper_runner._check_parsed_runner(1))
+            self.assertFalse(parkrun.api.cache.is_cache_valid("runner_recent", "1.html"))
+
+class TestEventIndex(TempCacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for func in (fetch, parkrun.api.scraper._fetch_event_index, parkrun.api.scraper.fetch_events):
+            func.cache_clear()
+            self.addCleanup(func.cache_clear)
+        self.events_json: str = benchmarks.synthetic_events_json()
+        parkrun.api.cache.write_cache_str("events", "events.json", self.events_json)
+
+    def load(self) -> tuple[EventIndex, int]:
+        """
+        Return the index loaded from a fresh start and how many times it was
+        built from events.json.
+        """
+
+        fetch.cache_clear()
+        parkrun.api.scraper._fetch_event_index.cache_clear()
+        with mock.patch.object(EventIndex, "from_dict", wraps=EventIndex.from_dict) as from_dict:
+            return parkrun.api.scraper._fetch_event_index(), from_dict.call_count
+
+    def test_same_events(self):
+        from_json = EventCollection(json.loads(self.events_json))
+        from_index = EventCollection(pickle.loads(pickle.dumps(self.load()[0])))
+        attributes = lambda event: (event.id_, event.name, event.url_name, event.lat, event.long, event.country.id_, event.series)
+        self.assertEqual(list(map(attributes, from_index)), list(map(attributes, from_json)))
+        self.assertIs(from_index.get_event_by_id(2), from_index.get_event_by_name(benchmarks.event_name(2)))
+        self.assertIsNone(from_index.get_event_by_id(0))
+        self.assertEqual(from_index.get_event_by_name("Gone").country.id_, 0)
+
+    def test_cached(self):
+        self.assertEqual(self.load()[1], 1)
+        with mock.patch.object(parkrun.api.scraper, "fetch") as fetch_page:
+            self.assertEqual(self.load()[1], 0)
+            fetch_page.assert_not_called()
+
+    @parameterized.expand([("unchanged", False), ("changed", True)])
+    def test_rebuilt_if_changed(self, _: str, changed: bool):
+        self.load()
+        parkrun.api.cache.mark_fresh("events_index", "events.pickle", datetime.datetime(2000, 1, 1))
+        if changed:
+            events: dict = json.loads(self.events_json)
+            events["events"]["features"].pop()
+            parkrun.api.cache.write_cache_str("events", "events.json", json.dumps(events))
+        index, builds = self.load()
+        self.assertEqual((len(index), builds), (benchmarks.NUM_EVENTS - changed, int(changed)))
+        self.assertTrue(parkrun.api.cache.is_cache_valid("events_index", "events.pickle"))
+
+def events_json_with_names(names: list[str]) -> dict:
+    """
+    Return a synthetic events.json with events with IDs from 1 and the given
+    names.
+    """
+
+    events: dict = json.loads(benchmarks.synthetic_events_json())
+    events["events"]["features"] = events["events"]["features"][:len(names)]
+    for feature, name in zip(events["events"]["features"], names):
+        feature["properties"]["EventShortName"] = name
+    return events
+
+class TestEventNameLookup(unittest.TestCase):
+
+    def setUp(self):
+        self.events = EventCollection(events_json_with_names(["Ōtautahi", "St. Peter's", "Bushy Park", "Bushy Juniors"]))
+
+    @parameterized.expand([
+        ("Ōtautahi", 1),
+        ("otautahi", 1),
+        ("St Peter's", 2),
+        ("ST. PETER'S", 2),
+        ("Bushy  park", 3),
+        ("Bushy", None),
+    ])
+    def test_find_event_by_name(self, name: str, expected_id: int | None):
+        event: Event | None = self.events.find_event_by_name(name)
+        self.assertEqual(None if event is None else event.id_, expected_id)
+
+    def test_discontinued_shared(self):
+        gone: Event = self.events.get_event_by_name("Gone")
+        self.assertIs(self.events.get_event_by_name("Gone"), gone)
+        self.assertEqual(gone.country.id_, 0)
+        self.assertNotEqual(gone, self.events.get_event_by_name("Also gone"))
+        self.assertEqual(len({gone, self.events.get_event_by_name("Also gone"), Event(0, "Gone (discontinued)", "Gone", 0.0, 0.0, 0, 0)}), 2)
+
+    def test_aliases(self):
+        previous = EventIndex.from_dict(events_json_with_names(["Old Name", "B"]))
+        renamed = EventIndex.from_dict(events_json_with_names(["Newer Name", "B"]), previous=previous)
+        self.assertEqual(renamed.aliases, {"Old Name": 1})
+        renamed_again = EventIndex.from_dict(events_json_with_names(["Newest Name", "B"]), previous=renamed)
+        self.assertEqual(renamed_again.aliases, {"Old Name": 1, "Newer Name": 1})
+        events = EventCollection(renamed_again)
+        self.assertIs(events.get_event_by_name("Old Name"), events.get_event_by_id(1))
+        self.assertIs(events.get_event_by_name("newer name"), events.get_event_by_id(1))
+
+    @parameterized.expand([
+        ("bushy", 10, ["Bushy Juniors", "Bushy Park"]),
+        ("Bushy", 1, ["Bushy Juniors"]),
+        ("st peter", 10, ["St. Peter's"]),
+        ("Bushey Park", 1, ["Bushy Park"]),
+        ("xyz", 10, []),
+    ])
+    def test_search(self, query: str, limit: int, expected: list[str]):
+        self.assertEqual([event.name for event in self.events.search(query, limit)], expected)
+
+class FixtureTestCase(TempCacheTestCase):
+    """
+    Serve pages with a FixtureAdapter instead of querying the parkrun websites,
+    without rate limiting.
+    """
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(parkrun.api.rate_limiter, "_rate_limiter", RateLimiter(0, 1))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        fetch.cache_clear()
+        self.addCleanup(fetch.cache_clear)
+        self.addCleanup(use_adapter, None)
+        self.sleeps: list[float] = []
+
+        # Don't wait before retrying
+        self.backoffs: list[float] = []
+        patcher = mock.patch.object(parkrun.api.scraper.time, "sleep", self.backoffs.append)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def use_pages(self, pages: dict, latency: float = 0.0) -> FixtureAdapter:
+        adapter = FixtureAdapter(pages, latency, sleep=self.sleeps.append)
+        use_adapter(adapter)
+        return adapter
+
+class TestTransport(FixtureTestCase):
+
+    URL: str = "https://www.parkrun.org.uk/parkrunner/1/all/"
+
+    def test_serves_and_caches_page(self):
+        adapter = self.use_pages({self.URL: "page"}, latency=0.5)
+        self.assertEqual(fetch(self.URL, "runner_results", "1.html"), "page")
+        self.assertEqual(parkrun.api.cache.check_cache_str("runner_results", "1.html"), "page")
+        self.assertEqual(adapter.requested, [self.URL])
+        self.assertEqual(self.sleeps, [0.5])
+
+    def test_404(self):
+        adapter = self.use_pages({})
+        with self.assertRaisesRegex(ParkrunException, "No parkrunner"):
+            fetch(self.URL, "runner_results", "1.html", "No parkrunner")
+        self.assertEqual(adapter.requested, [self.URL])
+
+    def test_5xx(self):
+        adapter = self.use_pages({self.URL: FixturePage(status_code=503)})
+        with self.assertRaises(requests.exceptions.HTTPError):
+            fetch(self.URL, "runner_results", "1.html")
+        self.assertEqual(len(adapter.requested), parkrun.api.scraper.MAX_FETCH_ATTEMPTS)
+        self.assertEqual(self.backoffs, [1.0, 2.0])
+
+    def test_connection_failure(self):
+        adapter = self.use_pages({self.URL: FixturePage(fail=True)})
+        with self.assertRaises(ParkrunException):
+            fetch(self.URL, "runner_results", "1.html")
+        self.assertEqual(len(adapter.requested), parkrun.api.scraper.MAX_FETCH_ATTEMPTS)
+
+    @parameterized.expand([
+        param("connection failure", FixturePage("page", fail=True, fail_times=2), [1.0, 2.0]),
+        param("5xx", FixturePage("page", status_code=502, fail_times=1), [1.0]),
+    ])
+    def test_retries(self, _: str, page: FixturePage, expected_backoffs: list[float]):
+        adapter = self.use_pages({self.URL: page})
+        self.assertEqual(fetch(self.URL, "runner_results", "1.html"), "page")
+        self.assertEqual(len(adapter.requested), len(expected_backoffs) + 1)
+        self.assertEqual(self.backoffs, expected_backoffs)
+        self.assertEqual(parkrun.api.cache.check_cache_str("runner_results", "1.html"), "page")
+
+    def test_connection_failure_uses_stale_cache(self):
+        self.use_pages({self.URL: FixturePage(fail=True)})
+        parkrun.api.cache.write_cache_str("runner_results", "1.html", "old")
+        with mock.patch.object(parkrun, "_CACHE_FORCE_INVALID", True):
+            self.assertEqual(fetch(self.URL, "runner_results", "1.html"), "old")
+
+    @parameterized.expand([("fragment",), ("full",)])
+    def test_cache_page_mode(self, page_mode: str):
+        page: str = read_fixture("runner_results.html")
+        self.use_pages({self.URL: page})
+        with mock.patch.object(parkrun, "_CACHE_PAGE_MODE", page_mode):
+            fetched: str = fetch(self.URL, "runner_results", "1.html", extract_fragment=extract_runner_results_fragment)
+        self.assertEqual(fetched == page, page_mode == "full")
+        self.assertEqual(parkrun.api.cache.check_cache_str("runner_results", "1.html"), fetched)
+
+    def test_outdated_fragment_fetched_again(self):
+        adapter = self.use_pages({self.URL: "page"})
+        parkrun.api.cache.write_cache_str("runner_results", "1.html", "<!-- parkrun fragment 0 -->")
+        self.assertEqual(fetch(self.URL, "runner_results", "1.html"), "page")
+        self.assertEqual(adapter.requested, [self.URL])
+
+    def fetch_stale(self, page: FixturePage, force_invalid: bool = False) -> str:
+        """
+        Fetch the page after it was cached with its validators before the most
+        recent parkrun.
+        """
+
+        adapter = self.use_pages({self.URL: page})
+        self.assertEqual(fetch(self.URL, "runner_results", "1.html"), "page")
+        parkrun.api.cache.mark_fresh("runner_results", "1.html", datetime.datetime(2000, 1, 1))
+        fetch.cache_clear()
+        page.body = "changed"
+        with mock.patch.object(parkrun, "_CACHE_FORCE_INVALID", force_invalid):
+            fetched: str = fetch(self.URL, "runner_results", "1.html")
+        self.assertEqual(adapter.requested, [self.URL, self.URL])
+        return fetched
+
+    @parameterized.expand([
+        param("etag", etag='"1"'),
+        param("last modified", last_modified="Sat, 12 Apr 2025 12:00:00 GMT"),
+    ])
+    def test_not_modified(self, _: str, **validators):
+        self.assertEqual(self.fetch_stale(FixturePage("page", **validators)), "page")
+        self.assertTrue(parkrun.api.cache.is_cache_valid("runner_results", "1.html"))
+
+    def test_modified(self):
+        page = FixturePage("page", etag='"1"')
+        self.use_pages({self.URL: page})
+        fetch(self.URL, "runner_results", "1.html")
+        parkrun.api.cache.mark_fresh("runner_results", "1.html", datetime.datetime(2000, 1, 1))
+        fetch.cache_clear()
+        page.body, page.etag = "changed", '"2"'
+        self.assertEqual(fetch(self.URL, "runner_results", "1.html"), "changed")
+        self.assertEqual(parkrun.api.scraper._conditional_headers("runner_results", "1.html"), {"If-None-Match": '"2"'})
+
+    @parameterized.expand([
+        param("no validators", FixturePage("page")),
+        param("force invalid", FixturePage("page", etag='"1"'), force_invalid=True),
+    ])
+    def test_unconditional(self, _: str, page: FixturePage, force_invalid: bool = False):
+        self.assertEqual(self.fetch_stale(page, force_invalid), "changed")
+
+    def test_from_directory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            (Path(directory) / "www.parkrun.org.uk" / "parkrunner" / "1" / "all").mkdir(parents=True)
+            (Path(directory) / "www.parkrun.org.uk" / "parkrunner" / "1" / "all" / "index.html").write_text("page", encoding="utf-8")
+            (Path(directory) / "images.parkrun.com").mkdir()
+            (Path(directory) / "images.parkrun.com" / "events.json").write_text("{}", encoding="utf-8")
+            adapter = FixtureAdapter.from_directory(Path(directory))
+        self.assertEqual({url: page.body for url, page in adapter.pages.items()}, {self.URL: "page", "https://images.parkrun.com/events.json": "{}"})
+
+class TestCrawler(FixtureTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.event: Event = EventCollection(json.loads(benchmarks.synthetic_events_json())).get_event_by_id(1)
+
+    def url(self, event_number: int) -> str:
+        return f"https://www.parkrun.org.uk/event1/results/{event_number}/"
+
+    def crawl(self) -> tuple[int, int]:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            return parkrun.api.crawler.crawl_event(self.event, executor, 4)
+
+    def test_crawls_until_not_found(self):
+        adapter = self.use_pages({self.url(number): benchmarks.synthetic_event_page(5) for number in range(1, 6)})
+        self.assertEqual(self.crawl(), (5, 5))
+        self.assertEqual(parkrun.api.crawler.read_checkpoint(self.event), 5)
+        self.assertIn(self.url(6), adapter.requested)
+        self.assertIsNotNone(parkrun.api.cache.check_cache_obj("event_result_parsed", "event1-3.pickle"))
+
+    def test_stops_after_not_found(self):
+        class SerialExecutor:
+            """
+            Only runs each submitted function when waited for, oldest first,
+            so fetches complete in a known order.
+            """
+
+            def __init__(self):
+                self.pending: list[tuple[Future, tuple]] = []
+
+            def submit(self, func, *args) -> Future:
+                future = Future()
+                self.pending.append((future, (func,) + args))
+                return future
+
+            def wait(self, futures, return_when) -> tuple[set[Future], set[Future]]:
+                future, (func, *args) = self.pending.pop(0)
+                while not future.set_running_or_notify_cancel():
+                    future, (func, *args) = self.pending.pop(0)
+                try:
+                    future.set_result(func(*args))
+                except Exception as e:
+                    future.set_exception(e)
+                return {future}, set(futures) - {future}
+
+        executor = SerialExecutor()
+        adapter = self.use_pages({self.url(number): benchmarks.synthetic_event_page(5) for number in range(1, 3)})
+        with mock.patch.object(parkrun.api.crawler, "wait", executor.wait):
+            self.assertEqual(parkrun.api.crawler.crawl_event(self.event, executor, 4), (2, 2))
+        self.assertEqual(adapter.requested, [self.url(number) for number in range(1, 4)])
+
+    def test_resumes_from_checkpoint(self):
+        parkrun.api.crawler.write_checkpoint(self.event, 3)
+        adapter = self.use_pages({self.url(number): benchmarks.synthetic_event_page(5) for number in range(1, 5)})
+        self.assertEqual(self.crawl(), (4, 1))
+        self.assertEqual(min(adapter.requested), self.url(4))
+
+    def test_skips_cached_pages(self):
+        parkrun.api.cache.write_cache_str("event_result", "event1-1.html", benchmarks.synthetic_event_page(5))
+        adapter = self.use_pages({self.url(number): benchmarks.synthetic_event_page(5) for number in range(1, 3)})
+        self.assertEqual(self.crawl(), (2, 1))
+        self.assertNotIn(self.url(1), adapter.requested)
+
+    def test_unknown_location(self):
+        with mock.patch.object(parkrun.api.crawler, "fetch_events", return_value=EventCollection(json.loads(benchmarks.synthetic_events_json()))):
+            with self.assertRaisesRegex(ParkrunException, f"did you mean '{benchmarks.event_name(1)}'"):
+                parkrun.api.crawler.crawl_event_results([benchmarks.event_name(1) + "x"])
+
+    def test_checkpoints_when_interrupted(self):
+        pages: dict = {self.url(number): benchmarks.synthetic_event_page(5) for number in range(1, 5)}
+        pages[self.url(3)] = FixturePage(fail=True)
+        self.use_pages(pages)
+        with self.assertRaises(ParkrunException):
+            self.crawl()
+        self.assertEqual(parkrun.api.crawler.read_checkpoint(self.event), 2)
+
+class TestFetchManyRunnerResults(FixtureTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for clear in (parkrun.api.scraper._fetch_event_index.cache_clear, parkrun.api.scraper.fetch_events.cache_clear, parkrun.api.scraper_runner.clear_runner_memory):
+            clear()
+            self.addCleanup(clear)
+
+        # Results could come out while the tests run
+        patcher = mock.patch.object(parkrun, "_CACHE_FORCE_VALID", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        for number in (1, 2):
+            parkrun.api.cache.write_cache_str("runner_results", f"{number}.html", benchmarks.synthetic_runner_page(number, 3))
+        self.adapter = self.use_pages({self.url(number): benchmarks.synthetic_runner_page(number, 3) for number in (3, 4)} | {
+            "https://images.parkrun.com/events.json": benchmarks.synthetic_events_json(),
+        })
+
+    def url(self, number: int) -> str:
+        return f"https://www.parkrun.org.uk/parkrunner/{number}/all/"
+
+    def test_in_order_and_cached_not_fetched(self):
+        runners: list[Runner] = parkrun.api.scraper_runner.fetch_many_runner_results([3, 1, 3, 2, 4])
+        self.assertEqual([runner.number for runner in runners], [3, 1, 3, 2, 4])
+        self.assertEqual([runner.name for runner in runners], ["Runner 3", "Runner 1", "Runner 3", "Runner 2", "Runner 4"])
+        self.assertIs(runners[0], runners[2])
+        self.assertEqual(sorted(url for url in self.adapter.requested if "/parkrunner/" in url), [self.url(3), self.url(4)])
+
+    def test_not_found_raised(self):
+        with self.assertRaises(ParkrunNotFoundException):
+            parkrun.api.scraper_runner.fetch_many_runner_results([1, 5, 3])
+
+class TestCacheCompression(TempCacheTestCase):
+
+    def use_compression(self, compression: str) -> None:
+        patcher = mock.patch.object(parkrun, "_CACHE_COMPRESSION", compression)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @parameterized.expand([
+        ("none",),
+        ("gzip",),
+        param("zstd", skip=importlib.util.find_spec("zstandard") is None),
+    ])
+    def test_round_trip(self, compression: str, skip: bool = False):
+        if skip:
+            self.skipTest("zstandard not installed")
+        self.use_compression(compression)
+        contents: bytes = read_fixture("runner_results.html").encode("utf-8")
+        parkrun.api.cache.write_cache("runner_results", "1.html", contents)
+        parkrun.api.cache.write_cache_obj("runner_results_parsed", "1.pickle", {"rows": [["a"]]})
+        self.assertEqual(parkrun.api.cache.check_cache("runner_results", "1.html"), contents)
+        self.assertEqual(parkrun.api.cache.check_cache_obj("runner_results_parsed", "1.pickle"), {"rows": [["a"]]})
+        size: int = (parkrun.api.cache.cache_dir / "runner_results" / "1.html").stat().st_size
+        self.assertEqual(size == len(contents), compression == "none")
+
+    def test_dedupe(self):
+        self.use_compression("gzip")
+        parkrun.api.cache.write_cache("runner_results", "1.html", b"page")
+        parkrun.api.cache.write_cache("runner_recent", "1.html", b"page")
+        parkrun.api.cache.write_cache("runner_results", "2.html", b"other page")
+        blobs: list[Path] = [path for path in (parkrun.api.cache.cache_dir / parkrun.api.cache.BLOBS_DIR_NAME).rglob("*") if path.is_file()]
+        self.assertEqual(len(blobs), 2)
+        self.assertEqual(parkrun.api.cache.check_cache("runner_recent", "1.html"), b"page")
+
+    def test_collect_garbage_blobs(self):
+        self.use_compression("gzip")
+        parkrun.api.cache.write_cache("runner_results", "1.html", b"page")
+        parkrun.api.cache.write_cache("runner_recent", "1.html", b"page")
+        parkrun.api.cache.write_cache("runner_results", "2.html", b"old page")
+        parkrun.api.cache.write_cache("runner_results", "2.html", b"new page")
+        parkrun.api.cache.write_cache("runner_recent", "1.html", b"recent page")
+        parkrun.api.cache.collect_garbage_blobs()
+        blobs: list[Path] = [path for path in (parkrun.api.cache.cache_dir / parkrun.api.cache.BLOBS_DIR_NAME).rglob("*") if path.is_file()]
+        self.assertEqual(len(blobs), 3)
+        self.assertEqual(parkrun.api.cache.check_cache("runner_results", "1.html"), b"page")
+        self.assertEqual(parkrun.api.cache.check_cache("runner_results", "2.html"), b"new page")
+        self.assertEqual(parkrun.api.cache.check_cache("runner_recent", "1.html"), b"recent page")
+        self.assertEqual([path.name for path in parkrun.api.cache.cache_dir.rglob("*.tmp")], [])
+
+    def test_reads_uncompressed(self):
+        parkrun.api.cache.write_cache("runner_results", "1.html", b"page")
+        self.use_compression("gzip")
+        self.assertEqual(parkrun.api.cache.check_cache("runner_results", "1.html"), b"page")
+
+    def test_missing_blob(self):
+        self.use_compression("gzip")
+        parkrun.api.cache.write_cache("runner_results", "1.html", b"page")
+        for path in (parkrun.api.cache.cache_dir / parkrun.api.cache.BLOBS_DIR_NAME).rglob("*"):
+            if path.is_file():
+                path.unlink()
+        self.assertIsNone(parkrun.api.cache.check_cache("runner_results", "1.html"))
+
+class TestSqliteCache(TempCacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(parkrun, "_CACHE_BACKEND", "sqlite")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pages(self):
+        self.assertIsNone(parkrun.api.cache.check_cache("events", "events.json"))
+        parkrun.api.cache.write_cache("events", "events.json", b"{}")
+        self.assertEqual(parkrun.api.cache.check_cache("events", "events.json"), b"{}")
+        self.assertTrue(parkrun.api.cache.is_cache_valid("events", "events.json"))
+
+    def test_stale_page(self):
+        parkrun.api.cache_sqlite.write_cache("events", "events.json", b"{}", modified=0.0)
+        self.assertIsNone(parkrun.api.cache.check_cache("events", "events.json"))
+
+    def test_parsed_runner_results(self):
+        page: str = read_fixture("runner_results.html")
+        expected = parkrun.api.scraper_runner._parse_runner_results_page_cached(1, page)
+        with mock.patch.object(parkrun.api.scraper_runner, "parse_runner_results_page") as parse:
+            self.assertEqual(parkrun.api.scraper_runner._parse_runner_results_page_cached(1, page), expected)
+            parse.assert_not_called()
+
+    def test_migrate(self):
+        with mock.patch.object(parkrun, "_CACHE_BACKEND", "files"):
+            parkrun.api.cache.write_cache("runner_results", "1.html", b"<html></html>")
+            parkrun.api.scraper_runner._parse_runner_results_page_cached(1, read_fixture("runner_results.html"))
+        parkrun.api.cache_sqlite.migrate_cache()
+        self.assertEqual(parkrun.api.cache.check_cache("runner_results", "1.html"), b"<html></html>")
+        self.assertEqual(parkrun.api.cache_sqlite.check_runner(1)["name"], "Jane O'DONNELL-SMITH")
+        self.assertEqual(parkrun.api.cache_sqlite._connection().execute("SELECT COUNT(*) FROM results WHERE runner_id = 1").fetchone(), (5,))
+
 if __name__ == "__main__":
     unittest.main()